@@ -0,0 +1,63 @@
+"""Компактные сериализаторы поверх .values().
+
+Модели не создаются: запрос отдаёт словари только с нужными полями,
+а функции ниже лишь перекладывают их в вложенный вид для JSON.
+"""
+from django.core.files.storage import default_storage
+
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'image', 'comments_count',
+    'author__username', 'author__first_name', 'author__last_name',
+    'group__slug', 'group__title',
+)
+COMMENT_FIELDS = (
+    'id', 'text', 'created',
+    'author__username', 'author__first_name', 'author__last_name',
+)
+GROUP_FIELDS = ('slug', 'title', 'description')
+
+
+def _author(row):
+    full_name = f'{row["author__first_name"]} {row["author__last_name"]}'
+    return {
+        'username': row['author__username'],
+        'full_name': full_name.strip(),
+    }
+
+
+def post(row):
+    group = None
+    if row['group__slug'] is not None:
+        group = {'slug': row['group__slug'], 'title': row['group__title']}
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'image': default_storage.url(row['image']) if row['image'] else None,
+        'comments_count': row['comments_count'],
+        'author': _author(row),
+        'group': group,
+    }
+
+
+def comment(row):
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'created': row['created'],
+        'author': _author(row),
+    }
+
+
+def group(row):
+    return {field: row[field] for field in GROUP_FIELDS}
+
+
+def profile(user, stats):
+    return {
+        'username': user.username,
+        'full_name': user.get_full_name(),
+        'posts_count': stats.posts_count,
+        'followers_count': stats.followers_count,
+        'following_count': stats.following_count,
+    }
@@ -0,0 +1,177 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(
+            username='Author', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='-'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+            for i in range(15)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.user, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.auth_client = Client()
+        self.auth_client.force_login(self.user)
+        cache.clear()
+
+    def test_post_list_pages(self):
+        """Ленты листаются курсором по ссылке next."""
+        urls = [
+            reverse('api:post_list'),
+            reverse('api:group_posts', args=['test-slug']),
+            reverse('api:profile_posts', args=['Author']),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.client.get(url).json()
+                self.assertEqual(len(first['results']), 10)
+                self.assertIsNone(first['previous'])
+                second = self.client.get(first['next']).json()
+                self.assertEqual(len(second['results']), 5)
+                ids = [post['id'] for post in first['results']]
+                ids += [post['id'] for post in second['results']]
+                self.assertEqual(
+                    ids, [post.pk for post in reversed(self.posts)]
+                )
+
+    def test_post_shape(self):
+        """Пост отдаётся с автором, группой и числом комментариев."""
+        post = self.posts[0]
+        data = self.client.get(
+            reverse('api:post_detail', args=[post.pk])
+        ).json()
+        self.assertEqual(data['text'], post.text)
+        self.assertEqual(data['comments_count'], 1)
+        self.assertEqual(
+            data['author'], {'username': 'Author', 'full_name': 'Лев Толстой'}
+        )
+        self.assertEqual(
+            data['group'], {'slug': 'test-slug', 'title': 'Тестовая группа'}
+        )
+        comments = self.client.get(
+            reverse('api:comment_list', args=[post.pk])
+        ).json()
+        self.assertEqual(comments['results'][0]['text'], 'Комментарий')
+
+    @override_settings(POSTS_PER_PAGE=2, COMMENTS_PER_PAGE=3)
+    def test_comment_list_pages(self):
+        """Комментарии листаются страницами по COMMENTS_PER_PAGE."""
+        post = self.posts[1]
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.user, text=f'Комментарий {i}')
+            for i in range(4)
+        )
+        first = self.client.get(
+            reverse('api:comment_list', args=[post.pk])
+        ).json()
+        self.assertEqual(len(first['results']), 3)
+        second = self.client.get(first['next']).json()
+        self.assertEqual(
+            [comment['text'] for comment in second['results']],
+            ['Комментарий 3'],
+        )
+
+    def test_not_modified_without_queries(self):
+        """Повторный запрос с If-None-Match получает 304 без SQL."""
+        url = reverse('api:post_list')
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        with CaptureQueriesContext(connection) as queries:
+            repeated = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(repeated.status_code, 304)
+        self.assertEqual(len(queries), 0, queries.captured_queries)
+        Post.objects.create(author=self.author, text='Новый пост')
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertEqual(fresh.json()['results'][0]['text'], 'Новый пост')
+
+    def test_comment_changes_post_etag(self):
+        """Новый комментарий меняет ETag поста и лент с этим постом."""
+        urls = [
+            reverse('api:post_detail', args=[self.posts[0].pk]),
+            reverse('api:post_list'),
+        ]
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        Comment.objects.create(
+            post=self.posts[0], author=self.user, text='Ещё один'
+        )
+        responses = {
+            url: self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            for url, etag in etags.items()
+        }
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(responses[urls[0]].json()['comments_count'], 2)
+
+    def test_rename_changes_etag(self):
+        """Переименование автора или группы меняет ETag лент и поста."""
+        urls = [
+            reverse('api:post_detail', args=[self.posts[0].pk]),
+            reverse('api:post_list'),
+            reverse('api:group_posts', args=['test-slug']),
+            reverse('api:comment_list', args=[self.posts[0].pk]),
+        ]
+        renames = [
+            (self.author, 'first_name', 'Алексей'),
+            (self.group, 'title', 'Новое название'),
+            (self.user, 'last_name', 'Читатель'),
+        ]
+        for instance, field, value in renames:
+            etags = {url: self.client.get(url)['ETag'] for url in urls}
+            setattr(instance, field, value)
+            instance.save()
+            for url, etag in etags.items():
+                with self.subTest(field=field, url=url):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 200)
+
+    def test_follow_feed(self):
+        """Лента подписок только для своих и с ETag по содержимому."""
+        url = reverse('api:follow_feed')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        response = self.auth_client.get(url)
+        self.assertEqual(len(response.json()['results']), 10)
+        repeated = self.auth_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(repeated.status_code, 304)
+
+    def test_not_found(self):
+        """Несуществующие объекты — 404 в JSON."""
+        urls = [
+            reverse('api:post_detail', args=[10 ** 6]),
+            reverse('api:group_posts', args=['missing']),
+            reverse('api:profile_detail', args=['missing']),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('detail', response.json())
@@ -0,0 +1,248 @@
+"""JSON API для чтения лент, постов, групп, профилей и комментариев.
+
+Ленты и посты отдают ETag и Last-Modified из версий feed_cache: их
+проверка стоит одного чтения кеша, и на повторный запрос клиента
+с If-None-Match ответ 304 уходит без обращения к постам в базе.
+Ответы без своей версии (лента подписок, профиль) помечаются ETag
+по содержимому — это экономит трафик, но не запросы.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import urlencode
+from django.views.decorators.http import condition, require_safe
+
+from core.routers import read_only_view
+from posts import counters, feed_cache, timeline
+from posts.models import Comment, Group, Post, User
+from posts.paginator import CursorPaginator
+
+from . import serializers
+
+
+def _json(payload, status=200):
+    body = json.dumps(
+        payload, cls=DjangoJSONEncoder, ensure_ascii=False,
+        separators=(',', ':'),
+    )
+    return HttpResponse(
+        body, status=status, content_type='application/json; charset=utf-8'
+    )
+
+
+def _error(detail, status):
+    return _json({'detail': detail}, status=status)
+
+
+def _content_conditional(request, response):
+    """ETag по телу ответа и 304, если оно у клиента уже есть."""
+    etag = f'"{hashlib.md5(response.content).hexdigest()}"'
+    response['ETag'] = etag
+    return get_conditional_response(
+        request, etag=etag, response=response
+    )
+
+
+def _feed_scopes(scope):
+    # Посты ленты, число комментариев у них, имена авторов и групп.
+    return [scope, feed_cache.comments_scope(scope), feed_cache.NAMES]
+
+
+def _scopes_index(request):
+    return _feed_scopes(feed_cache.INDEX)
+
+
+def _scopes_group(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_id is None:
+        return []
+    return _feed_scopes(feed_cache.group_scope(group_id))
+
+
+def _scopes_profile(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        return []
+    return _feed_scopes(feed_cache.profile_scope(author_id))
+
+
+def _scopes_post(request, post_id):
+    return [feed_cache.card_scope(post_id), feed_cache.NAMES]
+
+
+def _scopes_groups(request):
+    return [feed_cache.GROUPS]
+
+
+def read_only(view):
+    """Только GET и HEAD, чтение с соединения только для чтения.
+
+    Чтению транзакция ATOMIC_REQUESTS не нужна, а её SAVEPOINT и RELEASE
+    — это два лишних обращения к базе даже в ответе 304.
+    """
+    return read_only_view(require_safe(view))
+
+
+def versioned(get_scopes):
+    """Условный GET по версиям feed_cache для переданных областей."""
+
+    def versions(request, *args, **kwargs):
+        # condition() вызывает обе функции ниже, версии читаем один раз.
+        if not hasattr(request, '_api_versions'):
+            scopes = get_scopes(request, *args, **kwargs)
+            found = feed_cache.get_versions(scopes) if scopes else None
+            # Ответ с отстающей реплики не должен получить ETag новой
+            # версии: клиент получал бы 304 на старые данные.
+            if found and any(map(feed_cache.may_lag, found.values())):
+                found = None
+            request._api_versions = found
+        return request._api_versions
+
+    def etag(request, *args, **kwargs):
+        found = versions(request, *args, **kwargs)
+        if found is None:
+            return None
+        key = ':'.join(
+            [request.get_full_path(), *(found[s] for s in sorted(found))]
+        )
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        found = versions(request, *args, **kwargs)
+        if found is None:
+            return None
+        times = [feed_cache.version_time(v) for v in found.values()]
+        return max(times) if None not in times else None
+
+    def decorator(view):
+        return read_only(condition(
+            etag_func=etag, last_modified_func=last_modified
+        )(view))
+
+    return decorator
+
+
+def api_login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _error('Нужна авторизация.', 401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _page(request, rows, serializer, ordering=('-pub_date', '-pk'),
+          per_page=None):
+    paginator = CursorPaginator(
+        rows, per_page or settings.POSTS_PER_PAGE, ordering=ordering
+    )
+    return _serialize_page(
+        request, paginator.get_page(request.GET.get('cursor')), serializer
+    )
+
+
+def _serialize_page(request, page, serializer):
+
+    def link(cursor):
+        if cursor is None:
+            return None
+        return request.build_absolute_uri(
+            f'{request.path}?{urlencode({"cursor": cursor})}'
+        )
+
+    return {
+        'next': link(page.next_cursor),
+        'previous': link(page.previous_cursor),
+        'results': [serializer(row) for row in page.object_list],
+    }
+
+
+@versioned(_scopes_index)
+def post_list(request):
+    rows = Post.objects.values(*serializers.POST_FIELDS)
+    return _json(_page(request, rows, serializers.post))
+
+
+@versioned(_scopes_post)
+def post_detail(request, post_id):
+    row = Post.objects.filter(pk=post_id).values(
+        *serializers.POST_FIELDS
+    ).first()
+    if row is None:
+        return _error('Пост не найден.', 404)
+    return _json(serializers.post(row))
+
+
+@versioned(_scopes_post)
+def comment_list(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return _error('Пост не найден.', 404)
+    rows = Comment.objects.filter(post_id=post_id).values(
+        *serializers.COMMENT_FIELDS
+    )
+    return _json(_page(
+        request, rows, serializers.comment, ordering=('created', 'pk'),
+        per_page=settings.COMMENTS_PER_PAGE,
+    ))
+
+
+@versioned(_scopes_groups)
+def group_list(request):
+    rows = Group.objects.order_by('title').values(*serializers.GROUP_FIELDS)
+    return _json([serializers.group(row) for row in rows])
+
+
+@versioned(_scopes_group)
+def group_posts(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_id is None:
+        return _error('Группа не найдена.', 404)
+    rows = Post.objects.filter(group_id=group_id).values(
+        *serializers.POST_FIELDS
+    )
+    return _json(_page(request, rows, serializers.post))
+
+
+@read_only
+def profile_detail(request, username):
+    author = User.objects.select_related('stats').filter(
+        username=username
+    ).first()
+    if author is None:
+        return _error('Пользователь не найден.', 404)
+    payload = serializers.profile(author, counters.get_user_stats(author))
+    return _content_conditional(request, _json(payload))
+
+
+@versioned(_scopes_profile)
+def profile_posts(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        return _error('Пользователь не найден.', 404)
+    rows = Post.objects.filter(author_id=author_id).values(
+        *serializers.POST_FIELDS
+    )
+    return _json(_page(request, rows, serializers.post))
+
+
+@read_only
+@api_login_required
+def follow_feed(request):
+    page = timeline.get_page(
+        request, Post.objects.values(*serializers.POST_FIELDS)
+    )
+    response = _json(_serialize_page(request, page, serializers.post))
+    return _content_conditional(request, response)
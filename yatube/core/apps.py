@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.utils.autoreload import autoreload_started, file_changed
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .template_loaders import template_changed, watch_templates
+
+        autoreload_started.connect(watch_templates)
+        file_changed.connect(template_changed)
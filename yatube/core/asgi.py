@@ -0,0 +1,94 @@
+"""ASGI-приложение поверх WSGI-обработчика Django.
+
+В Django 2.2 нет ни ASGI-обработчика, ни асинхронных представлений,
+поэтому представления остаются синхронными и выполняются в пуле из
+ASGI_THREADS потоков. Соединения при этом держит цикл событий
+ASGI-сервера (uvicorn): медленный клиент, долгая отправка тела
+запроса или простаивающее keep-alive соединение не занимают ни поток,
+ни процесс, как у синхронного воркера gunicorn. Поток занят только на
+время работы самого представления.
+
+Перевод запроса и ответа между ASGI и WSGI делает asgiref.wsgi. Здесь
+к нему добавлено то, чего там нет: свой пул потоков (asgiref выполняет
+все вызовы в одном общем потоке, и запросы шли бы по очереди),
+закрытие ответа, протокол lifespan и уход клиента до конца тела.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref import wsgi
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+
+class ClientDisconnected(Exception):
+    """Клиент ушёл, не дослав тело запроса."""
+
+
+def _closing(wsgi_application):
+    """WSGI-приложение, которое закрывает ответ после отправки.
+
+    asgiref ответ не закрывает, а закрыть его нужно в том же потоке:
+    по сигналу request_finished Django закрывает соединения с базой,
+    а они у каждого потока свои.
+    """
+    def application(environ, start_response):
+        def start(status, headers, exc_info=None):
+            # Django отдаёт Set-Cookie с пробелом в начале значения,
+            # WSGI-серверы его срезают, h11 — отвергает.
+            headers = [(name, value.strip()) for name, value in headers]
+            return start_response(status, headers, exc_info)
+
+        response = wsgi_application(environ, start)
+        try:
+            yield from response
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+
+    return application
+
+
+class _Instance(wsgi.WsgiToAsgiInstance):
+    def __init__(self, wsgi_application, executor):
+        super().__init__(wsgi_application)
+        self.run_wsgi_app = sync_to_async(
+            partial(wsgi.WsgiToAsgiInstance.run_wsgi_app.__wrapped__, self),
+            thread_sensitive=False, executor=executor,
+        )
+
+
+class WsgiToAsgi(wsgi.WsgiToAsgi):
+    def __init__(self, wsgi_application):
+        super().__init__(_closing(wsgi_application))
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.ASGI_THREADS, thread_name_prefix='asgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+
+        async def request_messages():
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                raise ClientDisconnected
+            return message
+
+        try:
+            await _Instance(self.wsgi_application, self.executor)(
+                scope, request_messages, send
+            )
+        except ClientDisconnected:
+            pass
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
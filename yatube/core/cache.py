@@ -0,0 +1,290 @@
+"""Общий для всех процессов кеш в файле SQLite.
+
+LocMemCache у каждого воркера gunicorn свой: каждый прогревает его
+заново, а сброс версий лент до соседей не доходит. Этот бэкенд держит
+записи в одном файле SQLite в режиме WAL, поэтому им пользуются все
+процессы на машине. Поддерживаются TTL и вытеснение давно не читанных
+записей (LRU), когда записей становится больше MAX_ENTRIES.
+
+Счётчики (add_counters) лежат в отдельной таблице: у них нет TTL,
+и вытеснение их не касается — иначе редко читаемые накопленные
+значения уходили бы первыми.
+
+Подключение:
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+        }
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+
+# Время последнего чтения обновляется не чаще этого интервала: для LRU
+# точность в минуту достаточна, а запись на каждое чтение дорога.
+TOUCH_INTERVAL = 60
+# Сколько записей процесс делает между проверками переполнения.
+CULL_CHECK_EVERY = 100
+# Диапазон INTEGER в SQLite: 64 бита со знаком.
+INTEGER_MIN = -2 ** 63
+INTEGER_MAX = 2 ** 63 - 1
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    'CREATE TABLE IF NOT EXISTS counters ('
+    ' scope TEXT NOT NULL,'
+    ' name TEXT NOT NULL,'
+    ' value INTEGER NOT NULL,'
+    ' PRIMARY KEY (scope, name)'
+    ') WITHOUT ROWID',
+)
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = os.path.abspath(location)
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _connection(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=5, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _encode(self, value):
+        # Целые храним как есть, чтобы incr() выполнялся одним UPDATE;
+        # не влезающие в INTEGER SQLite — как любые другие значения.
+        if type(value) is int and INTEGER_MIN <= value <= INTEGER_MAX:
+            return value
+        return sqlite3.Binary(pickle.dumps(value, self.pickle_protocol))
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        lookup = {self._key(key, version): key for key in keys}
+        now = time.time()
+        placeholders = ','.join('?' * len(lookup))
+        rows = self._connection.execute(
+            f'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({placeholders}) '
+            f'AND (expires IS NULL OR expires > ?)',
+            [*lookup, now],
+        ).fetchall()
+        metrics.count('cache_hits', len(rows))
+        metrics.count('cache_misses', len(lookup) - len(rows))
+        stale = [
+            cache_key for cache_key, _, accessed in rows
+            if now - accessed > TOUCH_INTERVAL
+        ]
+        if stale:
+            self._connection.execute(
+                f'UPDATE cache SET accessed = ? '
+                f'WHERE key IN ({",".join("?" * len(stale))})',
+                [now, *stale],
+            )
+        return {
+            lookup[cache_key]: self._decode(value)
+            for cache_key, value, _ in rows
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        rows = [
+            (self._key(key, version), self._encode(value), expires, now)
+            for key, value in data.items()
+        ]
+        with self._transaction() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                rows,
+            )
+        self._maybe_cull(len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        cache_key = self._key(key, version)
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (cache_key, now),
+            )
+            added = connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                (cache_key, self._encode(value),
+                 self.get_backend_timeout(timeout), now),
+            ).rowcount
+        if added:
+            self._maybe_cull(1)
+        return bool(added)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return bool(self._connection.execute(
+            'UPDATE cache SET expires = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), self._key(key, version),
+             time.time()),
+        ).rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        cache_key = self._key(key, version)
+        with self._transaction() as connection:
+            updated = connection.execute(
+                "UPDATE cache SET value = value + ? "
+                "WHERE key = ? AND typeof(value) = 'integer' "
+                "AND (expires IS NULL OR expires > ?)",
+                (delta, cache_key, time.time()),
+            ).rowcount
+            if not updated:
+                raise ValueError(f"Key '{key}' not found")
+            (value,) = connection.execute(
+                'SELECT value FROM cache WHERE key = ?', (cache_key,)
+            ).fetchone()
+        return value
+
+    def has_key(self, key, version=None):
+        return self._connection.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time()),
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        cache_keys = [(self._key(key, version),) for key in keys]
+        with self._transaction() as connection:
+            connection.executemany(
+                'DELETE FROM cache WHERE key = ?', cache_keys
+            )
+
+    def add_counters(self, deltas):
+        """Прибавляет {(scope, name): delta} к счётчикам одной транзакцией."""
+        with self._transaction() as connection:
+            connection.executemany(
+                'INSERT INTO counters (scope, name, value) VALUES (?, ?, ?) '
+                'ON CONFLICT (scope, name) '
+                'DO UPDATE SET value = value + excluded.value',
+                [(scope, name, delta)
+                 for (scope, name), delta in deltas.items()],
+            )
+
+    def get_counters(self):
+        """Все счётчики в виде {(scope, name): value}."""
+        return {
+            (scope, name): value
+            for scope, name, value in self._connection.execute(
+                'SELECT scope, name, value FROM counters'
+            )
+        }
+
+    def clear(self):
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM cache')
+            connection.execute('DELETE FROM counters')
+
+    def close(self, **kwargs):
+        # Соединения живут всё время жизни потока: открытие файла и
+        # PRAGMA на каждый запрос стоили бы дороже самого кеша.
+        pass
+
+    def _transaction(self):
+        return _Transaction(self._connection)
+
+    def _maybe_cull(self, written):
+        self._writes += written
+        if self._writes < CULL_CHECK_EVERY:
+            return
+        self._writes = 0
+        self._cull()
+
+    def _cull(self):
+        with self._transaction() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+            )
+            (count,) = connection.execute(
+                'SELECT COUNT(*) FROM cache'
+            ).fetchone()
+            if count <= self._max_entries:
+                return
+            if self._cull_frequency == 0:
+                connection.execute('DELETE FROM cache')
+                return
+            connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                ' SELECT key FROM cache ORDER BY accessed LIMIT ?'
+                ')',
+                (count // self._cull_frequency,),
+            )
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE … COMMIT: запись сразу берёт блокировку файла."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.connection.execute('COMMIT')
+        else:
+            self.connection.execute('ROLLBACK')
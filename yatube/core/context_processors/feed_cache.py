@@ -0,0 +1,8 @@
+from django.conf import settings
+
+
+def feed_cache_timeout(request):
+    """Срок кеша лент: с ним кешируются фрагменты карточек постов."""
+    return {
+        'FEED_CACHE_TIMEOUT': settings.FEED_CACHE_TIMEOUT
+    }
@@ -0,0 +1,52 @@
+"""Бэкенд SQLite для боевой нагрузки.
+
+ENGINE 'core.db' — обычный бэкенд sqlite3, который при открытии
+соединения включает WAL (читатели не ждут писателей), ослабляет
+fsync до synchronous=NORMAL, отображает файл в память и увеличивает
+кеш страниц. OPTIONS['timeout'] задаёт, сколько соединение ждёт чужую
+блокировку записи, прежде чем сдаться.
+
+В WAL есть ловушка: транзакция, начатая обычным BEGIN, сначала читает,
+а при первой записи пытается повысить блокировку. Если кто-то успел
+записать раньше, SQLite сразу отвечает «database is locked», не дожидаясь
+timeout. ImmediateWriteMiddleware открывает транзакции запросов на
+запись через BEGIN IMMEDIATE: такой запрос ждёт своей очереди в начале,
+а не падает в середине.
+
+OPTIONS['read_only'] запрещает соединению запись (PRAGMA query_only) —
+для реплики, с которой читают ленты (см. core.routers). Файл такому
+псевдониму лучше открывать URI с mode=ro:
+
+    'NAME': 'file:/srv/yatube/db.sqlite3?mode=ro'
+"""
+import contextvars
+from contextlib import contextmanager
+
+_immediate = contextvars.ContextVar('immediate_transactions', default=False)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+def immediate_requested():
+    return _immediate.get()
+
+
+@contextmanager
+def immediate_transactions():
+    """Транзакции внутри блока сразу берут блокировку записи."""
+    token = _immediate.set(True)
+    try:
+        yield
+    finally:
+        _immediate.reset(token)
+
+
+class ImmediateWriteMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method in SAFE_METHODS:
+            return self.get_response(request)
+        with immediate_transactions():
+            return self.get_response(request)
@@ -0,0 +1,41 @@
+from django.db.backends.sqlite3 import base
+
+from . import immediate_requested
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    # В WAL с NORMAL сбой питания может потерять последние транзакции,
+    # но не портит базу; fsync на каждую запись не нужен.
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер в КиБ, а не в страницах.
+    'cache_size': -16 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    pragmas = PRAGMAS
+    read_only = False
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **params.pop('pragmas', {})}
+        self.read_only = params.pop('read_only', False)
+        if self.read_only:
+            # Режим журнала хранится в самом файле и задаётся при записи.
+            self.pragmas.pop('journal_mode', None)
+            self.pragmas['query_only'] = 'ON'
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        if immediate_requested() and not self.read_only:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
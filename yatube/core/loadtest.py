@@ -0,0 +1,155 @@
+"""Нагрузка на живой HTTP-сервер из множества одновременных соединений.
+
+Клиент на asyncio без сторонних библиотек: concurrency соединений
+по кругу запрашивают адреса из списка, пока не истечёт duration секунд.
+Соединение переиспользуется (keep-alive), если сервер его не закрыл.
+Результат — пропускная способность и перцентили задержки.
+
+Медленные клиенты (slow) моделируют плохую сеть: открывают соединение и
+шлют заголовки запроса по байту раз в секунду. Синхронный воркер
+gunicorn на всё это время занят таким клиентом, у асинхронного сервера
+соединение просто ждёт в цикле событий.
+"""
+import asyncio
+import itertools
+import time
+
+from posts.benchmark import percentile
+
+# Сколько секунд после конца замера ещё ждать начатый ответ.
+GRACE = 5
+
+
+class LoadError(Exception):
+    """Сервер ответил не по HTTP/1.1 или оборвал ответ."""
+
+
+async def _read_response(reader):
+    """Статус ответа и признак того, что соединение можно оставить."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise LoadError('Сервер закрыл соединение')
+    try:
+        status = int(status_line.split()[1])
+    except (IndexError, ValueError):
+        raise LoadError(f'Непонятная строка статуса {status_line!r}')
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    keep_alive = headers.get('connection', '').lower() != 'close'
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:
+        await reader.read()
+        keep_alive = False
+    return status, keep_alive
+
+
+async def _client(host, port, urls, deadline, timings, statuses):
+    reader = writer = None
+    for url in urls:
+        if time.monotonic() >= deadline:
+            break
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(
+                f'GET {url} HTTP/1.1\r\nHost: {host}:{port}\r\n'
+                f'Accept: text/html\r\n\r\n'.encode('latin-1')
+            )
+            await writer.drain()
+            # Ответ, не пришедший к концу замера, считаем ошибкой:
+            # иначе замер ждал бы таймаута воркера.
+            status, keep_alive = await asyncio.wait_for(
+                _read_response(reader),
+                max(deadline - time.monotonic(), 0) + GRACE,
+            )
+        except asyncio.TimeoutError:
+            status, keep_alive = 'timeout', False
+        except (OSError, LoadError, asyncio.IncompleteReadError):
+            status, keep_alive = 'error', False
+        else:
+            timings.append((time.perf_counter() - started) * 1000)
+        statuses[status] = statuses.get(status, 0) + 1
+        if not keep_alive and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def _slow_client(host, port, deadline):
+    try:
+        _, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        return
+    try:
+        writer.write(f'GET / HTTP/1.1\r\nHost: {host}:{port}\r\n'.encode())
+        while time.monotonic() < deadline:
+            await asyncio.sleep(1)
+            writer.write(b'X')
+            await writer.drain()
+    except OSError:
+        pass
+    finally:
+        writer.close()
+
+
+async def _run(host, port, urls, concurrency, duration, slow):
+    deadline = time.monotonic() + duration
+    timings, statuses = [], {}
+    slow_clients = [
+        asyncio.create_task(_slow_client(host, port, deadline))
+        for _ in range(slow)
+    ]
+    # Медленные клиенты успевают занять соединения до основной нагрузки.
+    await asyncio.sleep(0.1 if slow else 0)
+    await asyncio.gather(*slow_clients, *(
+        # Каждый клиент начинает со своего адреса, чтобы страницы
+        # нагружались равномерно.
+        _client(
+            host, port,
+            itertools.islice(itertools.cycle(urls), shift, None),
+            deadline, timings, statuses,
+        )
+        for shift in range(concurrency)
+    ))
+    return timings, statuses
+
+
+def run(host, port, urls, concurrency=10, duration=10.0, slow=0):
+    """Гоняет нагрузку и возвращает сводку для JSON."""
+    started = time.monotonic()
+    timings, statuses = asyncio.run(
+        _run(host, port, urls, concurrency, duration, slow)
+    )
+    elapsed = time.monotonic() - started
+    result = {
+        'concurrency': concurrency,
+        'slow_clients': slow,
+        'requests': len(timings),
+        'requests_per_second': round(len(timings) / elapsed, 1),
+        'errors': sum(
+            number for status, number in statuses.items()
+            if not isinstance(status, int) or status >= 500
+        ),
+        'statuses': {str(status): n for status, n in statuses.items()},
+    }
+    if timings:
+        result.update({
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+        })
+    return result
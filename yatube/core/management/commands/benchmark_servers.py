@@ -0,0 +1,194 @@
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.request import pathname2url
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import loadtest
+
+# Страницы, которые читатель открывает без входа.
+ROUTES = ('index', 'group_list', 'profile', 'post_detail')
+
+SETTINGS_TEMPLATE = '''\
+from yatube.settings import *  # noqa: F401,F403
+
+DEBUG = False
+DATABASES = {{
+    'default': {{**DATABASES['default'], 'NAME': {database!r}}},
+    'replica': {{**DATABASES['replica'], 'NAME': {replica!r}}},
+}}
+CACHES = {{'default': {{**CACHES['default'], 'LOCATION': {cache!r}}}}}
+MEDIA_ROOT = {media!r}
+THUMBNAIL_WORKERS = 0
+'''
+
+SEED_SCRIPT = '''\
+import json
+from posts import benchmark
+benchmark.seed(**json.loads({dataset!r}))
+print(json.dumps(benchmark.route_urls()))
+'''
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(
+                f'Сервер завершился с кодом {process.returncode}'
+            )
+        try:
+            socket.create_connection(('127.0.0.1', port), 0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise CommandError(f'Сервер не открыл порт {port} за {timeout} с')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность развёртывания через WSGI '
+        '(gunicorn) и ASGI (uvicorn) при многих одновременных соединениях'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--workers', type=int, default=2,
+                            help='Процессов у каждого сервера')
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 16, 64],
+            help='Числа одновременных соединений',
+        )
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help='Соединений, которые шлют заголовки по байту в секунду',
+        )
+        parser.add_argument('--duration', type=float, default=10.0,
+                            help='Секунд нагрузки на каждый замер')
+        parser.add_argument('--output', help='Куда записать JSON')
+
+    def handle(self, *args, **options):
+        workers = ['--workers', str(options['workers']),
+                   '--log-level', 'warning']
+        # Оба варианта под gunicorn: он ставит сокету TCP_NODELAY, а
+        # uvicorn --workers — нет, и ответ, отправленный двумя write
+        # (заголовки и тело), на keep-alive ждёт отложенного ACK 40 мс.
+        servers = {
+            'wsgi': ['yatube.wsgi:application', *workers],
+            'asgi': ['yatube.asgi:application', *workers,
+                     '--worker-class', 'uvicorn.workers.UvicornWorker'],
+        }
+        missing = [
+            name for name in ('gunicorn', 'uvicorn')
+            if importlib.util.find_spec(name) is None
+        ]
+        if missing:
+            raise CommandError(
+                f'Не установлены {", ".join(missing)}: '
+                f'pip install -r requirements.txt'
+            )
+        with tempfile.TemporaryDirectory() as directory:
+            env = self._environment(directory)
+            urls = self._seed(env, options)
+            results = {}
+            for name, command in servers.items():
+                results[name] = self._measure(
+                    name, command, env, urls, options
+                )
+        report = json.dumps(
+            {
+                'dataset': {
+                    'users': options['users'], 'posts': options['posts'],
+                },
+                'workers': options['workers'],
+                'duration': options['duration'],
+                'slow_clients': options['slow_clients'],
+                'urls': urls,
+                'servers': results,
+            },
+            ensure_ascii=False, indent=2,
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report)
+        else:
+            self.stdout.write(report)
+
+    def _environment(self, directory):
+        """Настройки отдельной базы, кеша и медиа во временном каталоге."""
+        database = os.path.join(directory, 'db.sqlite3')
+        media = os.path.join(directory, 'media')
+        os.mkdir(media)
+        with open(os.path.join(directory, 'bench_settings.py'), 'w') as file:
+            file.write(SETTINGS_TEMPLATE.format(
+                database=database,
+                # Реплика — тот же файл только для чтения, как по умолчанию.
+                replica=f'file:{pathname2url(database)}?mode=ro',
+                cache=os.path.join(directory, 'cache.sqlite3'),
+                media=media,
+            ))
+        return {
+            **os.environ,
+            'PYTHONPATH': os.pathsep.join([directory, settings.BASE_DIR]),
+            'DJANGO_SETTINGS_MODULE': 'bench_settings',
+        }
+
+    def _seed(self, env, options):
+        manage = [sys.executable, 'manage.py']
+        run = {'env': env, 'cwd': settings.BASE_DIR, 'check': True}
+        subprocess.run([*manage, 'migrate', '-v', '0'], **run)
+        dataset = json.dumps(
+            {'users': options['users'], 'posts': options['posts']}
+        )
+        seeded = subprocess.run(
+            [*manage, 'shell', '-c', SEED_SCRIPT.format(dataset=dataset)],
+            stdout=subprocess.PIPE, **run,
+        )
+        urls = json.loads(seeded.stdout.decode().strip().splitlines()[-1])
+        return [urls[name] for name in ROUTES]
+
+    def _measure(self, name, command, env, urls, options):
+        port = _free_port()
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', *command,
+             '--bind', f'127.0.0.1:{port}'],
+            env=env, cwd=settings.BASE_DIR,
+        )
+        try:
+            _wait_for_port(port, process)
+            # Прогрев: соединения с базой, кеш карточек, шаблоны.
+            loadtest.run('127.0.0.1', port, urls, concurrency=4,
+                         duration=1)
+            results = []
+            for concurrency in options['concurrency']:
+                result = loadtest.run(
+                    '127.0.0.1', port, urls,
+                    concurrency=concurrency,
+                    duration=options['duration'],
+                    slow=options['slow_clients'],
+                )
+                self.stderr.write(
+                    f'{name} c={concurrency}: '
+                    f'{result["requests_per_second"]} запр/с, '
+                    f'p95 {result.get("p95_ms", "—")} мс, '
+                    f'ошибок {result["errors"]}'
+                )
+                results.append(result)
+            return results
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
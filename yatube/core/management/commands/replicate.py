@@ -0,0 +1,65 @@
+import os
+import sqlite3
+import time
+from urllib.request import pathname2url
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def replicate(source, target):
+    """Копирует файл базы source в target через backup API SQLite.
+
+    Копия пишется поверх target, а не подменой файла: соединения
+    реплики, открытые надолго (CONN_MAX_AGE), сразу видят новые данные.
+    """
+    primary = sqlite3.connect(
+        f'file:{pathname2url(source)}?mode=ro', uri=True
+    )
+    replica = sqlite3.connect(target)
+    try:
+        primary.backup(replica)
+    finally:
+        replica.close()
+        primary.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу в файл реплики — замена репликации '
+        'для локального запуска с двумя файлами SQLite'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            default=connections['default'].settings_dict['NAME'],
+            help='Основная база; по умолчанию DATABASES["default"]',
+        )
+        parser.add_argument(
+            '--target', default=settings.REPLICA_PATH,
+            help='Файл реплики; по умолчанию REPLICA_PATH',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять каждые столько секунд; 0 — один раз',
+        )
+
+    def handle(self, *args, **options):
+        source, target = options['source'], options['target']
+        if os.path.abspath(source) == os.path.abspath(target):
+            raise CommandError(
+                'Реплика совпадает с основной базой: задайте REPLICA_PATH '
+                'или --target.'
+            )
+        while True:
+            started = time.monotonic()
+            replicate(source, target)
+            self.stdout.write(
+                f'Реплика обновлена за '
+                f'{(time.monotonic() - started) * 1000:.0f} мс'
+            )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,184 @@
+"""Раздача загруженных картинок и миниатюр из MEDIA_ROOT.
+
+Ответ строится по stat() файла: ETag из времени изменения и размера,
+Last-Modified, ответы 304 на If-None-Match и If-Modified-Since и
+диапазоны байтов (Range, If-Range) с ответом 206.
+
+Миниатюры sorl лежат под THUMBNAIL_PREFIX с именем из хеша исходника
+и параметров нарезки и никогда не перезаписываются, поэтому кешируются
+в браузере на год. Загруженные картинки тоже не перезаписываются
+(storage выбирает свободное имя), но пост можно удалить — им день.
+
+Если перед приложением стоит nginx или Apache, MEDIA_OFFLOAD передаёт
+им отправку тела: ответ приходит пустым с заголовком X-Accel-Redirect
+или X-Sendfile, а диапазоны и sendfile() делает веб-сервер.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+UPLOADS = 'public, max-age=86400'
+BLOCK_SIZE = 64 * 1024
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Недописанные миниатюры, см. posts.thumbnails.generate.
+HIDDEN_SUFFIXES = ('.partial',)
+
+
+def file_etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def cache_control(name):
+    if name.startswith(thumbnail_settings.THUMBNAIL_PREFIX):
+        return IMMUTABLE
+    return UPLOADS
+
+
+def parse_range(header, size):
+    """(начало, конец включительно) для Range или None — отдать целиком.
+
+    Несколько диапазонов через запятую не поддерживаются: на них,
+    как разрешает RFC 7233, уходит весь файл. Если диапазон начинается
+    за концом файла, возвращается False (ответ 416).
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-500: последние 500 байт.
+        length = int(last)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        return False
+    if end < start:
+        return None
+    return start, end
+
+
+def _file_range(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(BLOCK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        # Сравнение слабое (RFC 7232, 3.2).
+        tags = {
+            tag[2:] if tag.startswith('W/') else tag
+            for tag in parse_etags(if_none_match)
+        }
+        return if_none_match.strip() == '*' or etag in tags
+    since = parse_http_date_safe(
+        request.META.get('HTTP_IF_MODIFIED_SINCE', '')
+    )
+    return since is not None and int(mtime) <= since
+
+
+def _range_applies(request, etag, mtime):
+    """If-Range: диапазон только для той же версии файла."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is None:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and int(mtime) <= date
+
+
+def serve(request, name):
+    """Ответ с файлом name из MEDIA_ROOT; 404, если его нет."""
+    if name.endswith(HIDDEN_SUFFIXES):
+        raise Http404
+    try:
+        # safe_join не выпускает за MEDIA_ROOT путь с ../
+        path = safe_join(settings.MEDIA_ROOT, name)
+        stat = os.stat(path)
+    except (OSError, SuspiciousFileOperation):
+        raise Http404
+    if not os.path.isfile(path):
+        raise Http404
+    etag = file_etag(stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': cache_control(name),
+    }
+    content_type, encoding = mimetypes.guess_type(path)
+    content_type = content_type or 'application/octet-stream'
+
+    if _not_modified(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_OFFLOAD:
+        response = _offload(name, path, content_type)
+    else:
+        response = _send(request, path, stat, content_type, etag)
+    for header, value in headers.items():
+        response[header] = value
+    if encoding is not None:
+        response['Content-Encoding'] = encoding
+    return response
+
+
+def _offload(name, path, content_type):
+    """Пустой ответ: тело отправит веб-сервер перед приложением."""
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_OFFLOAD == 'X-Accel-Redirect':
+        response['X-Accel-Redirect'] = quote(
+            settings.MEDIA_ACCEL_REDIRECT_PREFIX + name
+        )
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def _send(request, path, stat, content_type, etag):
+    size = stat.st_size
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and _range_applies(
+        request, etag, stat.st_mtime
+    ):
+        byte_range = parse_range(request.META['HTTP_RANGE'], size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        # FileResponse добавляет inline-имя файла, картинке оно ни к чему.
+        del response['Content-Disposition']
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _file_range(path, start, end - start + 1),
+            status=206, content_type=content_type,
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,292 @@
+"""Лёгкие метрики запросов для боевого режима.
+
+MetricsMiddleware собирает для каждого запроса время ответа, число и
+время SQL-запросов, время рендеринга шаблонов, попадания и промахи
+кеша и время нарезки миниатюр. Они уходят клиенту заголовком
+Server-Timing и копятся в агрегате по имени маршрута (posts:index,
+posts:profile…).
+
+Агрегат каждого процесса раз в METRICS_FLUSH_INTERVAL секунд
+прибавляется одной транзакцией к счётчикам общего кеша (таблица
+counters, которую не трогает вытеснение), поэтому /metrics/ отдаёт
+в формате Prometheus сумму по всем воркерам, а не по одному.
+"""
+import contextvars
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы времени ответа, в секундах.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+# Время хранится в целых микросекундах: счётчики в кеше целые.
+MICROSECONDS = 1_000_000
+# Метрики вне запроса, например нарезка миниатюр в фоновом пуле.
+BACKGROUND = 'background'
+# Префиксы полей агрегата с временем и числом рендеров шаблона.
+TEMPLATE_US = 'template_us:'
+TEMPLATE_RENDERS = 'template_renders:'
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Счётчики одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = defaultdict(float)
+        self.counts = defaultdict(int)
+        # Время и число рендеров по именам шаблонов, вложенные включены.
+        self.templates = defaultdict(float)
+        self.renders = defaultdict(int)
+
+    def duration(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        parts = [f'app;dur={self.duration() * 1000:.1f}']
+        if self.counts['db_queries']:
+            parts.append(
+                f'db;dur={self.timings["db"] * 1000:.1f};'
+                f'desc="{self.counts["db_queries"]} queries"'
+            )
+        for name in ('template', 'thumbnail'):
+            if name in self.timings:
+                parts.append(f'{name};dur={self.timings[name] * 1000:.1f}')
+        if self.counts['cache_hits'] or self.counts['cache_misses']:
+            parts.append(
+                f'cache;desc="hit={self.counts["cache_hits"]} '
+                f'miss={self.counts["cache_misses"]}"'
+            )
+        return ', '.join(parts)
+
+
+def count(name, value=1):
+    """Увеличивает счётчик текущего запроса; вне запроса не считает.
+
+    Иначе сам сброс агрегата в кеш считал бы свои обращения к кешу.
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.counts[name] += value
+
+
+@contextmanager
+def timer(name):
+    """Добавляет время блока к метрике name."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.timings[name] += elapsed
+        else:
+            aggregate.add(
+                BACKGROUND, {f'{name}_us': int(elapsed * MICROSECONDS)}
+            )
+
+
+@contextmanager
+def template_timer(name):
+    """Время рендеринга шаблона name; вне запроса не считается."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.templates[name] += time.perf_counter() - started
+        metrics.renders[name] += 1
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.timings['db'] += time.perf_counter() - started
+        metrics.counts['db_queries'] += 1
+
+
+class Aggregate:
+    """Накопленные в процессе метрики по маршрутам до сброса в кеш."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = defaultdict(lambda: defaultdict(int))
+        self._flushed = time.monotonic()
+
+    def add(self, view, values):
+        with self._lock:
+            for name, value in values.items():
+                self._values[view][name] += value
+
+    def add_request(self, view, metrics):
+        duration = metrics.duration()
+        values = {
+            'requests': 1,
+            'duration_us': int(duration * MICROSECONDS),
+            'db_us': int(metrics.timings['db'] * MICROSECONDS),
+            'template_us': int(metrics.timings['template'] * MICROSECONDS),
+            'thumbnail_us': int(
+                metrics.timings['thumbnail'] * MICROSECONDS
+            ),
+            **metrics.counts,
+        }
+        for name, seconds in metrics.templates.items():
+            values[f'{TEMPLATE_US}{name}'] = int(seconds * MICROSECONDS)
+            values[f'{TEMPLATE_RENDERS}{name}'] = metrics.renders[name]
+        for bound in BUCKETS:
+            if duration <= bound:
+                values[f'le_{bound}'] = 1
+        self.add(view, values)
+
+    def flush_if_due(self):
+        interval = settings.METRICS_FLUSH_INTERVAL
+        if time.monotonic() - self._flushed >= interval:
+            self.flush()
+
+    def flush(self):
+        """Переносит накопленное в счётчики общего кеша.
+
+        Сбой записи (например, файл кеша занят дольше таймаута) не
+        доходит до ответа: значения возвращаются в агрегат и уйдут
+        со следующим сбросом.
+        """
+        with self._lock:
+            values, self._values = self._values, defaultdict(
+                lambda: defaultdict(int)
+            )
+            self._flushed = time.monotonic()
+        deltas = {
+            (view, name): value
+            for view, fields in values.items()
+            for name, value in fields.items() if value
+        }
+        if not deltas:
+            return
+        try:
+            cache.add_counters(deltas)
+        except sqlite3.Error:
+            logger.warning('Не удалось сбросить метрики', exc_info=True)
+            for view, fields in values.items():
+                self.add(view, fields)
+
+
+aggregate = Aggregate()
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_sql_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unmatched'
+        response['Server-Timing'] = metrics.server_timing()
+        aggregate.add_request(view, metrics)
+        aggregate.flush_if_due()
+        return response
+
+
+METRICS = (
+    ('requests', 'yatube_requests_total', 'counter', 1,
+     'Запросы по маршрутам'),
+    ('db_queries', 'yatube_db_queries_total', 'counter', 1,
+     'SQL-запросы'),
+    ('db_us', 'yatube_db_seconds_total', 'counter', MICROSECONDS,
+     'Время SQL-запросов'),
+    ('template_us', 'yatube_template_seconds_total', 'counter', MICROSECONDS,
+     'Время рендеринга шаблонов'),
+    ('cache_hits', 'yatube_cache_hits_total', 'counter', 1,
+     'Попадания в кеш'),
+    ('cache_misses', 'yatube_cache_misses_total', 'counter', 1,
+     'Промахи кеша'),
+    ('thumbnail_us', 'yatube_thumbnail_seconds_total', 'counter',
+     MICROSECONDS, 'Время нарезки миниатюр'),
+)
+
+
+def render_prometheus():
+    """Текст метрик в формате экспозиции Prometheus."""
+    aggregate.flush()
+    stored = cache.get_counters()
+    views = sorted({view for view, _ in stored})
+    templates = sorted({
+        name[len(TEMPLATE_US):] for _, name in stored
+        if name.startswith(TEMPLATE_US)
+    })
+
+    def value(view, name):
+        return stored.get((view, name), 0)
+
+    lines = []
+    for name, metric, kind, scale, description in METRICS:
+        lines += [f'# HELP {metric} {description}', f'# TYPE {metric} {kind}']
+        for view in views:
+            number = _number(value(view, name), scale)
+            lines.append(f'{metric}{{view="{view}"}} {number}')
+    metric = 'yatube_request_duration_seconds'
+    lines += [
+        f'# HELP {metric} Время ответа',
+        f'# TYPE {metric} histogram',
+    ]
+    for view in views:
+        for bound in BUCKETS:
+            lines.append(
+                f'{metric}_bucket{{view="{view}",le="{bound}"}} '
+                f'{value(view, f"le_{bound}")}'
+            )
+        lines += [
+            f'{metric}_bucket{{view="{view}",le="+Inf"}} '
+            f'{value(view, "requests")}',
+            f'{metric}_sum{{view="{view}"}} '
+            f'{_number(value(view, "duration_us"), MICROSECONDS)}',
+            f'{metric}_count{{view="{view}"}} {value(view, "requests")}',
+        ]
+    for prefix, metric, scale, description in (
+        (TEMPLATE_US, 'yatube_template_render_seconds_total', MICROSECONDS,
+         'Время рендеринга по шаблонам, вложенные включены'),
+        (TEMPLATE_RENDERS, 'yatube_template_renders_total', 1,
+         'Рендеры по шаблонам'),
+    ):
+        lines += [f'# HELP {metric} {description}', f'# TYPE {metric} counter']
+        for view in views:
+            for template in templates:
+                if value(view, f'{TEMPLATE_RENDERS}{template}'):
+                    lines.append(
+                        f'{metric}{{view="{view}",template="{template}"}} '
+                        f'{_number(value(view, prefix + template), scale)}'
+                    )
+    return '\n'.join(lines) + '\n'
+
+
+def _number(value, scale):
+    return value if scale == 1 else f'{value / scale:.6f}'
@@ -0,0 +1,158 @@
+"""Чтение лент с реплики и запись в основную базу.
+
+Представления, обёрнутые в replica_reads, на GET и HEAD читают
+с псевдонима REPLICA_DATABASE. Это файл SQLite, открытый только для
+чтения: либо сам основной файл, либо его копия, которую свежей держит
+команда replicate. Запись всегда идёт в default.
+
+Копия отстаёт от основной базы, поэтому автор должен сразу видеть свой
+пост или комментарий (read-your-writes). Запрос, который что-то записал,
+до конца читает с default. ReplicaMiddleware ставит такому клиенту
+cookie на REPLICA_STICKY_SECONDS, и все его чтения в это время тоже идут
+в default.
+
+Кеш общий для всех клиентов, поэтому то, что прочитано с реплики
+вскоре после записи, нельзя класть под ключ, который прочтёт автор:
+replica_may_lag() подсказывает кешу, что данные могут быть старыми.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from core.db import SAFE_METHODS
+
+REPLICA_DATABASE = 'replica'
+STICKY_COOKIE = 'read_primary'
+
+
+class _State:
+    """Чтение с реплики разрешено, пока не было записи."""
+
+    def __init__(self, sticky=False):
+        self.replica = False
+        self.sticky = sticky
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('replica_state', default=None)
+
+
+@contextmanager
+def _request_state(sticky):
+    token = _state.set(_State(sticky))
+    try:
+        yield _state.get()
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def replica_database():
+    """Чтения внутри блока идут на реплику, если запись их не отменила."""
+    state = _state.get()
+    if state is None:
+        with _request_state(sticky=False) as state:
+            state.replica = True
+            yield
+        return
+    previous, state.replica = state.replica, True
+    try:
+        yield
+    finally:
+        state.replica = previous
+
+
+def replica_reads(view):
+    """GET и HEAD представления читают с реплики."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+        with replica_database():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def read_only_view(view):
+    """Чтение с реплики и без транзакции ATOMIC_REQUESTS.
+
+    Транзакция на default такому представлению не нужна: BEGIN и COMMIT
+    были бы лишними обращениями к базе.
+    """
+    return transaction.non_atomic_requests(replica_reads(view))
+
+
+def _is_mirror(alias):
+    # В тестах псевдоним — зеркало тестовой базы default (TEST['MIRROR'])
+    # с тем же NAME, а данные теста живут в незакрытой транзакции default
+    # и с другого соединения не видны. Читаем тем же соединением.
+    return (
+        connections[alias].settings_dict['NAME']
+        == connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+    )
+
+
+def _reads_replica():
+    state = _state.get()
+    return (
+        state is not None
+        and state.replica
+        and not state.sticky
+        and not state.wrote
+        and REPLICA_DATABASE in connections.databases
+        and not _is_mirror(REPLICA_DATABASE)
+    )
+
+
+def replica_may_lag(since):
+    """Может ли чтение в этом запросе не видеть записей с момента since.
+
+    since — время в секундах от эпохи или None, если оно неизвестно.
+    Реплика догоняет основную базу за REPLICA_STICKY_SECONDS.
+    """
+    if not _reads_replica():
+        return False
+    return since is None or time.time() - since < (
+        settings.REPLICA_STICKY_SECONDS
+    )
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _reads_replica():
+            return REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db == REPLICA_DATABASE:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """Читает с основной базы у клиента, который недавно что-то записал."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sticky = STICKY_COOKIE in request.COOKIES
+        with _request_state(sticky) as state:
+            response = self.get_response(request)
+        if state.wrote:
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,148 @@
+"""Сессии в общем кеше с отложенной записью в базу.
+
+SESSION_ENGINE = 'core.sessions'. Сессия читается из кеша (core.cache),
+в базу идут только промахи. В отличие от cached_db, сохранение не ждёт
+базы: данные сразу кладутся в кеш, а строка django_session пишется
+позже одним фоновым потоком. Поток один, поэтому записи и удаления
+одной сессии доходят до базы в том порядке, в каком их сделали.
+
+Сессии пишутся и читаются только в default, мимо роутера: запись
+сессии не делает клиента «липким» к основной базе (см. core.routers).
+Таблица остаётся источником истины для сессий, вытесненных из кеша,
+и для clearsessions. Запись, поставленная в очередь, но не дошедшая до
+базы, переживает штатную остановку процесса: пул дожидается очереди
+при выходе интерпретатора.
+
+Удалённая сессия остаётся в кеше меткой DELETED: строка в базе ещё
+ждёт фонового удаления, и запрос, прочитавший её в это время, иначе
+вернул бы в кеш сессию, из которой пользователь уже вышел.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.contrib.sessions.backends.base import CreateError, UpdateError
+from django.core.exceptions import SuspiciousOperation
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Значение в кеше вместо данных удалённой сессии; данные — всегда dict.
+DELETED = 'deleted'
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='sessions'
+            )
+        return _executor
+
+
+def _run(task, description):
+    # Поток живёт долго: соединение с базой он ведёт, как запрос, —
+    # с учётом CONN_MAX_AGE и проверкой на разрыв.
+    close_old_connections()
+    try:
+        task()
+    except Exception:
+        logger.exception('Не удалось %s', description)
+    finally:
+        close_old_connections()
+
+
+def write_behind(task, description):
+    """Выполняет task в фоновом потоке или сразу внутри транзакции.
+
+    Открытую транзакцию (тесты, shell с atomic) фоновый поток не видит и
+    ждал бы её блокировку, поэтому внутри неё запись идёт сразу и
+    фиксируется вместе с ней.
+    """
+    if transaction.get_connection().in_atomic_block:
+        task()
+        return
+    _get_executor().submit(_run, task, description)
+
+
+class SessionStore(cached_db.SessionStore):
+    def load(self):
+        data = self._cache.get(self.cache_key)
+        if data == DELETED:
+            self._session_key = None
+            return {}
+        if data is not None:
+            return data
+        session = self._get_session_from_db()
+        if not session:
+            return {}
+        data = self.decode(session.session_data)
+        # add(), а не set(): метку DELETED, поставленную после чтения
+        # строки, перезаписывать нельзя.
+        self._cache.add(
+            self.cache_key, data,
+            self.get_expiry_age(expiry=session.expire_date),
+        )
+        return data
+
+    def _get_session_from_db(self):
+        # Как в db.SessionStore, но промах кеша читает default: реплика
+        # может не успеть получить строку, а сессия, которой «нет»,
+        # разлогинила бы пользователя.
+        try:
+            return self.model.objects.using(DEFAULT_DB_ALIAS).get(
+                session_key=self.session_key,
+                expire_date__gt=timezone.now(),
+            )
+        except (self.model.DoesNotExist, SuspiciousOperation) as error:
+            if isinstance(error, SuspiciousOperation):
+                logging.getLogger(
+                    f'django.security.{error.__class__.__name__}'
+                ).warning(str(error))
+            self._session_key = None
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        expiry = self.get_expiry_age()
+        if must_create:
+            # Уникальность ключа проверяет атомарный add() кеша.
+            if not self._cache.add(self.cache_key, data, expiry):
+                raise CreateError
+        elif self._cache.get(self.cache_key) == DELETED:
+            # Как у db-бэкенда: сессию удалили, пока шёл запрос.
+            raise UpdateError
+        else:
+            self._cache.set(self.cache_key, data, expiry)
+        instance = self.create_model_instance(data)
+        write_behind(
+            lambda: instance.save(
+                using=DEFAULT_DB_ALIAS,
+                force_insert=must_create, force_update=not must_create,
+            ),
+            f'сохранить сессию {instance.session_key[:8]}…',
+        )
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        self._cache.set(
+            self.cache_key_prefix + session_key, DELETED,
+            settings.SESSION_COOKIE_AGE,
+        )
+        write_behind(
+            lambda: self.model.objects.using(DEFAULT_DB_ALIAS).filter(
+                session_key=session_key
+            ).delete(),
+            f'удалить сессию {session_key[:8]}…',
+        )
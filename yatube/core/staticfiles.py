@@ -0,0 +1,201 @@
+"""Статика с хешами в именах, заранее сжатая и отдаваемая из процесса.
+
+collectstatic через CompressedManifestStorage копирует файлы в
+STATIC_ROOT под именами с хешем содержимого (bootstrap.min.3f2a….css)
+и рядом кладёт сжатые копии .gz и, если установлен пакет Brotli, .br.
+Имя меняется вместе с содержимым, поэтому такие файлы можно кешировать
+в браузере навсегда.
+
+StaticFilesMiddleware при старте процесса один раз обходит STATIC_ROOT
+и держит в памяти для каждого адреса путь, размер, ETag и сжатые
+варианты. Запрос к статике не доходит до остальных middleware и
+представлений: выбирается вариант по Accept-Encoding, на совпавший
+If-None-Match уходит 304 без тела, иначе файл отдаётся через
+wsgi.file_wrapper (sendfile у gunicorn).
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Уже сжатые форматы (картинки, шрифты woff2) повторно не жмутся.
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.js', '.map', '.json', '.svg', '.txt', '.xml', '.html',
+    '.ico', '.ttf', '.eot',
+}
+# Сжатая копия нужна, только если она заметно меньше оригинала.
+MIN_RATIO = 0.95
+# Имя с хешем из ManifestStaticFilesStorage: name.0123456789ab.ext
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Файлы без хеша могут поменяться при следующей выкладке.
+SHORT_LIVED = 'public, max-age=60'
+# Варианты в порядке предпочтения: кодировка и суффикс файла.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def compress(content):
+    """Сжатые копии содержимого: {'.gz': bytes, '.br': bytes}."""
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content)
+    return {
+        suffix: data for suffix, data in variants.items()
+        if len(data) < len(content) * MIN_RATIO
+    }
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+    """Манифест с хешами плюс сжатые копии каждого текстового файла.
+
+    Пока манифеста нет (collectstatic не запускали, например в тестах),
+    {% static %} отдаёт имя без хеша вместо ошибки ValueError. Файл,
+    которого нет в существующем манифесте, — по-прежнему ошибка.
+    """
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if os.path.splitext(name)[1] not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            with self.open(name) as file:
+                content = file.read()
+            for suffix, data in compress(content).items():
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(data))
+
+
+class StaticFile:
+    """Файл из STATIC_ROOT и его сжатые варианты."""
+
+    def __init__(self, path, url):
+        self.path = path
+        self.content_type = (
+            mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        )
+        with open(path, 'rb') as file:
+            digest = hashlib.md5(file.read()).hexdigest()
+        self.etag = f'"{digest}"'
+        self.cache_control = (
+            IMMUTABLE if HASHED_NAME.search(url) else SHORT_LIVED
+        )
+        self.variants = [
+            (encoding, path + suffix) for encoding, suffix in ENCODINGS
+            if os.path.exists(path + suffix)
+        ]
+
+    def choose(self, accept_encoding):
+        """Кодировка и путь лучшего варианта, который принимает клиент."""
+        accepted = _accepted_encodings(accept_encoding)
+        for encoding, path in self.variants:
+            if encoding in accepted:
+                return encoding, path
+        return None, self.path
+
+
+def _accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        encoding, _, params = part.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q=') and quality[2:] in ('0', '0.0', '0.00'):
+            continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+def scan(root, url_prefix):
+    """Адрес → StaticFile для всех файлов STATIC_ROOT, кроме сжатых копий."""
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(('.gz', '.br')):
+                continue
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, root).replace(os.sep, '/')
+            url = url_prefix + relative
+            files[url] = StaticFile(path, url)
+    return files
+
+
+class StaticFilesMiddleware:
+    """Отдаёт собранную collectstatic статику, минуя представления.
+
+    При DEBUG не используется: runserver раздаёт статику прямо из
+    STATICFILES_DIRS, и правки видны без collectstatic.
+    """
+
+    def __init__(self, get_response):
+        if settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        root = settings.STATIC_ROOT
+        self.files = (
+            scan(root, self.prefix) if root and os.path.isdir(root) else {}
+        )
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path.startswith(
+            self.prefix
+        ):
+            static_file = self.files.get(unquote(request.path))
+            if static_file is not None:
+                return self.serve(request, static_file)
+        return self.get_response(request)
+
+    def serve(self, request, static_file):
+        encoding, path = static_file.choose(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        etag = static_file.etag
+        if encoding is not None:
+            etag = f'{etag[:-1]}-{encoding}"'
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        # Сравнение слабое: любой вариант одного содержимого подходит.
+        if if_none_match and (
+            if_none_match.strip() == '*'
+            or {_strip_weak(tag) for tag in parse_etags(if_none_match)}
+            & {static_file.etag, etag}
+        ):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(
+                open(path, 'rb'), content_type=static_file.content_type
+            )
+            # FileResponse называет файл по имени на диске (.br, .gz).
+            del response['Content-Disposition']
+            if encoding is not None:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Cache-Control'] = static_file.cache_control
+        if static_file.variants:
+            response['Vary'] = 'Accept-Encoding'
+        return response
+
+
+def _strip_weak(tag):
+    return tag[2:] if tag.startswith('W/') else tag
@@ -0,0 +1,126 @@
+import asyncio
+import threading
+
+from django.test import SimpleTestCase
+
+from ..asgi import WsgiToAsgi
+
+
+class EchoResponse(list):
+    """Ответ, который запоминает, в каком потоке его закрыли."""
+
+    closed_in = None
+
+    def close(self):
+        EchoResponse.closed_in = threading.current_thread().name
+
+
+def echo_application(environ, start_response):
+    """WSGI-приложение, которое возвращает тело запроса и часть environ."""
+    body = environ['wsgi.input'].read()
+    start_response('201 Created', [
+        ('Content-Type', 'text/plain'),
+        ('Set-Cookie', ' name=value'),
+    ])
+    return EchoResponse([
+        environ['PATH_INFO'].encode('latin-1'), b'|',
+        environ['QUERY_STRING'].encode(), b'|',
+        environ.get('HTTP_ACCEPT', '').encode(), b'|',
+        body,
+    ])
+
+
+def call(application, scope, messages):
+    """Прогоняет запрос через ASGI-приложение; возвращает отправленное."""
+    sent = []
+    incoming = iter(messages)
+
+    async def receive():
+        return next(incoming)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    return sent
+
+
+def http_scope(method='GET', path='/', query_string=b'', headers=()):
+    return {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query_string,
+        'headers': list(headers),
+        'http_version': '1.1',
+        'scheme': 'http',
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 5000),
+    }
+
+
+class WsgiToAsgiTest(SimpleTestCase):
+    def setUp(self):
+        self.application = WsgiToAsgi(echo_application)
+        self.addCleanup(self.application.executor.shutdown)
+
+    def test_response(self):
+        """Статус, заголовки и тело ответа доходят до сервера."""
+        sent = call(
+            self.application,
+            http_scope(path='/posts/1/', query_string=b'page=2'),
+            [{'type': 'http.request', 'body': b''}],
+        )
+        self.assertEqual(sent[0]['type'], 'http.response.start')
+        self.assertEqual(sent[0]['status'], 201)
+        self.assertIn((b'set-cookie', b'name=value'), sent[0]['headers'])
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertEqual(body, b'/posts/1/|page=2||')
+        self.assertFalse(sent[-1].get('more_body', False))
+        self.assertTrue(EchoResponse.closed_in.startswith('asgi'))
+
+    def test_request_body(self):
+        """Тело из нескольких сообщений склеивается в wsgi.input."""
+        sent = call(
+            self.application,
+            http_scope(method='POST'),
+            [
+                {'type': 'http.request', 'body': b'text=', 'more_body': True},
+                {'type': 'http.request', 'body': b'hello'},
+            ],
+        )
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertEqual(body, b'/|||text=hello')
+
+    def test_disconnect_before_body(self):
+        """Клиент ушёл, не дослав тело: представление не вызывается."""
+        sent = call(
+            self.application,
+            http_scope(method='POST'),
+            [{'type': 'http.disconnect'}],
+        )
+        self.assertEqual(sent, [])
+
+    def test_lifespan(self):
+        sent = call(
+            WsgiToAsgi(echo_application),
+            {'type': 'lifespan'},
+            [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}],
+        )
+        self.assertEqual(
+            [message['type'] for message in sent],
+            ['lifespan.startup.complete', 'lifespan.shutdown.complete'],
+        )
+
+    def test_headers_and_path(self):
+        """Путь в UTF-8 и повторяющиеся заголовки доходят до WSGI."""
+        sent = call(
+            self.application,
+            http_scope(
+                path='/profile/лев/',
+                headers=[(b'accept', b'text/html'), (b'accept', b'*/*')],
+            ),
+            [{'type': 'http.request', 'body': b''}],
+        )
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertEqual(body.decode(), '/profile/лев/||text/html,*/*|')
@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from ..cache import SQLiteCache
+
+
+def write_from_child(location):
+    SQLiteCache(location, {}).set('from-child', {'pid': os.getpid()})
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {
+            'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2},
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_set_get_delete(self):
+        """Значения переживают сериализацию, удаление работает."""
+        self.cache.set('key', {'posts': [1, 2]})
+        self.cache.set_many({'one': 1, 'two': 'два'})
+        self.assertEqual(self.cache.get('key'), {'posts': [1, 2]})
+        self.assertEqual(
+            self.cache.get_many(['one', 'two', 'missing']),
+            {'one': 1, 'two': 'два'},
+        )
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_timeout(self):
+        """Просроченное значение не читается и может быть добавлено."""
+        self.cache.set('key', 'old', timeout=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertFalse(self.cache.add('key', 'newer'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_incr(self):
+        """incr атомарно увеличивает целые и падает на отсутствующих."""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_big_integers(self):
+        """Целые вне диапазона INTEGER SQLite хранятся без переполнения."""
+        values = {'big': 2 ** 63, 'small': -2 ** 63 - 1, 'max': 2 ** 63 - 1}
+        self.cache.set_many(values)
+        self.assertTrue(self.cache.add('huge', 10 ** 30))
+        self.assertEqual(self.cache.get_many(values), values)
+        self.assertEqual(self.cache.get('huge'), 10 ** 30)
+
+    def test_counters_survive_cull(self):
+        """Счётчики складываются и не вытесняются при переполнении."""
+        self.cache.add_counters({('view', 'requests'): 2, ('view', 'x'): 1})
+        self.cache.add_counters({('view', 'requests'): 3})
+        self.cache.set_many({f'key-{i}': i for i in range(200)})
+        self.assertEqual(
+            self.cache.get_counters(),
+            {('view', 'requests'): 5, ('view', 'x'): 1},
+        )
+
+    def test_cull_evicts_least_recently_used(self):
+        """При переполнении вытесняются давно не читанные записи."""
+        for i in range(11):
+            self.cache.set(f'key{i}', i)
+        self.cache._connection.execute(
+            'UPDATE cache SET accessed = 0 WHERE key LIKE ?', ('%key0',)
+        )
+        self.cache._cull()
+        self.assertIsNone(self.cache.get('key0'))
+        self.assertEqual(self.cache.get('key10'), 10)
+
+    def test_shared_between_processes(self):
+        """Запись из другого процесса видна в этом."""
+        process = multiprocessing.get_context('spawn').Process(
+            target=write_from_child, args=(self.location,)
+        )
+        process.start()
+        process.join()
+        self.assertEqual(
+            self.cache.get('from-child'), {'pid': process.pid}
+        )
@@ -0,0 +1,67 @@
+import os
+import sqlite3
+import tempfile
+from urllib.request import pathname2url
+
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase
+
+from ..db import immediate_transactions
+from ..db.base import DatabaseWrapper
+
+
+class SQLiteBackendTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'db.sqlite3')
+
+    def wrapper(self, name, **options):
+        settings_dict = {
+            **connection.settings_dict,
+            'NAME': name,
+            'OPTIONS': options,
+        }
+        wrapper = DatabaseWrapper(settings_dict, alias='tuned')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        """Пишущее соединение в WAL, читающее не может писать."""
+        writer = self.wrapper(self.path)
+        self.assertEqual(self.pragma(writer, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(writer, 'synchronous'), 1)
+        self.assertEqual(self.pragma(writer, 'mmap_size'), 256 * 1024 * 1024)
+        with writer.cursor() as cursor:
+            cursor.execute('CREATE TABLE note (text TEXT)')
+
+        reader = self.wrapper(
+            f'file:{pathname2url(self.path)}?mode=ro', read_only=True
+        )
+        self.assertEqual(self.pragma(reader, 'query_only'), 1)
+        with self.assertRaises(OperationalError):
+            with reader.cursor() as cursor:
+                cursor.execute("INSERT INTO note VALUES ('нельзя')")
+
+    def test_immediate_transactions(self):
+        """Транзакция записи берёт блокировку сразу, а не на первой записи."""
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+
+        writer = self.wrapper(self.path)
+        writer.ensure_connection()
+        writer._start_transaction_under_autocommit()
+        other.execute('BEGIN IMMEDIATE')
+        other.execute('ROLLBACK')
+        writer.connection.execute('ROLLBACK')
+
+        with immediate_transactions():
+            writer._start_transaction_under_autocommit()
+        with self.assertRaisesMessage(sqlite3.OperationalError, 'locked'):
+            other.execute('BEGIN IMMEDIATE')
+        writer.connection.execute('ROLLBACK')
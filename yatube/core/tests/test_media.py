@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from .. import media
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = bytes(range(256)) * 4
+UPLOAD = 'posts/picture.gif'
+THUMBNAIL = 'cache/ab/cd/abcdef.jpg'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaViewTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for name in (UPLOAD, THUMBNAIL, THUMBNAIL + '.partial'):
+            path = os.path.join(TEMP_MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def get(self, name, **headers):
+        return self.client.get(
+            reverse('media', kwargs={'path': name}), **headers
+        )
+
+    def test_whole_file(self):
+        response = self.get(UPLOAD)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], media.UPLOADS)
+        stat = os.stat(os.path.join(TEMP_MEDIA_ROOT, UPLOAD))
+        self.assertEqual(response['ETag'], media.file_etag(stat))
+
+    def test_thumbnail_immutable(self):
+        response = self.get(THUMBNAIL)
+        self.assertEqual(response['Cache-Control'], media.IMMUTABLE)
+
+    def test_not_modified(self):
+        etag = self.get(UPLOAD)['ETag']
+        for headers in (
+            {'HTTP_IF_NONE_MATCH': etag},
+            {'HTTP_IF_NONE_MATCH': f'"other", W/{etag}'},
+            {'HTTP_IF_MODIFIED_SINCE': self.get(UPLOAD)['Last-Modified']},
+        ):
+            with self.subTest(headers=headers):
+                response = self.get(UPLOAD, **headers)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+
+    def test_ranges(self):
+        size = len(CONTENT)
+        for header, start, end in (
+            ('bytes=0-99', 0, 99),
+            ('bytes=1000-', 1000, size - 1),
+            ('bytes=-24', size - 24, size - 1),
+            ('bytes=1000-5000', 1000, size - 1),
+        ):
+            with self.subTest(header=header):
+                response = self.get(UPLOAD, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(
+                    response['Content-Range'], f'bytes {start}-{end}/{size}'
+                )
+                self.assertEqual(
+                    b''.join(response.streaming_content),
+                    CONTENT[start:end + 1],
+                )
+                self.assertEqual(
+                    int(response['Content-Length']), end - start + 1
+                )
+
+    def test_unsatisfiable_and_ignored_ranges(self):
+        response = self.get(UPLOAD, HTTP_RANGE=f'bytes={len(CONTENT)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(CONTENT)}')
+        # Несколько диапазонов и устаревший If-Range — весь файл.
+        for headers in (
+            {'HTTP_RANGE': 'bytes=0-1,5-6'},
+            {'HTTP_RANGE': 'bytes=0-1', 'HTTP_IF_RANGE': '"stale"'},
+        ):
+            with self.subTest(headers=headers):
+                self.assertEqual(self.get(UPLOAD, **headers).status_code, 200)
+
+    def test_missing_and_hidden(self):
+        for name in ('posts/missing.gif', THUMBNAIL + '.partial', 'posts',
+                     '../settings.py'):
+            with self.subTest(name=name):
+                self.assertEqual(self.get(name).status_code, 404)
+
+    @override_settings(MEDIA_OFFLOAD='X-Accel-Redirect')
+    def test_accel_redirect(self):
+        response = self.get(UPLOAD)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            settings.MEDIA_ACCEL_REDIRECT_PREFIX + UPLOAD,
+        )
+        self.assertEqual(response['Content-Type'], 'image/gif')
+
+    @override_settings(MEDIA_OFFLOAD='X-Sendfile')
+    def test_sendfile(self):
+        response = self.get(THUMBNAIL)
+        self.assertEqual(
+            response['X-Sendfile'], os.path.join(TEMP_MEDIA_ROOT, THUMBNAIL)
+        )
+        self.assertEqual(response['Cache-Control'], media.IMMUTABLE)
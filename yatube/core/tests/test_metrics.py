@@ -0,0 +1,93 @@
+import sqlite3
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..metrics import aggregate
+
+
+TOKEN = 'metrics-token'
+
+
+@override_settings(METRICS_FLUSH_INTERVAL=0, METRICS_TOKEN=TOKEN)
+class MetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        aggregate.flush()
+        cache.clear()
+
+    def metrics(self):
+        return self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION=f'Bearer {TOKEN}'
+        ).content.decode()
+
+    def test_server_timing(self):
+        """Ответ несёт время приложения, базы, шаблонов и кеша."""
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        self.assertTrue(timing.startswith('app;dur='))
+        self.assertIn('db;dur=', timing)
+        self.assertIn('template;dur=', timing)
+        self.assertIn('cache;desc="hit=', timing)
+
+    def test_prometheus_by_url_name(self):
+        """Агрегат ведётся по именам маршрутов и виден в /metrics/."""
+        for _ in range(3):
+            self.client.get(reverse('posts:index'))
+        self.client.get(reverse('about:author'))
+        text = self.metrics()
+        self.assertIn('yatube_requests_total{view="posts:index"} 3', text)
+        self.assertIn('yatube_requests_total{view="about:author"} 1', text)
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 3',
+            text,
+        )
+        self.assertIn('yatube_db_queries_total{view="posts:index"}', text)
+
+    def test_failed_flush_keeps_values(self):
+        """Сбой записи метрик не ломает ответ, значения не теряются."""
+        error = sqlite3.OperationalError('database is locked')
+        with mock.patch.object(cache, 'add_counters', side_effect=error):
+            response = self.client.get(reverse('about:author'))
+        self.assertEqual(response.status_code, 200)
+        text = self.metrics()
+        self.assertIn('yatube_requests_total{view="about:author"} 1', text)
+
+    def test_template_render_time(self):
+        """Время рендеринга копится по каждому шаблону, включая вложенные."""
+        self.client.get(reverse('posts:index'))
+        text = self.metrics()
+        for template in ('posts/index.html', 'base.html',
+                         'posts/includes/paginator.html'):
+            with self.subTest(template=template):
+                labels = f'{{view="posts:index",template="{template}"}}'
+                self.assertIn(
+                    f'yatube_template_render_seconds_total{labels}', text
+                )
+                self.assertIn(f'yatube_template_renders_total{labels} 1', text)
+
+    def test_metrics_closed_for_others(self):
+        """Без токена /metrics/ не отдаётся, даже с 127.0.0.1."""
+        for authorization in ('', 'Bearer wrong', TOKEN):
+            with self.subTest(authorization=authorization):
+                response = self.client.get(
+                    reverse('metrics'), REMOTE_ADDR='127.0.0.1',
+                    HTTP_AUTHORIZATION=authorization,
+                )
+                self.assertEqual(response.status_code, 404)
+        with override_settings(METRICS_TOKEN=None):
+            response = self.client.get(
+                reverse('metrics'), HTTP_AUTHORIZATION='Bearer None'
+            )
+            self.assertEqual(response.status_code, 404)
+
+    def test_metrics_open_for_staff(self):
+        """Сотрудник видит /metrics/ без токена."""
+        user = get_user_model().objects.create_user(
+            username='Admin', is_staff=True
+        )
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
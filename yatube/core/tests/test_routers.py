@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from urllib.request import pathname2url
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connections, router
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+)
+from django.urls import reverse
+
+from posts.models import Post
+
+from .. import routers
+
+User = get_user_model()
+
+
+@mock.patch.object(routers, '_is_mirror', return_value=False)
+class ReplicaRouterTest(TestCase):
+    def read_view(self, request):
+        # Запросов к базе нет: достаточно узнать, куда ушло бы чтение.
+        with routers.replica_database():
+            return HttpResponse(Post.objects.all().db)
+
+    def test_reads_go_to_replica(self, _):
+        """Чтение в replica_database идёт на реплику, вне блока — нет."""
+        self.assertEqual(Post.objects.all().db, 'default')
+        with routers.replica_database():
+            self.assertEqual(Post.objects.all().db, routers.REPLICA_DATABASE)
+            self.assertEqual(router.db_for_write(Post), 'default')
+            # После записи запрос дочитывает с основной базы.
+            self.assertEqual(Post.objects.all().db, 'default')
+
+    def test_sticky_after_write(self, _):
+        """Записавший клиент получает cookie и читает с основной базы."""
+        middleware = routers.ReplicaMiddleware(self.read_view)
+        request = RequestFactory().get('/')
+        self.assertEqual(
+            middleware(request).content.decode(), routers.REPLICA_DATABASE
+        )
+        request.COOKIES[routers.STICKY_COOKIE] = '1'
+        self.assertEqual(middleware(request).content.decode(), 'default')
+
+
+class ReadYourWritesTest(TestCase):
+    def test_comment_sets_cookie(self):
+        """Комментарий включает чтение с основной базы для автора."""
+        user = User.objects.create_user(username='Author')
+        post = Post.objects.create(author=user, text='Пост')
+        self.client.force_login(user)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+        response = self.client.post(
+            reverse('posts:add_comment', args=[post.pk]), {'text': 'Ок'}
+        )
+        self.assertIn(routers.STICKY_COOKIE, response.cookies)
+
+
+class StaleReplicaTest(TransactionTestCase):
+    """Реплика — отдельный файл, отстающий от основной базы."""
+
+    databases = {'default', routers.REPLICA_DATABASE}
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'replica.sqlite3')
+        # Копия базы до появления постов — реплика, которая не догнала.
+        connections['default'].ensure_connection()
+        copy = sqlite3.connect(path)
+        connections['default'].connection.backup(copy)
+        copy.close()
+        replica = connections[routers.REPLICA_DATABASE]
+        name = replica.settings_dict['NAME']
+        replica.close()
+        replica.settings_dict['NAME'] = f'file:{pathname2url(path)}?mode=ro'
+
+        def restore():
+            replica.close()
+            replica.settings_dict['NAME'] = name
+
+        self.addCleanup(restore)
+        author = User.objects.create_user(username='Author')
+        self.post = Post.objects.create(author=author, text='Новый пост')
+
+    def test_stale_page_is_not_served_to_writer(self):
+        """Страница со старой реплики не достаётся записавшему клиенту."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(list(response.context['page_obj'].object_list), [])
+        self.client.cookies[routers.STICKY_COOKIE] = '1'
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            list(response.context['page_obj'].object_list), [self.post]
+        )
+
+    def test_stale_api_response_has_no_etag(self):
+        """Ответ API со старой реплики не получает ETag новой версии."""
+        response = self.client.get(reverse('api:post_list'))
+        self.assertEqual(response.json()['results'], [])
+        self.assertNotIn('ETag', response)
+
+
+class ReplicateCommandTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.primary = os.path.join(directory.name, 'db.sqlite3')
+        self.replica = os.path.join(directory.name, 'replica.sqlite3')
+        with sqlite3.connect(self.primary) as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE note (text TEXT)')
+            connection.execute("INSERT INTO note VALUES ('первая')")
+
+    def replicate(self):
+        call_command(
+            'replicate', source=self.primary, target=self.replica,
+            stdout=StringIO(),
+        )
+
+    def test_open_replica_sees_new_rows(self):
+        """Открытое соединение с репликой видит данные новой копии."""
+        self.replicate()
+        reader = sqlite3.connect(self.replica)
+        self.addCleanup(reader.close)
+        self.assertEqual(
+            reader.execute('SELECT COUNT(*) FROM note').fetchone(), (1,)
+        )
+        with sqlite3.connect(self.primary) as connection:
+            connection.execute("INSERT INTO note VALUES ('вторая')")
+        self.replicate()
+        self.assertEqual(
+            reader.execute('SELECT COUNT(*) FROM note').fetchone(), (2,)
+        )
+
+    def test_same_file(self):
+        """Копировать базу саму в себя нельзя."""
+        with self.assertRaises(CommandError):
+            call_command(
+                'replicate', source=self.primary, target=self.primary
+            )
@@ -0,0 +1,85 @@
+import threading
+from unittest import mock
+
+from django.contrib.sessions.backends.base import CreateError, UpdateError
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from ..sessions import SessionStore, write_behind
+
+
+class SessionStoreTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_read_from_cache(self):
+        """Сохранённая сессия читается из кеша без запросов к базе."""
+        session = SessionStore()
+        session['answer'] = 42
+        session.create()
+        # Внутри транзакции теста строка пишется сразу.
+        self.assertTrue(
+            Session.objects.filter(session_key=session.session_key).exists()
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(SessionStore(session.session_key)['answer'], 42)
+
+    def test_cache_miss_reads_database(self):
+        """Вытесненная из кеша сессия восстанавливается из базы."""
+        session = SessionStore()
+        session['answer'] = 42
+        session.create()
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(SessionStore(session.session_key)['answer'], 42)
+        with self.assertNumQueries(0):
+            self.assertEqual(SessionStore(session.session_key)['answer'], 42)
+
+    def test_delete(self):
+        session = SessionStore()
+        session.create()
+        key = session.session_key
+        session.delete()
+        self.assertFalse(Session.objects.filter(session_key=key).exists())
+        self.assertEqual(SessionStore(key).load(), {})
+
+    def test_deleted_session_is_not_resurrected(self):
+        """Пока строка ждёт удаления, сессия не возвращается в кеш."""
+        session = SessionStore()
+        session['answer'] = 42
+        session.create()
+        key = session.session_key
+        stale = SessionStore(key)
+        self.assertEqual(stale['answer'], 42)
+        with mock.patch('core.sessions.write_behind'):
+            SessionStore(key).delete()
+        self.assertTrue(Session.objects.filter(session_key=key).exists())
+        self.assertEqual(SessionStore(key).load(), {})
+        self.assertEqual(SessionStore(key).load(), {})
+        stale['answer'] = 43
+        with self.assertRaises(UpdateError):
+            stale.save()
+
+    def test_create_is_unique(self):
+        """must_create не перезаписывает чужую сессию с тем же ключом."""
+        session = SessionStore()
+        session.create()
+        duplicate = SessionStore(session.session_key)
+        with self.assertRaises(CreateError):
+            duplicate.save(must_create=True)
+
+
+class WriteBehindTest(SimpleTestCase):
+    def test_runs_in_background_thread(self):
+        """Вне транзакции запись уходит в фоновый поток."""
+        done = threading.Event()
+        threads = []
+
+        def task():
+            threads.append(threading.current_thread().name)
+            done.set()
+
+        write_behind(task, 'выполнить тестовую задачу')
+        self.assertTrue(done.wait(5))
+        self.assertTrue(threads[0].startswith('sessions'))
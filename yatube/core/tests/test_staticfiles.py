@@ -0,0 +1,110 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.templatetags.static import static
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from .. import staticfiles
+
+TEMP_STATIC_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CSS = 'css/bootstrap.min.css'
+
+
+def collected_path(url):
+    return os.path.join(TEMP_STATIC_ROOT, url[len(settings.STATIC_URL):])
+
+
+@override_settings(
+    STATIC_ROOT=TEMP_STATIC_ROOT,
+    # Только static/ проекта: статику админки собирать незачем.
+    STATICFILES_FINDERS=[
+        'django.contrib.staticfiles.finders.FileSystemFinder',
+    ],
+)
+class StaticFilesTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        cls.middleware = staticfiles.StaticFilesMiddleware(
+            lambda request: HttpResponse('view')
+        )
+        source = os.path.join(settings.BASE_DIR, 'static', CSS)
+        with open(source, 'rb') as file:
+            cls.original = file.read()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_STATIC_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def get(self, url, **headers):
+        return self.middleware(RequestFactory().get(url, **headers))
+
+    def test_hashed_and_compressed_copies(self):
+        """collectstatic кладёт имя с хешем и сжатые копии рядом."""
+        url = static(CSS)
+        self.assertRegex(url, staticfiles.HASHED_NAME)
+        path = collected_path(url)
+        self.assertTrue(os.path.exists(path + '.gz'))
+        if staticfiles.brotli is not None:
+            self.assertTrue(os.path.exists(path + '.br'))
+        # Картинки уже сжаты, копий у них нет.
+        logo = collected_path(static('img/logo.png'))
+        self.assertTrue(os.path.exists(logo))
+        self.assertFalse(os.path.exists(logo + '.gz'))
+
+    def test_gzip_with_far_future_cache(self):
+        response = self.get(static(CSS), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Cache-Control'], staticfiles.IMMUTABLE)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        body = b''.join(response.streaming_content)
+        self.assertEqual(gzip.decompress(body), self.original)
+
+    def test_brotli_preferred(self):
+        if staticfiles.brotli is None:
+            self.skipTest('Пакет Brotli не установлен')
+        response = self.get(
+            static(CSS), HTTP_ACCEPT_ENCODING='gzip, deflate, br'
+        )
+        self.assertEqual(response['Content-Encoding'], 'br')
+        body = b''.join(response.streaming_content)
+        self.assertEqual(staticfiles.brotli.decompress(body), self.original)
+
+    def test_identity(self):
+        """Без Accept-Encoding или с q=0 отдаётся несжатый файл."""
+        for accept in ('', 'gzip;q=0, br;q=0'):
+            with self.subTest(accept=accept):
+                response = self.get(static(CSS), HTTP_ACCEPT_ENCODING=accept)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                body = b''.join(response.streaming_content)
+                self.assertEqual(body, self.original)
+
+    def test_not_modified(self):
+        response = self.get(static(CSS), HTTP_ACCEPT_ENCODING='gzip')
+        repeated = self.get(
+            static(CSS),
+            HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=f'W/{response["ETag"]}',
+        )
+        self.assertEqual(repeated.status_code, 304)
+        self.assertEqual(repeated['ETag'], response['ETag'])
+        self.assertEqual(repeated['Cache-Control'], staticfiles.IMMUTABLE)
+
+    def test_unhashed_name_short_lived(self):
+        response = self.get(settings.STATIC_URL + CSS)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], staticfiles.SHORT_LIVED)
+
+    def test_other_requests_pass_through(self):
+        for url in ('/', settings.STATIC_URL + 'css/missing.css'):
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url).content, b'view')
@@ -0,0 +1,56 @@
+import os
+
+from django.conf import settings
+from django.template import engines
+from django.test import SimpleTestCase
+
+from .. import template_loaders
+
+TEMPLATES_DIR = os.path.join(settings.BASE_DIR, 'templates')
+
+
+class TemplateLoaderTest(SimpleTestCase):
+    def setUp(self):
+        self.engine = engines.all()[0].engine
+        self.addCleanup(template_loaders.reset_loaders)
+
+    def test_cached_profiled_templates(self):
+        """Шаблон компилируется один раз и засекает время рендеринга."""
+        template = self.engine.get_template('posts/includes/paginator.html')
+        self.assertIsInstance(template, template_loaders.ProfiledTemplate)
+        self.assertIs(
+            self.engine.get_template('posts/includes/paginator.html'),
+            template,
+        )
+
+    def test_template_change_resets_cache(self):
+        """Правка шаблона сбрасывает кеш вместо перезапуска runserver."""
+        template = self.engine.get_template('base.html')
+        changed = template_loaders.template_changed(
+            sender=None, file_path=os.path.join(TEMPLATES_DIR, 'base.html')
+        )
+        self.assertIs(changed, True)
+        self.assertIsNot(self.engine.get_template('base.html'), template)
+
+    def test_other_changes_restart(self):
+        """Правки кода и файлов вне шаблонов перезапускают сервер."""
+        for path in (
+            os.path.join(settings.BASE_DIR, 'core', 'views.py'),
+            os.path.join(settings.BASE_DIR, 'manage.py'),
+        ):
+            with self.subTest(path=path):
+                self.assertIsNone(
+                    template_loaders.template_changed(None, file_path=path)
+                )
+
+    def test_watched_directories(self):
+        watched = []
+
+        class Reloader:
+            def watch_dir(self, path, glob):
+                watched.append(path)
+
+        template_loaders.watch_templates(Reloader())
+        self.assertIn(os.path.realpath(TEMPLATES_DIR), map(str, watched))
+        # Шаблоны админки Django не меняются, за ними не следим.
+        self.assertFalse(any('site-packages' in str(p) for p in watched))
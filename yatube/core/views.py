@@ -1,4 +1,13 @@
+import hmac
+
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.views.decorators.http import require_safe
+
+from . import media as media_files
+from .metrics import render_prometheus
 
 
 def page_not_found(request, exception):
@@ -15,3 +24,30 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def _metrics_allowed(request):
+    if request.user.is_staff:
+        return True
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(
+        authorization.encode(), f'Bearer {token}'.encode()
+    )
+
+
+def metrics(request):
+    """Метрики в формате Prometheus для сотрудников и по METRICS_TOKEN."""
+    if not _metrics_allowed(request):
+        raise Http404
+    return HttpResponse(
+        render_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+@transaction.non_atomic_requests
+@require_safe
+def media(request, path):
+    """Загруженные картинки и миниатюры, см. core/media.py."""
+    return media_files.serve(request, path)
@@ -0,0 +1,333 @@
+"""Нагрузочный прогон всех страниц из posts/urls.py.
+
+seed() наполняет базу синтетическими данными: пользователи, группы,
+посты с датами за последний год, комментарии и граф подписок со
+степенным распределением — немногие авторы собирают большинство
+подписчиков, как в живой соцсети. run() обходит каждый маршрут
+тестовым клиентом и меряет задержку, число SQL-запросов и память.
+render() отдельно меряет рендеринг страницы ленты из 10 постов с
+кешем шаблонов и фрагментов и без них, sessions() — накладные расходы
+сессии и пользователя на запрос с сессиями в базе и в кеше.
+Результат — словарь для JSON, compare() сравнивает его с прошлым.
+
+Запускается командой benchmark, которая поднимает отдельную тестовую
+базу и не трогает рабочие данные.
+"""
+import math
+import random
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import Mixer
+
+from . import counters, feed_cache, search, timeline
+from .models import Comment, Follow, Group, Post, explicit_auto_now_add
+from .urls import app_name, urlpatterns
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+# Показатель степени в распределении подписчиков по авторам (закон Ципфа).
+FOLLOW_EXPONENT = 1.1
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+# Режимы замера рендеринга: загрузчики шаблонов и сброс кеша
+# фрагментов перед каждым рендером.
+RENDER_MODES = {
+    'no_caching': (TEMPLATE_LOADERS, True),
+    'cached_templates': (
+        [('core.template_loaders.Loader', TEMPLATE_LOADERS)], True
+    ),
+    'cached_templates_and_fragments': (
+        [('core.template_loaders.Loader', TEMPLATE_LOADERS)], False
+    ),
+}
+
+# Режимы замера сессий: SESSION_ENGINE и AUTHENTICATION_BACKENDS.
+SESSION_MODES = {
+    'database': (
+        'django.contrib.sessions.backends.db',
+        ['django.contrib.auth.backends.ModelBackend'],
+    ),
+    'cache': ('core.sessions', ['users.backends.CachedModelBackend']),
+}
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу: значение из самой выборки."""
+    ordered = sorted(values)
+    rank = math.ceil(percent / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+def seed(users=100, posts=1000, comments=3, follows=20, groups=10,
+         random_seed=0):
+    """Наполняет базу; comments и follows — средние на пост и на читателя.
+
+    Сигналы при bulk_create не срабатывают, поэтому счётчики, ленты
+    подписок и поисковый индекс в конце пересобираются целиком.
+    """
+    rng = random.Random(random_seed)
+    faker = Faker('ru_RU')
+    faker.seed_instance(random_seed)
+    mixer = Mixer(commit=False)
+    now = timezone.now()
+
+    last_user_id = User.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    ).first() or 0
+    User.objects.bulk_create(
+        (mixer.blend(
+            User,
+            username=f'user{i}',
+            first_name=faker.first_name(),
+            last_name=faker.last_name(),
+            password='!',
+        ) for i in range(users)),
+        batch_size=BATCH_SIZE,
+    )
+    # SQLite не возвращает id из bulk_create, берём их отдельным запросом.
+    author_ids = list(User.objects.filter(
+        pk__gt=last_user_id
+    ).values_list('pk', flat=True))
+    Group.objects.bulk_create(
+        mixer.blend(
+            Group,
+            title=faker.catch_phrase()[:200],
+            slug=f'group-{i}',
+            description=faker.paragraph(),
+        ) for i in range(groups)
+    )
+    group_ids = [None, *Group.objects.values_list('pk', flat=True)]
+
+    # Посты пишут все, а подписываются по закону Ципфа: вес автора
+    # обратно пропорционален его месту в рейтинге в степени FOLLOW_EXPONENT.
+    weights = [1 / (rank + 1) ** FOLLOW_EXPONENT for rank in range(users)]
+    with explicit_auto_now_add(
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ):
+        Post.objects.bulk_create(
+            (mixer.blend(
+                Post,
+                # Связи передаём готовыми, иначе mixer насоздаёт
+                # для каждого поста своих авторов и групп.
+                author=User(pk=rng.choice(author_ids)),
+                group=_group(rng.choice(group_ids)),
+                text=faker.text(max_nb_chars=400),
+                pub_date=now - timedelta(seconds=rng.randrange(365 * 86400)),
+                image='',
+            ) for _ in range(posts)),
+            batch_size=BATCH_SIZE,
+        )
+        post_rows = list(Post.objects.values_list('pk', 'pub_date'))
+        Comment.objects.bulk_create(
+            (
+                mixer.blend(
+                    Comment,
+                    post=Post(pk=post_id),
+                    author=User(pk=rng.choice(author_ids)),
+                    text=faker.sentence(),
+                    created=pub_date + timedelta(
+                        minutes=rng.randrange(1, 600)
+                    ),
+                )
+                for post_id, pub_date in post_rows
+                for _ in range(rng.randint(0, 2 * comments))
+            ),
+            batch_size=BATCH_SIZE,
+        )
+    edges = set()
+    for user_id in author_ids:
+        wanted = min(rng.randint(0, 2 * follows), users - 1)
+        followed = set()
+        while len(followed) < wanted:
+            author_id = rng.choices(author_ids, weights)[0]
+            if author_id != user_id:
+                followed.add(author_id)
+        edges.update((user_id, author_id) for author_id in followed)
+    Follow.objects.bulk_create(
+        (Follow(user_id=user_id, author_id=author_id)
+         for user_id, author_id in sorted(edges)),
+        batch_size=BATCH_SIZE,
+    )
+    counters.rebuild(fix=True)
+    timeline.rebuild()
+    search.rebuild(Post.objects.all())
+
+
+def _group(group_id):
+    return Group(pk=group_id) if group_id is not None else None
+
+
+def route_urls(namespace=app_name, patterns=urlpatterns):
+    """Адрес каждого маршрута patterns на данных из seed()."""
+    # Самый читаемый автор и его самый обсуждаемый пост — худший случай.
+    author = User.objects.order_by('-stats__followers_count').first()
+    post = author.posts.order_by('-comments_count').first()
+    group = Group.objects.order_by('-posts_count').first()
+    values = {
+        'username': author.username,
+        'post_id': post.pk,
+        'slug': group.slug,
+    }
+    urls = {}
+    for pattern in patterns:
+        kwargs = {
+            name: values[name] for name in pattern.pattern.converters
+        }
+        urls[pattern.name] = reverse(
+            f'{namespace}:{pattern.name}', kwargs=kwargs
+        )
+    return urls
+
+
+def measure(client, url, iterations):
+    """Задержки в миллисекундах, число запросов и пик памяти в КиБ."""
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    # Журнал запросов очищается в начале каждого запроса, считаем сразу.
+    query_count = len(queries)
+    # Трассировка памяти сильно замедляет код, поэтому для неё
+    # отдельный запрос, не входящий в замер времени.
+    tracemalloc.start()
+    try:
+        client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'status': response.status_code,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'queries': query_count,
+        'peak_memory_kib': round(peak / 1024, 1),
+    }
+
+
+def run(iterations=50, warmup=5, username=None):
+    """Обходит все маршруты от имени пользователя с подписками."""
+    if username is None:
+        username = User.objects.order_by(
+            '-stats__following_count'
+        ).values_list('username', flat=True).first()
+    client = Client()
+    client.force_login(User.objects.get(username=username))
+    results = {}
+    for name, url in route_urls().items():
+        for _ in range(warmup):
+            client.get(url)
+        results[name] = {'url': url, **measure(client, url, iterations)}
+    return results
+
+
+def sessions(iterations=50, warmup=5, username=None):
+    """Главная страница из кеша ленты в каждом режиме SESSION_MODES.
+
+    Лента закеширована, поэтому все запросы к базе — это чтение сессии
+    и пользователя, которое делает каждая страница.
+    """
+    if username is None:
+        username = User.objects.order_by(
+            '-stats__following_count'
+        ).values_list('username', flat=True).first()
+    user = User.objects.get(username=username)
+    url = reverse('posts:index')
+    results = {}
+    for mode, (engine, backends) in SESSION_MODES.items():
+        with override_settings(
+            SESSION_ENGINE=engine, AUTHENTICATION_BACKENDS=backends
+        ):
+            # Новый клиент — новый обработчик: middleware сессий
+            # подхватывает SESSION_ENGINE при создании.
+            client = Client()
+            client.force_login(user)
+            for _ in range(warmup):
+                client.get(url)
+            results[mode] = {'url': url, **measure(client, url, iterations)}
+    return results
+
+
+def _templates_with(loaders):
+    return [{
+        **settings.TEMPLATES[0],
+        'OPTIONS': {**settings.TEMPLATES[0]['OPTIONS'], 'loaders': loaders},
+    }]
+
+
+def render(iterations=50, warmup=5, template='posts/index.html'):
+    """Время рендеринга первой страницы главной ленты в разных режимах.
+
+    Страница и версии карточек достаются заранее: меряется только
+    шаблон, запросов к базе при рендеринге быть не должно.
+    """
+    request = RequestFactory().get(reverse('posts:index'))
+    request.user = AnonymousUser()
+    page = feed_cache.get_cached_page(
+        request, feed_cache.INDEX, Post.objects.for_feed()
+    )
+    context = {'page_obj': page}
+    results = {}
+    for mode, (loaders, cold_fragments) in RENDER_MODES.items():
+        timings = []
+        with override_settings(TEMPLATES=_templates_with(loaders)):
+            for number in range(warmup + iterations):
+                if cold_fragments:
+                    cache.clear()
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    render_to_string(template, context, request)
+                if number >= warmup:
+                    timings.append((time.perf_counter() - started) * 1000)
+        results[mode] = {
+            'template': template,
+            'posts': len(page.object_list),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'queries': len(queries),
+        }
+    return results
+
+
+def compare(results, baseline, threshold=10.0):
+    """Строки сравнения с базой и список маршрутов, где p95 вырос."""
+    lines = []
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            lines.append(f'{name}: нет в базе')
+            continue
+        change = (
+            (current['p95_ms'] - previous['p95_ms'])
+            / previous['p95_ms'] * 100 if previous['p95_ms'] else 0.0
+        )
+        lines.append(
+            f'{name}: p95 {previous["p95_ms"]} → {current["p95_ms"]} мс '
+            f'({change:+.1f}%), запросов {previous["queries"]} → '
+            f'{current["queries"]}'
+        )
+        if change > threshold or current['queries'] > previous['queries']:
+            regressions.append(name)
+    return lines, regressions
@@ -0,0 +1,162 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются сигналами через F-выражения, поэтому изменение
+попадает в ту же транзакцию, что и сама запись (ATOMIC_REQUESTS).
+Команда rebuild_counters сверяет их с реальными строками.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+
+def _bump(queryset, field, delta):
+    # Разошедшийся счётчик не должен ронять запись уходом ниже нуля.
+    queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def bump_user(user_id, field, delta):
+    _bump(UserStats.objects.filter(user_id=user_id), field, delta)
+
+
+def bump_post_comments(post_id, delta):
+    _bump(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def bump_group_posts(group_id, delta):
+    if group_id is not None:
+        _bump(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def get_user_stats(user):
+    """Счётчики пользователя; недостающая строка считается по факту."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        stats, _ = UserStats.objects.get_or_create(
+            user=user, defaults=_count_user(user.pk)
+        )
+        return stats
+
+
+def _count_user(user_id):
+    return {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def _grouped(queryset, field):
+    return dict(
+        queryset.values_list(field).annotate(total=Count('pk')).order_by()
+    )
+
+
+def _reconcile(queryset, fields, expected, fix):
+    """Сравнивает счётчики со строками queryset и при fix исправляет."""
+    mismatches = []
+    changed = []
+    for obj in queryset.iterator():
+        dirty = False
+        for field in fields:
+            actual = expected[field].get(obj.pk, 0)
+            stored = getattr(obj, field)
+            if stored != actual:
+                mismatches.append(
+                    f'{obj._meta.label} {obj.pk}.{field}: '
+                    f'{stored} вместо {actual}'
+                )
+                setattr(obj, field, actual)
+                dirty = True
+        if dirty:
+            changed.append(obj)
+    if fix and changed:
+        queryset.model.objects.bulk_update(
+            changed, fields, batch_size=BATCH_SIZE
+        )
+    return mismatches
+
+
+def rebuild(fix=True):
+    """Пересчитывает все счётчики, возвращает список расхождений."""
+    missing = User.objects.filter(stats__isnull=True)
+    mismatches = [
+        f'posts.UserStats {user_id}: нет строки'
+        for user_id in missing.values_list('pk', flat=True)
+    ]
+    if fix:
+        UserStats.objects.bulk_create(
+            (UserStats(user_id=user_id)
+             for user_id in missing.values_list('pk', flat=True)),
+            batch_size=BATCH_SIZE,
+        )
+    mismatches += _reconcile(
+        UserStats.objects.only(
+            'pk', 'posts_count', 'followers_count', 'following_count'
+        ),
+        ('posts_count', 'followers_count', 'following_count'),
+        {
+            'posts_count': _grouped(Post.objects, 'author_id'),
+            'followers_count': _grouped(Follow.objects, 'author_id'),
+            'following_count': _grouped(Follow.objects, 'user_id'),
+        },
+        fix,
+    )
+    mismatches += _reconcile(
+        Post.objects.only('pk', 'comments_count'),
+        ('comments_count',),
+        {'comments_count': _grouped(Comment.objects, 'post_id')},
+        fix,
+    )
+    mismatches += _reconcile(
+        Group.objects.only('pk', 'posts_count'),
+        ('posts_count',),
+        {'posts_count': _grouped(Post.objects, 'group_id')},
+        fix,
+    )
+    return mismatches
+
+
+def _count_of(queryset, field):
+    """Подзапрос COUNT(*) строк queryset, где field равно pk внешней строки.
+
+    Для строк без совпадений подзапрос даёт NULL, поэтому Coalesce.
+    """
+    rows = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field
+    ).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def recount():
+    """Переписывает все счётчики запросами UPDATE без сверки.
+
+    В отличие от rebuild() ничего не держит в памяти процесса: подсчёт
+    идёт внутри базы, поэтому годится после массовой загрузки данных.
+    """
+    # Порциями, чтобы не держать в памяти всех пользователей разом;
+    # созданные строки из выборки выпадают, поэтому без смещения.
+    missing = User.objects.filter(stats__isnull=True).order_by('pk')
+    while True:
+        user_ids = list(missing.values_list('pk', flat=True)[:BATCH_SIZE])
+        if not user_ids:
+            break
+        UserStats.objects.bulk_create(
+            UserStats(user_id=user_id) for user_id in user_ids
+        )
+    # pk строки UserStats — это id пользователя.
+    UserStats.objects.update(
+        posts_count=_count_of(Post.objects, 'author_id'),
+        followers_count=_count_of(Follow.objects, 'author_id'),
+        following_count=_count_of(Follow.objects, 'user_id'),
+    )
+    Post.objects.update(
+        comments_count=_count_of(Comment.objects, 'post_id')
+    )
+    Group.objects.update(posts_count=_count_of(Post.objects, 'group_id'))
@@ -0,0 +1,229 @@
+"""Кеш лент и карточек постов с версионными ключами.
+
+Каждая лента (главная, группа, профиль) и каждая карточка поста имеют
+свою версию. Страницы кешируются под ключом с текущей версией,
+а сигналы записи меняют версию — старые ключи просто перестают
+читаться. Поэтому кешировать можно надолго, а после записи лента
+сразу показывает свежие данные.
+
+Страница ленты — это id постов и курсоры; посты лежат в кеше отдельно
+под версией своей карточки. Новый пост меняет версии лент, новый
+комментарий — только карточку, переименование автора или группы —
+общую версию имён NAMES.
+
+Реплика отстаёт от основной базы: запрос с неё вскоре после смены
+версии мог прочитать старые данные. Такие страницы и карточки кладутся
+под отдельный ключ с суффиксом REPLICA_SUFFIX, который читают только
+такие же запросы, — автор, читающий с основной базы, их не увидит.
+Через REPLICA_STICKY_SECONDS реплика догоняет, и ключи снова общие.
+"""
+import time
+import uuid
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.db import transaction
+
+from core.routers import replica_may_lag
+
+from .models import Post
+from .paginator import CursorPaginator
+
+INDEX = 'index'
+GROUPS = 'groups'
+# Имена авторов и названия групп видны в каждой карточке; меняются
+# редко, поэтому версия у них одна на всех.
+NAMES = 'names'
+REPLICA_SUFFIX = 'replica'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def profile_scope(author_id):
+    return f'profile:{author_id}'
+
+
+def card_scope(post_id):
+    return f'card:{post_id}'
+
+
+def comments_scope(scope):
+    """Число комментариев у постов ленты scope: его отдаёт API."""
+    return f'{scope}:comments'
+
+
+def post_scopes(post, group_ids=()):
+    """Версии, которые устаревают при изменении поста."""
+    scopes = {INDEX, profile_scope(post.author_id), card_scope(post.pk)}
+    for group_id in (post.group_id, *group_ids):
+        if group_id is not None:
+            scopes.add(group_scope(group_id))
+    return scopes
+
+
+def comment_scopes(post_id):
+    """Комментарий меняет карточку поста, но не состав лент.
+
+    Страницы лент не сбрасываются; для ответов API, где у каждого поста
+    есть comments_count, меняются отдельные версии comments_scope.
+    Сам пост не загружается: хватает его автора и группы.
+    """
+    card = card_scope(post_id)
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id'
+    ).first()
+    if row is None:
+        return {card}
+    author_id, group_id = row
+    post = Post(pk=post_id, author_id=author_id, group_id=group_id)
+    return {card} | {
+        comments_scope(scope) for scope in post_scopes(post) - {card}
+    }
+
+
+def _version_key(scope):
+    return f'version:{scope}'
+
+
+def _new_version():
+    # Версия не счётчик, а случайное значение: общий кеш переживает
+    # пересоздание базы, и счётчик мог бы совпасть с ключами страниц,
+    # закешированных для прежних данных. Префикс — время смены версии
+    # в миллисекундах, из него API берёт Last-Modified.
+    return f'{int(time.time() * 1000):x}-{uuid.uuid4().hex}'
+
+
+def version_time(version):
+    """Момент, когда версия была выдана; для старого формата — None."""
+    stamp, _, _ = version.partition('-')
+    try:
+        return datetime.fromtimestamp(int(stamp, 16) / 1000, timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def may_lag(version):
+    """Данные этого запроса могут быть старше версии: см. replica_may_lag."""
+    stamp = version_time(version)
+    return replica_may_lag(stamp.timestamp() if stamp is not None else None)
+
+
+def _reader_version(*versions):
+    # Ключ кеша для данных, прочитанных под этими версиями.
+    version = ':'.join(versions)
+    if any(map(may_lag, versions)):
+        return f'{version}:{REPLICA_SUFFIX}'
+    return version
+
+
+def get_versions(scopes):
+    keys = {_version_key(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    for key, scope in keys.items():
+        if key not in found:
+            cache.add(key, _new_version(), None)
+            versions[scope] = cache.get(key)
+    return versions
+
+
+def bump_now(scopes):
+    """Меняет версии сразу, без оглядки на транзакцию в этом потоке."""
+    cache.set_many(
+        {_version_key(scope): _new_version() for scope in scopes}, None
+    )
+
+
+def bump(scopes):
+    """Делает устаревшими страницы и карточки переданных версий.
+
+    Версия меняется сразу и ещё раз после фиксации транзакции:
+    страница, закешированная параллельным запросом до фиксации, иначе
+    осталась бы в кеше со свежей версией и старыми данными.
+    """
+    scopes = set(scopes)
+    bump_now(scopes)
+    transaction.on_commit(lambda: bump_now(scopes))
+
+
+def card_versions(post_ids):
+    """Версии карточек: своя версия поста и общая версия имён."""
+    scopes = [NAMES, *(card_scope(post_id) for post_id in post_ids)]
+    versions = get_versions(scopes)
+    return {
+        post_id: _reader_version(
+            versions[card_scope(post_id)], versions[NAMES]
+        )
+        for post_id in post_ids
+    }
+
+
+def attach_card_versions(posts):
+    """Проставляет постам версии карточек для тега {% cache %}."""
+    versions = card_versions([post.pk for post in posts])
+    for post in posts:
+        post.card_version = versions[post.pk]
+    return posts
+
+
+def _post_key(post_id, version):
+    return f'post:{post_id}:{version}'
+
+
+def get_posts(object_list, post_ids):
+    """Посты по id в том же порядке: из кеша, недостающие — из базы.
+
+    Пост лежит в кеше под версией своей карточки, прочитанной до
+    запроса к базе: комментарий, зафиксированный во время запроса,
+    сменит версию позже и не оставит в кеше старое число комментариев.
+    """
+    versions = card_versions(post_ids)
+    keys = {_post_key(pk, versions[pk]): pk for pk in post_ids}
+    found = {
+        keys[key]: post for key, post in cache.get_many(keys).items()
+    }
+    missing = [pk for pk in post_ids if pk not in found]
+    if missing:
+        loaded = list(object_list.filter(pk__in=missing).order_by())
+        cache.set_many(
+            {_post_key(post.pk, versions[post.pk]): post for post in loaded},
+            settings.FEED_CACHE_TIMEOUT,
+        )
+        found.update((post.pk, post) for post in loaded)
+    posts = [found[pk] for pk in post_ids if pk in found]
+    for post in posts:
+        post.card_version = versions[post.pk]
+    return posts
+
+
+def get_cached_page(request, scope, object_list):
+    """Страница ленты из кеша, при промахе — из базы через курсор.
+
+    Страница хранит только id постов и курсоры, сами посты берутся
+    через get_posts: комментарий меняет одну карточку, а не ленты.
+    Ключ страницы строится из проверенного курсора, так что мусор в
+    ?cursor= не плодит записи в кеше.
+    """
+    paginator = CursorPaginator(
+        object_list.values('id', 'pub_date'), settings.POSTS_PER_PAGE
+    )
+    cursor = paginator.normalize(request.GET.get('cursor'))
+    version = _reader_version(get_versions([scope])[scope])
+    key = f'feed:{scope}:{version}:{cursor}'
+    cached = cache.get(key)
+    if cached is None:
+        page = paginator.get_page(cursor)
+        cached = (
+            [row['id'] for row in page.object_list],
+            page.next_cursor, page.previous_cursor,
+        )
+        cache.set(key, cached, settings.FEED_CACHE_TIMEOUT)
+    post_ids, next_cursor, previous_cursor = cached
+    page = Page(get_posts(object_list, post_ids), None, paginator)
+    page.next_cursor = next_cursor
+    page.previous_cursor = previous_cursor
+    return page
@@ -0,0 +1,72 @@
+"""Подписки пользователей из общего кеша.
+
+Для каждого пользователя в кеше лежит отсортированный массив id авторов,
+на которых он подписан (array('q'), 8 байт на подписку). Проверка
+подписки — двоичный поиск по массиву, отметить подписки для всех
+авторов страницы ленты — одно чтение кеша.
+
+Массив строится одним запросом по уникальному индексу (user, author),
+уже отсортированным. Сигналы Follow сбрасывают массив подписчика сразу
+и ещё раз после фиксации транзакции, как версии в feed_cache.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follow
+
+
+def _key(user_id):
+    return f'follow_graph:{user_id}'
+
+
+def _load(user_id):
+    return array('q', Follow.objects.filter(user_id=user_id).order_by(
+        'author_id'
+    ).values_list('author_id', flat=True))
+
+
+def following_ids(user):
+    """Отсортированный массив id авторов, на которых подписан user."""
+    if not user.is_authenticated:
+        return array('q')
+    key = _key(user.pk)
+    data = cache.get(key)
+    if data is not None:
+        ids = array('q')
+        ids.frombytes(data)
+        return ids
+    ids = _load(user.pk)
+    cache.set(key, ids.tobytes(), settings.FOLLOW_GRAPH_TIMEOUT)
+    return ids
+
+
+def _contains(ids, author_id):
+    index = bisect_left(ids, author_id)
+    return index < len(ids) and ids[index] == author_id
+
+
+def following_set(user):
+    return frozenset(following_ids(user))
+
+
+def is_following(user, author):
+    return _contains(following_ids(user), author.pk)
+
+
+def attach_follow_state(user, posts):
+    """Проставляет постам author_followed: подписан ли user на автора."""
+    ids = following_ids(user)
+    for post in posts:
+        post.author_followed = _contains(ids, post.author_id)
+    return posts
+
+
+def forget(user_id):
+    """Сбрасывает подписки пользователя после изменения Follow."""
+    key = _key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
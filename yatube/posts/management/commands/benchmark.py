@@ -0,0 +1,118 @@
+import json
+import platform
+import sqlite3
+import tempfile
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings, setup_databases, teardown_databases,
+)
+from django.utils import timezone
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет все страницы posts/urls.py, рендеринг ленты и '
+        'сессии на синтетических данных в отдельной тестовой базе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=3,
+                            help='Комментариев на пост в среднем')
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Подписок на пользователя в среднем')
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--output', help='Куда записать JSON')
+        parser.add_argument('--baseline', help='JSON прошлого прогона')
+        parser.add_argument(
+            '--threshold', type=float, default=10.0,
+            help='Допустимый рост p95 относительно базы, в процентах',
+        )
+
+    def handle(self, *args, **options):
+        dataset = {
+            key: options[key]
+            for key in ('users', 'posts', 'comments', 'follows', 'groups')
+        }
+        # Как у тестов: своя база для default, остальные псевдонимы
+        # становятся её зеркалами (TEST['MIRROR']).
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                with override_settings(
+                    DEBUG=False,
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                    MEDIA_ROOT=directory,
+                    THUMBNAIL_WORKERS=0,
+                    CACHES={'default': {
+                        **settings.CACHES['default'],
+                        'LOCATION': f'{directory}/cache.sqlite3',
+                    }},
+                ):
+                    benchmark.seed(random_seed=options['seed'], **dataset)
+                    routes = benchmark.run(
+                        iterations=options['iterations'],
+                        warmup=options['warmup'],
+                    )
+                    render = benchmark.render(
+                        iterations=options['iterations'],
+                        warmup=options['warmup'],
+                    )
+                    sessions = benchmark.sessions(
+                        iterations=options['iterations'],
+                        warmup=options['warmup'],
+                    )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        result = {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'seed': options['seed'],
+                'iterations': options['iterations'],
+                'dataset': dataset,
+            },
+            'routes': routes,
+            'render': render,
+            'sessions': sessions,
+        }
+        report = json.dumps(result, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report)
+        else:
+            self.stdout.write(report)
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            lines, regressions = benchmark.compare(
+                routes, baseline['routes'], options['threshold']
+            )
+            # В старых прогонах разделов render и sessions может не быть.
+            for section, results in (
+                ('render', render), ('sessions', sessions),
+            ):
+                section_lines, section_regressions = benchmark.compare(
+                    results, baseline.get(section, {}), options['threshold']
+                )
+                lines += section_lines
+                regressions += section_regressions
+            for line in lines:
+                self.stdout.write(line)
+            if regressions:
+                raise CommandError(
+                    'Медленнее базы: ' + ', '.join(regressions)
+                )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, посты, комментарии и подписки '
+        'в JSON Lines'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', help='Файл выгрузки; по умолчанию stdout'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=transfer.BATCH_SIZE,
+            help='Сколько строк читать из базы за раз',
+        )
+
+    def handle(self, *args, **options):
+        lines = transfer.export_lines(options['batch_size'])
+        if options['output'] is None:
+            for line in lines:
+                self.stdout.write(line)
+            return
+        count = 0
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            for line in lines:
+                output.write(line + '\n')
+                count += 1
+        # stdout может быть занят самой выгрузкой, поэтому итог — в stderr.
+        self.stderr.write(f'Выгружено записей: {count}')
@@ -0,0 +1,50 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку export_posts, затем пересобирает счётчики, '
+        'ленты подписок и поисковый индекс'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки; «-» — stdin')
+        parser.add_argument(
+            '--batch-size', type=int, default=transfer.BATCH_SIZE,
+            help='Сколько строк одной модели писать за раз',
+        )
+        parser.add_argument(
+            '--ignore-existing', action='store_true',
+            help='Пропускать записи, чьи pk или уникальные поля уже заняты',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        source = (
+            sys.stdin if path == '-' else open(path, encoding='utf-8')
+        )
+        try:
+            with transaction.atomic():
+                loaded = transfer.load_lines(
+                    source,
+                    batch_size=options['batch_size'],
+                    ignore_existing=options['ignore_existing'],
+                )
+        except transfer.TransferError as error:
+            raise CommandError(str(error))
+        except IntegrityError as error:
+            raise CommandError(
+                f'{error}. Уже загруженные записи можно пропустить '
+                f'флагом --ignore-existing.'
+            )
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        for label, count in loaded.items():
+            self.stdout.write(f'{label}: {count}')
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена'))
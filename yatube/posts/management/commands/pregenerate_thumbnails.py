@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed_cache, thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Нарезает миниатюры картинок всех постов, у которых их ещё нет'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only('pk', 'image')
+        count = 0
+        for post in posts.iterator():
+            thumbnails.generate(post.image.name, thumbnails.all_variants())
+            feed_cache.bump_now({feed_cache.card_scope(post.pk)})
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры готовы для постов: {count}'
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счётчики с реальными строками'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить счётчики, ничего не исправляя',
+        )
+
+    def handle(self, *args, **options):
+        check = options['check']
+        with transaction.atomic():
+            mismatches = counters.rebuild(fix=not check)
+        for mismatch in mismatches:
+            self.stdout.write(mismatch)
+        if check and mismatches:
+            raise CommandError(f'Расхождений в счётчиках: {len(mismatches)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики сверены, исправлено: {len(mismatches)}'
+            if not check else 'Счётчики сходятся'
+        ))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации «кого почитать» по графу подписок; '
+        'запускается периодически, например из cron'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=recommendations.CHUNK_SIZE,
+            help='Сколько читателей считать за один блок матрицы',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            total = recommendations.rebuild(chunk_size=options['chunk_size'])
+        except ImproperlyConfigured as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Рекомендаций записано: {total} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
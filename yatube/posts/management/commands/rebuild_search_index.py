@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс постов'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            search.rebuild(Post.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс поиска пересобран, постов: {Post.objects.count()}'
+        ))
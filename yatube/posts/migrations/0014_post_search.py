@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# Миграция не зависит от posts.search: имя таблицы и SQL зафиксированы
+# здесь, чтобы последующие правки модуля не меняли её поведение.
+TABLE = 'posts_post_search'
+
+
+def fill_search_index(apps, schema_editor):
+    # Стеммер живёт в коде приложения, поэтому индекс заполняется
+    # исходным текстом с «ё» → «е», как у стеммера: основа слова — его
+    # префикс, а поиск идёт по префиксам основ, так что найдётся всё,
+    # что нашлось бы по основам.
+    # Основы проставит manage.py rebuild_search_index или сохранение поста.
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, body) '
+            f"SELECT id, replace(replace(text, 'ё', 'е'), 'Ё', 'Е') "
+            f'FROM posts_post'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_counters'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f'CREATE VIRTUAL TABLE {TABLE} USING fts5('
+            f"body, tokenize = 'unicode61 remove_diacritics 2'"
+            f')',
+            f'DROP TABLE {TABLE}',
+        ),
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
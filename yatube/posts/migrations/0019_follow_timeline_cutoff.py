@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_timelineentry_pub_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='follow',
+            name='timeline_cutoff',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Граница ленты'),
+        ),
+    ]
@@ -1,26 +1,65 @@
+from contextlib import contextmanager
+
 from django.contrib.auth import get_user_model
 from django.db import models
 
 User = get_user_model()
 
 
+@contextmanager
+def explicit_auto_now_add(*fields):
+    """Внутри блока поля auto_now_add берут значение из объекта.
+
+    Нужно для загрузки данных с настоящими датами через bulk_create.
+    Флаг меняется у поля модели, то есть на весь процесс: блок не для
+    обработки запросов.
+    """
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
 class Group(models.Model):
     title = models.CharField(max_length=200, verbose_name='Название группы')
     slug = models.SlugField(unique=True, verbose_name='URL')
     description = models.TextField(verbose_name='Описание')
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество постов'
+    )
+
+    class Meta:
+        ordering = ['title']
+        indexes = [
+            models.Index(fields=['title'], name='group_title_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа приходят тем же запросом."""
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='Текст')
     pub_date = models.DateTimeField(auto_now_add=True,
                                     verbose_name='Дата публикации')
+    # Одиночные индексы внешних ключей не нужны: их заменяют составные
+    # индексы из Meta, где ключ стоит первым полем.
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='posts',
+        db_index=False,
         verbose_name='Автор'
     )
     group = models.ForeignKey(
@@ -29,6 +68,7 @@ class Post(models.Model):
         null=True,
         on_delete=models.SET_NULL,
         related_name='posts',
+        db_index=False,
         verbose_name='Группа'
     )
     image = models.ImageField(
@@ -36,9 +76,24 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество комментариев'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -49,6 +104,7 @@ class Comment(models.Model):
         Post,
         on_delete=models.CASCADE,
         related_name='comments',
+        db_index=False,
         verbose_name='Пост'
     )
     author = models.ForeignKey(
@@ -61,6 +117,13 @@ class Comment(models.Model):
     created = models.DateTimeField(auto_now_add=True,
                                    verbose_name='Опубликовано')
 
+    class Meta:
+        ordering = ['created', 'id']
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_idx'),
+        ]
+
     def __str__(self):
         return self.text
 
@@ -70,17 +133,109 @@ class Follow(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='follower',
+        db_index=False,
         verbose_name='Подписчик'
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='following',
+        db_index=False,
         verbose_name='Автор'
     )
+    # Посты автора не новее этой даты в ленту подписчика не разложены
+    # и читаются из posts; None — разложены все, см. posts.timeline.
+    timeline_cutoff = models.DateTimeField(
+        null=True, blank=True, verbose_name='Граница ленты'
+    )
 
     class Meta:
+        # Подписки пользователя ищутся по уникальному (user, author),
+        # подписчики автора — по обратному индексу без чтения таблицы.
         constraints = [
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique following')
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, поддерживаемые сигналами."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество постов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписок'
+    )
+
+
+class TimelineEntry(models.Model):
+    """Пост в предрассчитанной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        db_index=False,
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    # Копия Post.pub_date: ленту читают по индексу этой таблицы в порядке
+    # публикации, не заходя в общий индекс постов.
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique timeline entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+
+
+class Recommendation(models.Model):
+    """Автор, которого стоит почитать, из пакетного расчёта."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        db_index=False,
+        verbose_name='Читатель'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommended_to',
+        verbose_name='Автор'
+    )
+    score = models.FloatField(verbose_name='Оценка')
+    rank = models.PositiveSmallIntegerField(verbose_name='Место')
+
+    class Meta:
+        # Рекомендации читателя читаются по порядку одним проходом индекса.
+        indexes = [
+            models.Index(fields=['user', 'rank'],
+                         name='recommendation_user_rank_idx'),
+        ]
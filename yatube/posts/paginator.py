@@ -0,0 +1,176 @@
+import base64
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils import timezone
+
+
+def encode_cursor(values, reverse=False):
+    """Упаковывает значения ключа сортировки в непрозрачный токен."""
+    payload = json.dumps([reverse, *values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен курсора, для битого токена возвращает None."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        reverse, *values = json.loads(base64.urlsafe_b64decode(padded))
+    except (TypeError, ValueError):
+        return None
+    return bool(reverse), values
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (pub_date, id) без COUNT и OFFSET.
+
+    Вместо номера страницы принимает курсор — границу предыдущей страницы,
+    поэтому глубокие страницы стоят столько же, сколько первая.
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-pk')):
+        super().__init__(object_list, per_page)
+        self.ordering = ordering
+
+    def get_page(self, cursor):
+        """Возвращает страницу по курсору, битый курсор ведёт на первую."""
+        decoded = self.decode(cursor)
+        if decoded is None:
+            return self.page_after(None)
+        reverse, values = decoded
+        if reverse:
+            return self.page_before(values)
+        return self.page_after(values)
+
+    def decode(self, cursor):
+        """Проверенный ключ курсора: (reverse, значения) или None.
+
+        Значения приводятся полями модели, поэтому в запрос и в ключи
+        кеша попадают только те курсоры, что могли прийти со страницы.
+        """
+        decoded = decode_cursor(cursor) if cursor else None
+        if decoded is None or len(decoded[1]) != len(self.ordering):
+            return None
+        reverse, values = decoded
+        try:
+            values = [
+                self._to_python(field, value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            return None
+        return reverse, values
+
+    def normalize(self, cursor):
+        """Канонический вид курсора; битый курсор — '', первая страница."""
+        decoded = self.decode(cursor)
+        if decoded is None:
+            return ''
+        reverse, values = decoded
+        return encode_cursor(
+            [self._serialize(value) for value in values], reverse=reverse
+        )
+
+    def page_after(self, values):
+        """Страница, начинающаяся сразу после ключа values."""
+        items = self._fetch(values, forward=True)
+        has_next = len(items) > self.per_page
+        items = items[:self.per_page]
+        return self._build_page(
+            items,
+            has_next=has_next,
+            has_previous=values is not None and bool(items),
+        )
+
+    def page_before(self, values):
+        """Страница, заканчивающаяся прямо перед ключом values."""
+        items = self._fetch(values, forward=False)
+        has_previous = len(items) > self.per_page
+        items = items[:self.per_page][::-1]
+        return self._build_page(
+            items, has_next=bool(items), has_previous=has_previous
+        )
+
+    def _fetch(self, values, forward):
+        """До per_page + 1 объектов за ключом values в порядке прохода."""
+        queryset = self._window(self.object_list, values, forward)
+        return list(queryset[:self.per_page + 1])
+
+    def _window(self, queryset, values, forward, ordering=None):
+        """queryset в порядке прохода, строго за ключом values.
+
+        ordering — те же поля ключа под другими именами, если queryset
+        не из той модели, что object_list.
+        """
+        ordering = ordering or self.ordering
+        if values is not None:
+            queryset = queryset.filter(
+                self._seek(values, forward, ordering)
+            )
+        if not forward:
+            ordering = [self._flip(field) for field in ordering]
+        return queryset.order_by(*ordering)
+
+    def _build_page(self, items, has_next, has_previous):
+        page = Page(items, None, self)
+        page.next_cursor = None
+        page.previous_cursor = None
+        if has_next:
+            page.next_cursor = encode_cursor(self._key(items[-1]))
+        if has_previous:
+            page.previous_cursor = encode_cursor(
+                self._key(items[0]), reverse=True
+            )
+        return page
+
+    def _key(self, obj):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            if isinstance(obj, dict):
+                value = obj[name if name != 'pk' else 'id']
+            else:
+                value = getattr(obj, name)
+            values.append(self._serialize(value))
+        return values
+
+    def _to_python(self, field, value):
+        name = field.lstrip('-')
+        meta = self.object_list.model._meta
+        model_field = meta.pk if name == 'pk' else meta.get_field(name)
+        value = model_field.to_python(value)
+        if value is None:
+            raise ValueError('Пустое значение в курсоре')
+        if isinstance(value, datetime) and timezone.is_naive(value):
+            raise ValueError('Курсор без часового пояса')
+        if isinstance(value, int) and not -2 ** 63 <= value < 2 ** 63:
+            raise ValueError('Курсор вне диапазона ключа')
+        return value
+
+    @staticmethod
+    def _serialize(value):
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+    def _seek(self, values, forward, ordering=None):
+        """Условие «строго после ключа» в порядке сортировки.
+
+        Для (-pub_date, -pk) и прохода вперёд получается
+        pub_date < d OR (pub_date = d AND pk < i).
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering or self.ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
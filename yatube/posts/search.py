@@ -0,0 +1,224 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Таблица posts_post_search хранит текст поста, уже приведённый к основам
+слов стеммером Портера для русского языка: встроенные токенизаторы FTS5
+морфологию не знают, и «котики» иначе не нашлись бы по запросу «котик».
+Строка индекса совпадает по rowid с id поста и обновляется сигналами.
+Результаты упорядочены по bm25 и листаются курсором по (rank, rowid).
+"""
+import re
+from functools import lru_cache
+
+from django.core.paginator import Page, Paginator
+from django.db import connection
+
+from .paginator import decode_cursor, encode_cursor
+
+TABLE = 'posts_post_search'
+
+VOWELS = 'аеиоуыэюя'
+WORD = re.compile(r'\w+')
+
+
+def _endings(*groups):
+    """Окончания с флагом «только после а или я», длинные первыми."""
+    return sorted(
+        ((ending, after_a) for endings, after_a in groups
+         for ending in endings.split()),
+        key=lambda item: -len(item[0]),
+    )
+
+
+PERFECTIVE_GERUND = _endings(
+    ('в вши вшись', True),
+    ('ив ивши ившись ыв ывши ывшись', False),
+)
+REFLEXIVE = _endings(('ся сь', False))
+ADJECTIVE = _endings((
+    'ее ие ые ое ими ыми ей ий ый ой ем им ым ом его ого ему ому их ых '
+    'ую юю ая яя ою ею', False,
+))
+PARTICIPLE = _endings(
+    ('ем нн вш ющ щ', True),
+    ('ивш ывш ующ', False),
+)
+VERB = _endings(
+    ('ла на ете йте ли й л ем н ло но ет ют ны ть ешь нно', True),
+    ('ила ыла ена ейте уйте ите или ыли ей уй ил ыл им ым ен ило ыло ено '
+     'ят ует уют ит ыт ены ить ыть ишь ую ю', False),
+)
+NOUN = _endings((
+    'а ев ов ие ье е иями ями ами еи ии и ией ей ой ий й иям ям ием ем '
+    'ам ом о у ах иях ях ы ь ию ью ю ия ья я', False,
+))
+SUPERLATIVE = _endings(('ейш ейше', False))
+DERIVATIONAL = _endings(('ост ость', False))
+
+
+def _regions(word):
+    """Начала областей RV и R2 алгоритма Портера."""
+    rv = next(
+        (i + 1 for i, char in enumerate(word) if char in VOWELS), len(word)
+    )
+    starts = [
+        i + 1 for i in range(1, len(word))
+        if word[i] not in VOWELS and word[i - 1] in VOWELS
+    ]
+    r2 = starts[1] if len(starts) > 1 else len(word)
+    return rv, r2
+
+
+def _remove(word, start, endings):
+    """Отрезает самое длинное окончание, целиком лежащее после start."""
+    for ending, after_a in endings:
+        if not word.endswith(ending):
+            continue
+        stem = word[:-len(ending)]
+        if len(stem) < start:
+            continue
+        if after_a and not (len(stem) > start and stem[-1] in 'ая'):
+            continue
+        return stem
+    return None
+
+
+# Словарь текстов невелик по сравнению с их объёмом: при пересборке
+# индекса одни и те же слова встречаются в тысячах постов.
+@lru_cache(maxsize=100_000)
+def stem(word):
+    """Основа русского слова по алгоритму Портера (Snowball)."""
+    word = word.lower().replace('ё', 'е')
+    rv, r2 = _regions(word)
+    result = _remove(word, rv, PERFECTIVE_GERUND)
+    if result is None:
+        word = _remove(word, rv, REFLEXIVE) or word
+        adjective = _remove(word, rv, ADJECTIVE)
+        if adjective is not None:
+            result = _remove(adjective, rv, PARTICIPLE) or adjective
+        else:
+            result = _remove(word, rv, VERB)
+            if result is None:
+                result = _remove(word, rv, NOUN)
+        if result is None:
+            result = word
+    word = result
+    if word.endswith('и') and len(word) > rv:
+        word = word[:-1]
+    word = _remove(word, r2, DERIVATIONAL) or word
+    if word.endswith('нн') and len(word) > rv + 1:
+        return word[:-1]
+    superlative = _remove(word, rv, SUPERLATIVE)
+    if superlative is not None:
+        word = superlative
+        if word.endswith('нн') and len(word) > rv + 1:
+            word = word[:-1]
+    elif word.endswith('ь') and len(word) > rv:
+        word = word[:-1]
+    return word
+
+
+def terms(text):
+    """Основы всех слов текста в порядке появления."""
+    return [stem(word) for word in WORD.findall(text.lower())]
+
+
+def _match_expression(query):
+    # Каждую основу берём в кавычки (это отключает синтаксис FTS5
+    # в пользовательском вводе) и ищем как префикс: «кот» найдёт и
+    # недописанное «котёно».
+    return ' '.join(f'"{term}"*' for term in terms(query))
+
+
+def index_post(post):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, body) VALUES (%s, %s)',
+            [post.pk, ' '.join(terms(post.text))],
+        )
+
+
+def remove(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild(posts):
+    """Пересобирает индекс по переданным постам целиком."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, body) VALUES (%s, %s)',
+            (
+                (pk, ' '.join(terms(text)))
+                for pk, text in posts.values_list('pk', 'text').iterator()
+            ),
+        )
+
+
+class SearchPaginator(Paginator):
+    """Курсорная пагинация результатов поиска по ключу (rank, rowid).
+
+    rank — оценка bm25: чем меньше, тем релевантнее, поэтому оба поля
+    ключа сортируются по возрастанию.
+    """
+
+    def __init__(self, query, post_list, per_page):
+        super().__init__(post_list, per_page)
+        self.match = _match_expression(query)
+
+    def get_page(self, cursor):
+        decoded = decode_cursor(cursor) if cursor else None
+        if decoded is not None:
+            reverse, values = decoded
+            if len(values) == 2 and all(
+                isinstance(value, (int, float)) for value in values
+            ):
+                return self._page(values, reverse)
+        return self._page(None, False)
+
+    def _page(self, values, reverse):
+        rows = self._hits(values, reverse) if self.match else []
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+        posts = self.object_list.in_bulk([post_id for post_id, _ in rows])
+        items = [posts[post_id] for post_id, _ in rows if post_id in posts]
+        page = Page(items, None, self)
+        page.next_cursor = None
+        page.previous_cursor = None
+        # Назад листают со страницы, после которой точно что-то есть.
+        has_next = reverse or has_more
+        has_previous = has_more if reverse else values is not None
+        if rows and has_next:
+            post_id, rank = rows[-1]
+            page.next_cursor = encode_cursor([rank, post_id])
+        if rows and has_previous:
+            post_id, rank = rows[0]
+            page.previous_cursor = encode_cursor([rank, post_id], reverse=True)
+        return page
+
+    def _hits(self, values, reverse):
+        # bm25() доступна только в запросе с MATCH, поэтому условие
+        # курсора накладывается снаружи подзапроса.
+        sql = (
+            f'SELECT id, score FROM ('
+            f' SELECT rowid AS id, bm25({TABLE}) AS score'
+            f' FROM {TABLE} WHERE {TABLE} MATCH %s'
+            f')'
+        )
+        params = [self.match]
+        comparison = '<' if reverse else '>'
+        if values is not None:
+            sql += (
+                f' WHERE score {comparison} %s'
+                f' OR (score = %s AND id {comparison} %s)'
+            )
+            params += [values[0], values[0], values[1]]
+        direction = 'DESC' if reverse else 'ASC'
+        sql += f' ORDER BY score {direction}, id {direction} LIMIT %s'
+        params.append(self.per_page + 1)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return list(cursor.fetchall())
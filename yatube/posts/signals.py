@@ -0,0 +1,173 @@
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from . import (
+    counters, feed_cache, follow_graph, search, thumbnails, timeline,
+    trending,
+)
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+# Поля, которые видны в карточках постов.
+USER_NAME_FIELDS = ('username', 'first_name', 'last_name')
+GROUP_NAME_FIELDS = ('title', 'slug')
+
+# Удаление сначала шлёт pre_delete всем удаляемым объектам, потом
+# post_delete. Посты, которые удаляются прямо сейчас: их комментарии
+# уходят каскадом, и поправлять счётчик и версии поста ради них незачем.
+_deleting_posts = set()
+# Сколько комментариев поста уходит одним удалением: счётчик поста
+# и его версии меняются один раз, на первом post_delete.
+_deleting_comments = Counter()
+
+
+def _remember_names(instance, fields, raw, update_fields):
+    """Запоминает прежние имена объекта, если save() может их поменять."""
+    instance._previous_names = None
+    if instance.pk is None or raw:
+        return
+    if update_fields is not None and not set(update_fields) & set(fields):
+        return
+    instance._previous_names = type(instance).objects.filter(
+        pk=instance.pk
+    ).values_list(*fields).first()
+
+
+def _names_changed(instance, fields):
+    previous = getattr(instance, '_previous_names', None)
+    return previous is not None and previous != tuple(
+        getattr(instance, field) for field in fields
+    )
+
+
+@receiver(pre_save, sender=User)
+def user_before_save(sender, instance, raw, update_fields, **kwargs):
+    _remember_names(instance, USER_NAME_FIELDS, raw, update_fields)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+    if _names_changed(instance, USER_NAME_FIELDS):
+        feed_cache.bump({feed_cache.NAMES})
+
+
+@receiver(pre_save, sender=Group)
+def group_before_save(sender, instance, raw, update_fields, **kwargs):
+    _remember_names(instance, GROUP_NAME_FIELDS, raw, update_fields)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    scopes = {feed_cache.GROUPS, feed_cache.group_scope(instance.pk)}
+    if _names_changed(instance, GROUP_NAME_FIELDS):
+        scopes.add(feed_cache.NAMES)
+    feed_cache.bump(scopes)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    # Посты теряют группу через SET NULL, без сигналов Post: карточки
+    # со ссылкой на группу сбрасываются вместе с версией имён.
+    feed_cache.bump({
+        feed_cache.GROUPS, feed_cache.group_scope(instance.pk),
+        feed_cache.NAMES,
+    })
+
+
+@receiver(pre_save, sender=Post)
+def post_before_save(sender, instance, raw, **kwargs):
+    # Запоминаем прежние группу и картинку: при правке поста нужно
+    # перенести счётчик и нарезать миниатюры новой картинки.
+    instance._previous_group_id = None
+    instance._previous_image = None
+    if instance.pk is not None and not raw:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image'
+            ).first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        # Фикстуры грузятся без сигналов, счётчики и ленты пересобираются
+        # командами rebuild_counters и rebuild_timelines.
+        return
+    if created:
+        counters.bump_user(instance.author_id, 'posts_count', 1)
+        counters.bump_group_posts(instance.group_id, 1)
+        timeline.fan_out(instance)
+        trending.record_post(instance)
+    elif instance._previous_group_id != instance.group_id:
+        counters.bump_group_posts(instance._previous_group_id, -1)
+        counters.bump_group_posts(instance.group_id, 1)
+    search.index_post(instance)
+    feed_cache.bump(feed_cache.post_scopes(
+        instance, group_ids=[instance._previous_group_id]
+    ))
+    if instance.image and instance.image.name != instance._previous_image:
+        transaction.on_commit(lambda: thumbnails.pregenerate(instance))
+
+
+@receiver(pre_delete, sender=Post)
+def post_before_delete(sender, instance, **kwargs):
+    _deleting_posts.add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    _deleting_posts.discard(instance.pk)
+    counters.bump_user(instance.author_id, 'posts_count', -1)
+    counters.bump_group_posts(instance.group_id, -1)
+    search.remove(instance.pk)
+    feed_cache.bump(feed_cache.post_scopes(instance))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        counters.bump_post_comments(instance.post_id, 1)
+        feed_cache.bump(feed_cache.comment_scopes(instance.post_id))
+        trending.record_comment(instance)
+
+
+@receiver(pre_delete, sender=Comment)
+def comment_before_delete(sender, instance, **kwargs):
+    _deleting_comments[instance.post_id] += 1
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    deleted = _deleting_comments.pop(instance.post_id, 0)
+    # Версии удаляемого поста меняет post_deleted.
+    if deleted and instance.post_id not in _deleting_posts:
+        counters.bump_post_comments(instance.post_id, -deleted)
+        feed_cache.bump(feed_cache.comment_scopes(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.user_id, 'following_count', 1)
+        counters.bump_user(instance.author_id, 'followers_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        follow_graph.forget(instance.user_id)
+        trending.record_follow(instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.user_id, 'following_count', -1)
+    counters.bump_user(instance.author_id, 'followers_count', -1)
+    timeline.unfollow(instance.user_id, instance.author_id)
+    follow_graph.forget(instance.user_id)
@@ -0,0 +1,15 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(image, geometry, **options):
+    """<picture> с WebP/AVIF и srcset по ширинам из готовых миниатюр."""
+    context = thumbnails.picture(image, geometry, options)
+    context['sizes'] = '(max-width: {0}px) 100vw, {0}px'.format(
+        geometry.split('x')[0]
+    )
+    return context
@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from .. import benchmark
+from ..models import Follow, Group, Post, UserStats
+from ..urls import urlpatterns
+
+User = get_user_model()
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class BenchmarkTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_is_reproducible(self):
+        """Один и тот же seed даёт одинаковые данные и степенной граф."""
+        benchmark.seed(users=30, posts=60, follows=5, random_seed=1)
+        snapshot = list(Post.objects.order_by('pk').values_list(
+            'text', 'author__username'
+        ))
+        stats = list(UserStats.objects.order_by(
+            '-followers_count'
+        ).values_list('followers_count', flat=True))
+        # Первый автор популярнее медианного в разы.
+        self.assertGreater(stats[0], 3 * stats[len(stats) // 2])
+        self.assertEqual(
+            Follow.objects.filter(user__username='user0').count(),
+            UserStats.objects.get(user__username='user0').following_count,
+        )
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        benchmark.seed(users=30, posts=60, follows=5, random_seed=1)
+        self.assertEqual(snapshot, list(
+            Post.objects.order_by('pk').values_list('text', 'author__username')
+        ))
+
+    def test_run_covers_every_route(self):
+        """Прогон замеряет каждый маршрут posts/urls.py."""
+        benchmark.seed(users=10, posts=20, follows=3)
+        results = benchmark.run(iterations=2, warmup=0)
+        self.assertEqual(
+            set(results), {pattern.name for pattern in urlpatterns}
+        )
+        for name, result in results.items():
+            with self.subTest(name=name):
+                self.assertLess(result['status'], 400)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        # Ленты из кеша обходятся без базы, но запросы остальных
+        # страниц должны попасть в замер.
+        self.assertGreater(
+            sum(result['queries'] for result in results.values()), 0
+        )
+
+    def test_render_modes(self):
+        """Рендеринг ленты меряется без запросов к базе во всех режимах."""
+        benchmark.seed(users=10, posts=20, follows=3)
+        results = benchmark.render(iterations=2, warmup=1)
+        self.assertEqual(set(results), set(benchmark.RENDER_MODES))
+        for mode, result in results.items():
+            with self.subTest(mode=mode):
+                self.assertEqual(result['posts'], 10)
+                self.assertEqual(result['queries'], 0)
+
+    def test_sessions(self):
+        """Сессия и пользователь из кеша не стоят запросов к базе."""
+        benchmark.seed(users=10, posts=20, follows=3)
+        results = benchmark.sessions(iterations=2, warmup=1)
+        self.assertEqual(set(results), set(benchmark.SESSION_MODES))
+        self.assertEqual(results['database']['queries'], 2)
+        self.assertEqual(results['cache']['queries'], 0)
+        for result in results.values():
+            self.assertEqual(result['status'], 200)
+
+    def test_compare(self):
+        """Рост p95 выше порога и лишние запросы считаются регрессией."""
+        baseline = {
+            'index': {'p95_ms': 10.0, 'queries': 3},
+            'profile': {'p95_ms': 10.0, 'queries': 5},
+        }
+        results = {
+            'index': {'p95_ms': 10.5, 'queries': 3},
+            'profile': {'p95_ms': 9.0, 'queries': 6},
+            'new': {'p95_ms': 1.0, 'queries': 1},
+        }
+        lines, regressions = benchmark.compare(results, baseline, 10.0)
+        self.assertEqual(regressions, ['profile'])
+        self.assertEqual(len(lines), 3)
@@ -0,0 +1,115 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .. import counters
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_signals_keep_counters(self):
+        """Создание и удаление записей меняет счётчики."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+
+        post.delete()
+        Follow.objects.all().delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_comment_deletes_bump_post_once(self):
+        """Удаление комментариев меняет счётчик поста одним запросом."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        other = Post.objects.create(author=self.author, text='Другой')
+        Comment.objects.bulk_create(
+            Comment(post=commented, author=self.reader, text='Ок')
+            for commented in (post, post, post, other)
+        )
+        Post.objects.update(comments_count=3)
+        with CaptureQueriesContext(connection) as queries:
+            Comment.objects.all().delete()
+        updates = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "posts_post"')
+        ]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list(
+                'comments_count', flat=True
+            )),
+            [0, 2],
+        )
+
+    def test_post_delete_skips_comment_counter(self):
+        """Каскад комментариев удаляемого поста не трогает его счётчик."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.reader, text='Ок')
+            for _ in range(3)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            post.delete()
+        self.assertFalse(any(
+            query['sql'].startswith('UPDATE "posts_post"')
+            for query in queries.captured_queries
+        ))
+
+    def test_group_change_moves_counter(self):
+        """Смена группы поста переносит счётчик."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        post.group = self.other_group
+        post.save()
+        self.assertEqual(
+            list(Group.objects.order_by('pk').values_list(
+                'posts_count', flat=True
+            )),
+            [0, 1],
+        )
+
+    def test_rebuild_command(self):
+        """Команда находит и исправляет расхождения."""
+        Post.objects.bulk_create([Post(author=self.author, text='Пост')])
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', '--check', stdout=StringIO())
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(counters.rebuild(fix=False), [])
+        self.assertEqual(self.stats(self.author).posts_count, 1)
@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import follow_graph
+from ..models import Follow, Post
+
+User = get_user_model()
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(5)
+        ]
+        for author in cls.authors[3:0:-1]:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_following(self):
+        """Подписки читаются из кеша отсортированными."""
+        ids = follow_graph.following_ids(self.reader)
+        self.assertEqual(list(ids), sorted(a.pk for a in self.authors[1:4]))
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follow_graph.is_following(self.reader, self.authors[2])
+            )
+            self.assertFalse(
+                follow_graph.is_following(self.reader, self.authors[0])
+            )
+            self.assertEqual(
+                follow_graph.following_set(self.reader),
+                {a.pk for a in self.authors[1:4]},
+            )
+
+    def test_signals_update_graph(self):
+        """Подписка и отписка сразу видны в закешированном графе."""
+        follow_graph.following_ids(self.reader)
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        self.assertTrue(
+            follow_graph.is_following(self.reader, self.authors[0])
+        )
+        Follow.objects.filter(
+            user=self.reader, author=self.authors[1]
+        ).delete()
+        self.assertFalse(
+            follow_graph.is_following(self.reader, self.authors[1])
+        )
+
+    def test_attach_follow_state(self):
+        """Отметки для всех авторов страницы — одно чтение графа."""
+        posts = [
+            Post.objects.create(author=author, text='Пост')
+            for author in self.authors
+        ]
+        follow_graph.following_ids(self.reader)
+        with self.assertNumQueries(0):
+            follow_graph.attach_follow_state(self.reader, posts)
+        self.assertEqual(
+            [post.author_followed for post in posts],
+            [False, True, True, True, False],
+        )
+        follow_graph.attach_follow_state(AnonymousUser(), posts)
+        self.assertFalse(any(post.author_followed for post in posts))
+
+    def test_profile_button_for_current_user(self):
+        """Кнопка в профиле зависит от подписок смотрящего, а не автора."""
+        client = Client()
+        client.force_login(self.authors[0])
+        response = client.get(
+            reverse('posts:profile', args={self.authors[1].username})
+        )
+        self.assertFalse(response.context['following'])
+        self.assertContains(response, 'Подписаться')
+
+    def test_index_marks_followed_authors(self):
+        Post.objects.create(author=self.authors[1], text='Подписан')
+        client = Client()
+        client.force_login(self.reader)
+        self.assertContains(
+            client.get(reverse('posts:index')), 'Вы подписаны на автора'
+        )
+        self.assertNotContains(
+            self.client.get(reverse('posts:index')), 'Вы подписаны на автора'
+        )
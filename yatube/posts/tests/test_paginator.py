@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Post
+from ..paginator import CursorPaginator, decode_cursor
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        now = timezone.now()
+        posts = Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author) for i in range(25)
+        )
+        # Половина постов с одинаковой датой — проверяем разрешение ничьих.
+        for i, post in enumerate(posts):
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=now - timedelta(minutes=i // 2)
+            )
+        cls.expected = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        cache.clear()
+
+    def walk_forward(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        pages = [paginator.get_page(None)]
+        while pages[-1].next_cursor:
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        return paginator, pages
+
+    def test_pages_cover_feed_without_gaps(self):
+        """Проход по курсорам выдаёт все посты ровно один раз."""
+        _, pages = self.walk_forward()
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        walked = [post for page in pages for post in page]
+        self.assertEqual(walked, self.expected)
+
+    def test_previous_cursor_returns_same_page(self):
+        """Курсор назад возвращает ровно предыдущую страницу."""
+        paginator, pages = self.walk_forward()
+        self.assertIsNone(pages[0].previous_cursor)
+        back = paginator.get_page(pages[2].previous_cursor)
+        self.assertEqual(list(back), list(pages[1]))
+        self.assertEqual(back.next_cursor, pages[1].next_cursor)
+
+    def test_deep_page_costs_one_query(self):
+        """Глубокая страница — один запрос без COUNT."""
+        _, pages = self.walk_forward()
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        with self.assertNumQueries(1):
+            paginator.get_page(pages[-1].previous_cursor)
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Битый курсор приводит на первую страницу."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        for cursor in ('мусор', 'WyJhIiwiYiJd', '!!!'):
+            page = paginator.get_page(cursor)
+            self.assertEqual(list(page), self.expected[:10])
+
+    def test_normalize(self):
+        """Равные курсоры приводятся к одному виду, битые — к пустому."""
+        paginator, pages = self.walk_forward()
+        cursor = pages[0].next_cursor
+        padded = cursor + '=' * (-len(cursor) % 4)
+        self.assertEqual(paginator.normalize(padded), cursor)
+        for broken in ('мусор', 'WzAsIjIwMjAiLDFd', 'WzAsbnVsbCwxXQ', ''):
+            with self.subTest(cursor=broken):
+                self.assertEqual(paginator.normalize(broken), '')
+
+    def test_view_renders_cursor_links(self):
+        """Главная страница отдаёт ссылку на следующую страницу."""
+        response = self.client.get(reverse('posts:index'))
+        page_obj = response.context['page_obj']
+        self.assertContains(response, f'?cursor={page_obj.next_cursor}')
+        reverse_flag, _ = decode_cursor(page_obj.next_cursor)
+        self.assertFalse(reverse_flag)
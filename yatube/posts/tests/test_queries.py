@@ -0,0 +1,149 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api import urls as api_urls
+
+from .. import benchmark, search
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+# Таблицы, растущие с числом постов: их не читают целиком даже по индексу.
+HOT_TABLES = {'posts_post', 'posts_comment', 'posts_timelineentry'}
+
+
+class QueryBudgetMixin:
+    """Проверка того, что страница укладывается в заданное число запросов."""
+
+    def assertQueryBudget(self, client, url, budget):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        executed = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(
+            len(executed), budget,
+            f'{url}: {len(executed)} запросов вместо {budget}:\n'
+            + '\n'.join(executed)
+        )
+
+
+class FeedQueryBudgetTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.author = User.objects.create_user(
+            username='Author', first_name='Лев', last_name='Толстой'
+        )
+        # Каждый пост — свой автор и своя группа: так N+1 не спрятать.
+        for i in range(10):
+            author = User.objects.create_user(username=f'author{i}')
+            group = Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description='-'
+            )
+            Follow.objects.create(user=cls.user, author=author)
+            Post.objects.create(author=author, group=group, text=f'Пост {i}')
+        for i in range(10):
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост автора {i}'
+            )
+        cls.post = Post.objects.filter(author=cls.author).first()
+        for i in range(10):
+            commenter = User.objects.create_user(username=f'commenter{i}')
+            Comment.objects.create(
+                post=cls.post, author=commenter, text=f'Комментарий {i}'
+            )
+
+    def setUp(self):
+        self.auth_client = Client()
+        self.auth_client.force_login(self.user)
+
+    def test_feed_query_budgets(self):
+        """Число запросов страниц не зависит от числа постов на них.
+
+        Кеш пуст: в бюджет входят сессия, пользователь и, на лентах
+        с отметками подписок, список подписок читателя. Ленты читают
+        ключи страницы, а посты — отдельно по первичному ключу: в кеше
+        они лежат под версиями карточек. Лента подписок ещё читает
+        популярных авторов читателя и рекомендации «кого почитать».
+        """
+        budgets = {
+            reverse('posts:index'): 5,
+            reverse('posts:group_list', args={'test-slug'}): 6,
+            reverse('posts:profile', args={'Author'}): 6,
+            reverse('posts:post_detail', args={self.post.pk}): 6,
+            reverse('posts:follow_index'): 6,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                self.assertQueryBudget(self.auth_client, url, budget)
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class QueryPlanTest(TestCase):
+    """Запросы страниц идут по индексам, без полного чтения таблиц."""
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def problems(self, sql, plan):
+        # Первая страница ленты — ORDER BY по индексу и LIMIT без
+        # условий: обход индекса останавливается через LIMIT строк.
+        bounded = ' LIMIT ' in sql and ' WHERE ' not in sql
+        # bm25 известен только после MATCH: сортируются лишь совпадения,
+        # а не таблица постов.
+        ranked = f'{search.TABLE} MATCH ' in sql
+        problems = []
+        for step in plan:
+            words = step.split()
+            scanned = words[1] if words[0] == 'SCAN' else None
+            if 'TEMP B-TREE' in step:
+                if not (ranked and step == 'USE TEMP B-TREE FOR ORDER BY'):
+                    problems.append(step)
+            elif scanned is None or 'CONSTANT ROW' in step:
+                continue
+            elif 'INDEX' not in step:
+                problems.append(step)
+            # Чтение растущей таблицы плохо и по покрывающему индексу.
+            elif scanned in HOT_TABLES and not bounded:
+                problems.append(step)
+        return problems
+
+    def test_query_plans(self):
+        """Ни одна страница и ни один метод API не сортирует и не сканирует.
+
+        Поиск проверяется наравне со всеми: ему позволена только
+        сортировка найденного по bm25.
+        """
+        benchmark.seed(users=20, posts=100, follows=5)
+        user = User.objects.order_by('-stats__following_count').first()
+        self.client.force_login(user)
+        urls = [
+            *benchmark.route_urls().values(),
+            *benchmark.route_urls(api_urls.app_name, api_urls.urlpatterns)
+            .values(),
+            f'{reverse("posts:post_search")}?q=котик',
+        ]
+        for url in urls:
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                with self.subTest(url=url, sql=sql):
+                    self.assertEqual(
+                        self.problems(sql, self.plan(sql)), []
+                    )
@@ -0,0 +1,104 @@
+import importlib.util
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import recommendations
+from ..models import Follow, Recommendation
+
+User = get_user_model()
+
+HAS_SCIPY = (
+    importlib.util.find_spec('numpy') is not None
+    and importlib.util.find_spec('scipy') is not None
+)
+
+
+@skipUnless(HAS_SCIPY, 'нужны numpy и scipy')
+class RecommendationsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {
+            name: User.objects.create_user(username=name)
+            for name in ('reader', 'b', 'c', 'd', 'e')
+        }
+        for user, author in (
+            ('reader', 'b'), ('reader', 'c'),
+            ('b', 'd'), ('c', 'd'), ('c', 'e'),
+        ):
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author]
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def recommended(self, name):
+        return list(Recommendation.objects.filter(
+            user=self.users[name]
+        ).order_by('rank').values_list('author__username', 'score'))
+
+    def test_friends_of_friends(self):
+        """Автор, на которого подписаны двое из читаемых, — первый."""
+        recommendations.rebuild()
+        self.assertEqual(self.recommended('reader'), [('d', 2.0), ('e', 1.0)])
+
+    def test_cofollow_similarity(self):
+        """Похожий по подписчикам автор рекомендуется без друзей друзей.
+
+        У d и e общий подписчик c: читателю d предлагается e.
+        """
+        recommendations.rebuild()
+        [(author, score)] = self.recommended('b')
+        self.assertEqual(author, 'e')
+        self.assertAlmostEqual(score, 2 ** -0.5, places=5)
+
+    def test_excludes_self_and_followed(self):
+        recommendations.rebuild(chunk_size=2)
+        for user in self.users.values():
+            followed = set(Follow.objects.filter(user=user).values_list(
+                'author_id', flat=True
+            ))
+            authors = set(Recommendation.objects.filter(
+                user=user
+            ).values_list('author_id', flat=True))
+            with self.subTest(user=user.username):
+                self.assertFalse(authors & (followed | {user.pk}))
+
+    def test_table_kept_until_computed(self):
+        """Старые рекомендации удаляются только после расчёта новых."""
+        recommendations.rebuild()
+        before = Recommendation.objects.count()
+        with mock.patch.object(
+            recommendations, 'compute', side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                recommendations.rebuild()
+        self.assertEqual(Recommendation.objects.count(), before)
+
+    def test_page_reads_one_query(self):
+        """Лента подписок показывает рекомендации, кроме уже читаемых."""
+        call_command('rebuild_recommendations', stdout=StringIO())
+        client = Client()
+        client.force_login(self.users['reader'])
+        url = reverse('posts:follow_index')
+        response = client.get(url)
+        self.assertEqual(
+            [r.author.username for r in response.context['recommendations']],
+            ['d', 'e'],
+        )
+        self.assertContains(response, 'Кого почитать')
+        Follow.objects.create(
+            user=self.users['reader'], author=self.users['d']
+        )
+        self.assertEqual(
+            [r.author.username for r in recommendations.for_user(
+                self.users['reader']
+            )],
+            ['e'],
+        )
@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+
+User = get_user_model()
+
+
+class StemTest(TestCase):
+    def test_stem(self):
+        """Формы одного слова сводятся к одной основе."""
+        cases = {
+            'котики': 'котик',
+            'книгами': 'книг',
+            'красивейший': 'красив',
+            'говорила': 'говор',
+            'ёлки': 'елк',
+        }
+        for word, expected in cases.items():
+            with self.subTest(word=word):
+                self.assertEqual(search.stem(word), expected)
+
+
+class PostSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Writer')
+        cls.cats = [
+            Post.objects.create(
+                author=cls.author, text=f'Котики и котик номер {i}'
+            )
+            for i in range(15)
+        ]
+        cls.dog = Post.objects.create(
+            author=cls.author, text='Про собак и только про собак'
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def search(self, query, cursor=None):
+        params = {'q': query}
+        if cursor:
+            params['cursor'] = cursor
+        return self.client.get(reverse('posts:post_search'), params)
+
+    def test_morphology(self):
+        """Пост находится по другой форме слова, лишние не находятся."""
+        response = self.search('собака')
+        self.assertEqual(list(response.context['page_obj']), [self.dog])
+
+    def test_index_follows_signals(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        dog = Post.objects.get(pk=self.dog.pk)
+        dog.text = 'Теперь про лошадей'
+        dog.save()
+        self.assertFalse(self.search('собаки').context['page_obj'])
+        self.assertTrue(self.search('лошадь').context['page_obj'])
+        dog.delete()
+        self.assertFalse(self.search('лошадь').context['page_obj'])
+
+    def test_cursor_pages(self):
+        """Курсор проходит все результаты вперёд и назад без повторов."""
+        first = self.search('котиками').context['page_obj']
+        second = self.search('котиками', first.next_cursor).context['page_obj']
+        self.assertEqual(len(first), 10)
+        self.assertEqual(len(second), 5)
+        self.assertIsNone(second.next_cursor)
+        self.assertCountEqual([*first, *second], self.cats)
+        back = self.search('котиками', second.previous_cursor)
+        self.assertEqual(list(back.context['page_obj']), list(first))
+
+    def test_search_syntax_is_escaped(self):
+        """Операторы FTS5 в запросе не ломают страницу."""
+        for query in ('"', 'NOT', 'кот*', '(', 'a OR'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query).status_code, 200)
@@ -0,0 +1,96 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='picture.png'):
+    content = BytesIO()
+    Image.new('RGB', (40, 20), 'red').save(content, 'PNG')
+    return SimpleUploadedFile(name, content.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Painter')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_request_does_not_generate(self):
+        """Без готовой миниатюры страница отдаёт оригинал и ставит задачу."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, post.image.url)
+        schedule.assert_called_once()
+        self.assertEqual(schedule.call_args[0][0], post.image.name)
+
+    def test_saved_post_gets_all_thumbnails(self):
+        """После сохранения поста нарезаны все размеры из шаблонов."""
+        with mock.patch(
+            'django.db.transaction.on_commit', lambda func: func()
+        ):
+            post = Post.objects.create(
+                author=self.user, text='Пост', image=make_image('saved.png')
+            )
+        backend = thumbnails.EagerThumbnailBackend()
+        for geometry, options in thumbnails.all_variants():
+            with self.subTest(geometry=geometry, options=options):
+                with mock.patch.object(thumbnails, 'schedule') as schedule:
+                    image = backend.get_thumbnail(
+                        post.image, geometry, **options
+                    )
+                schedule.assert_not_called()
+                self.assertNotEqual(image.name, post.image.name)
+                self.assertTrue(image.exists())
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, post.image.url)
+        for width in thumbnails.POST_IMAGE_WIDTHS:
+            self.assertContains(response, f' {width}w')
+
+    def test_picture_sources(self):
+        """<source> есть для каждого современного формата, что умеет Pillow."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image('modern.png')
+        )
+        thumbnails.generate(post.image.name, thumbnails.all_variants())
+        geometry, options = thumbnails.POST_IMAGE_THUMBNAILS[0]
+        picture = thumbnails.picture(post.image, geometry, options)
+        self.assertEqual(
+            [source['type'] for source in picture['sources']],
+            [thumbnails.MIME_TYPES[format_]
+             for format_ in thumbnails.modern_formats()],
+        )
+        self.assertTrue(picture['src'].endswith('.jpg'))
+        self.assertEqual(
+            picture['srcset'].count('w,'),
+            len(thumbnails.POST_IMAGE_WIDTHS) - 1,
+        )
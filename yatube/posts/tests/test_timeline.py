@@ -0,0 +1,120 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+
+    def page(self, cursor=None, per_page=10):
+        paginator = timeline.TimelinePaginator(
+            self.reader, Post.objects.all(), per_page
+        )
+        return paginator.get_page(cursor)
+
+    def feed(self):
+        return set(self.page().object_list)
+
+    def test_follow_backfills_and_post_fans_out(self):
+        """Подписка добавляет старые посты, новый пост — раскладывается."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+        self.assertEqual(self.feed(), {self.old_post, new_post})
+
+    def test_entries_copy_pub_date(self):
+        """Запись ленты хранит дату поста: лента листается без Post."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            dict(TimelineEntry.objects.values_list('post_id', 'pub_date')),
+            {
+                self.old_post.pk: self.old_post.pub_date,
+                new_post.pk: new_post.pub_date,
+            },
+        )
+
+    def test_pages_follow_feed_order(self):
+        """Курсор листает ленту вперёд и назад в порядке публикации."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [self.old_post] + [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(4)
+        ]
+        expected = sorted(
+            posts, key=lambda post: (post.pub_date, post.pk), reverse=True
+        )
+        first = self.page(per_page=3)
+        self.assertEqual(list(first.object_list), expected[:3])
+        second = self.page(first.next_cursor, per_page=3)
+        self.assertEqual(list(second.object_list), expected[3:])
+        self.assertIsNone(second.next_cursor)
+        back = self.page(second.previous_cursor, per_page=3)
+        self.assertEqual(list(back.object_list), expected[:3])
+
+    @override_settings(TIMELINE_BACKFILL=2)
+    def test_backfill_is_limited(self):
+        """Подписка раскладывает новейшие посты, старые читаются из posts."""
+        posts = [self.old_post] + [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(4)
+        ]
+        expected = sorted(
+            posts, key=lambda post: (post.pub_date, post.pk), reverse=True
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list('post_id', flat=True)),
+            {post.pk for post in expected[:2]},
+        )
+        first = self.page(per_page=2)
+        self.assertEqual(list(first.object_list), expected[:2])
+        second = self.page(first.next_cursor, per_page=2)
+        self.assertEqual(list(second.object_list), expected[2:4])
+        third = self.page(second.next_cursor, per_page=2)
+        self.assertEqual(list(third.object_list), expected[4:])
+        self.assertIsNone(third.next_cursor)
+        back = self.page(second.previous_cursor, per_page=2)
+        self.assertEqual(list(back.object_list), expected[:2])
+
+    def test_unfollow_clears_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed(), set())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_celebrity_is_merged_on_read(self):
+        """Посты популярного автора не раскладываются, но видны в ленте."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed(), {self.old_post, new_post})
+
+    def test_celebrity_posts_are_not_repeated(self):
+        """Пост и в ленте, и у популярного автора выводится один раз."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with override_settings(TIMELINE_FANOUT_LIMIT=1):
+            new_post = Post.objects.create(author=self.author, text='Новый')
+            self.assertEqual(
+                list(self.page().object_list), [new_post, self.old_post]
+            )
+
+    def test_rebuild_restores_entries(self):
+        """Пересборка восстанавливает ленты по таблице подписок."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        timeline.rebuild()
+        self.assertEqual(self.feed(), {self.old_post})
@@ -0,0 +1,108 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from .. import benchmark, counters
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class TransferTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'dump.jsonl')
+
+    def snapshot(self):
+        return {
+            'users': list(User.objects.order_by('pk').values_list(
+                'pk', 'username', 'password', 'first_name'
+            )),
+            'groups': list(Group.objects.order_by('pk').values_list(
+                'pk', 'slug', 'posts_count'
+            )),
+            'posts': list(Post.objects.order_by('pk').values_list(
+                'pk', 'text', 'pub_date', 'author_id', 'group_id',
+                'comments_count',
+            )),
+            'comments': list(Comment.objects.order_by('pk').values_list(
+                'pk', 'post_id', 'author_id', 'text', 'created'
+            )),
+            'follows': list(Follow.objects.order_by('pk').values_list(
+                'user_id', 'author_id'
+            )),
+            'timeline': TimelineEntry.objects.count(),
+        }
+
+    def wipe(self):
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка порциями восстанавливают те же данные."""
+        benchmark.seed(users=12, posts=40, follows=4)
+        before = self.snapshot()
+        stderr = StringIO()
+        call_command('export_posts', output=self.path, batch_size=7,
+                     stderr=stderr)
+        self.assertIn('Выгружено записей: ', stderr.getvalue())
+        self.wipe()
+
+        call_command('import_posts', self.path, batch_size=7,
+                     stdout=StringIO())
+
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(counters.rebuild(fix=False), [])
+        text = Post.objects.order_by('pk').values_list('text', flat=True)[0]
+        response = self.client.get('/search/', {'q': text.split()[0]})
+        self.assertTrue(response.context['page_obj'].object_list)
+
+    def test_load_refreshes_feeds_and_keeps_cache(self):
+        """Загрузка сбрасывает версии лент, а не весь кеш."""
+        benchmark.seed(users=3, posts=5, follows=1)
+        call_command('export_posts', output=self.path, stderr=StringIO())
+        self.wipe()
+        self.assertFalse(
+            self.client.get('/').context['page_obj'].object_list
+        )
+        cache.set('unrelated', 'kept', None)
+
+        call_command('import_posts', self.path, stdout=StringIO())
+
+        self.assertEqual(cache.get('unrelated'), 'kept')
+        self.assertEqual(
+            len(self.client.get('/').context['page_obj'].object_list), 5
+        )
+        author = Post.objects.values_list('author__username', flat=True)[0]
+        response = self.client.get(f'/profile/{author}/')
+        self.assertTrue(response.context['page_obj'].object_list)
+
+    def test_existing_rows(self):
+        """Повторная загрузка падает, а с --ignore-existing пропускается."""
+        benchmark.seed(users=3, posts=5, follows=1)
+        call_command('export_posts', output=self.path, stderr=StringIO())
+        with self.assertRaisesMessage(CommandError, '--ignore-existing'):
+            call_command('import_posts', self.path)
+        call_command('import_posts', self.path, ignore_existing=True,
+                     stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 5)
+
+    def test_bad_line(self):
+        """Ошибка в файле называет строку и не оставляет данных."""
+        with open(self.path, 'w', encoding='utf-8') as dump:
+            dump.write(
+                '{"model": "posts.group", "pk": 1, "fields": '
+                '{"title": "Г", "slug": "g", "description": ""}}\n'
+                '{"model": "posts.like", "pk": 1, "fields": {}}\n'
+            )
+        with self.assertRaisesMessage(CommandError, 'Строка 2'):
+            call_command('import_posts', self.path)
+        self.assertFalse(Group.objects.exists())
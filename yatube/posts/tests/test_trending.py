@@ -0,0 +1,114 @@
+import math
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import trending
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class TrendingScoresTest(TestCase):
+    def test_decay(self):
+        """Событие на период полураспада раньше весит вдвое меньше."""
+        now = timezone.now()
+        older = now - timedelta(seconds=trending.settings.TRENDING_HALF_LIFE)
+        self.assertAlmostEqual(
+            trending.log_weight(1, now) - trending.log_weight(1, older),
+            math.log(2),
+        )
+
+    def test_space_saving(self):
+        """Новичок вытесняет слабейшего и наследует его оценку."""
+        scores = {}
+        for item_id, value in ((1, 5.0), (2, 1.0), (3, 3.0)):
+            trending.add(scores, item_id, value, capacity=3)
+        trending.add(scores, 4, 1.0, capacity=3)
+        self.assertNotIn(2, scores)
+        self.assertAlmostEqual(scores[4], 1.0 + math.log(2))
+        trending.add(scores, 1, 5.0, capacity=3)
+        self.assertAlmostEqual(scores[1], 5.0 + math.log(2))
+
+
+class TrendingViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Обсуждаемая', slug='hot', description='-'
+        )
+        cls.quiet_group = Group.objects.create(
+            title='Тихая', slug='quiet', description='-'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.quiet = Post.objects.create(
+            author=self.author, text='Тихий пост', group=self.quiet_group
+        )
+        self.hot = Post.objects.create(
+            author=self.author, text='Горячий пост', group=self.group
+        )
+        self.old = Post.objects.create(author=self.reader, text='Старый пост')
+
+    def comment(self, post, times):
+        for _ in range(times):
+            Comment.objects.create(post=post, author=self.reader, text='!')
+
+    def test_comments_and_follows_rank_posts(self):
+        self.comment(self.hot, 3)
+        self.comment(self.quiet, 1)
+        self.assertEqual(
+            trending.top_posts(), [self.hot, self.quiet, self.old]
+        )
+        # Подписка засчитывается последнему посту автора.
+        Follow.objects.create(user=self.author, author=self.reader)
+        self.assertEqual(trending.top_posts(2), [self.hot, self.old])
+        self.assertEqual(
+            trending.top_groups(), [self.group, self.quiet_group]
+        )
+
+    def test_recent_events_outweigh_old(self):
+        """Давние комментарии затухают: свежий пост обгоняет старый."""
+        long_ago = timezone.now() - timedelta(days=30)
+        scores = {}
+        for _ in range(100):
+            trending.add(
+                scores, self.old.pk,
+                trending.log_weight(1, long_ago), capacity=10,
+            )
+        trending.add(scores, self.hot.pk, trending.log_weight(1), 10)
+        cache.set(trending.POSTS, scores, None)
+        self.assertEqual(trending.top_posts(), [self.hot, self.old])
+
+    def test_deleted_post_leaves_ranking(self):
+        """Удалённый пост пропадает со страницы и из словаря при чтении."""
+        self.comment(self.hot, 3)
+        hot_id = self.hot.pk
+        self.hot.delete()
+        self.assertNotIn(
+            hot_id, [post.pk for post in trending.top_posts()]
+        )
+        self.assertNotIn(hot_id, cache.get(trending.POSTS))
+        self.assertIn(self.old.pk, cache.get(trending.POSTS))
+
+    def test_capacity(self):
+        """В кеше не больше TRENDING_CAPACITY постов."""
+        with override_settings(TRENDING_CAPACITY=3):
+            Post.objects.create(author=self.author, text='Новый пост')
+            self.comment(self.hot, 1)
+        self.assertEqual(len(cache.get(trending.POSTS)), 3)
+
+    def test_page(self):
+        self.comment(self.hot, 2)
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(response.context['posts'][0], self.hot)
+        self.assertEqual(response.context['groups'][0], self.group)
+        self.assertContains(response, 'Горячий пост')
+        self.assertTemplateUsed(response, 'posts/includes/post_card.html')
@@ -1,16 +1,19 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 
 
-from ..models import Follow, Group, Post
+from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -156,20 +159,113 @@ class PostViewsTest(TestCase):
         """Проверка работы кэша на главной странице."""
         response = self.auth_client.get(reverse('posts:index'))
         posts = response.content
+        # Сессия и пользователь тоже берутся из кеша.
+        with self.assertNumQueries(0):
+            response_from_cache = (self.auth_client.get(reverse
+                                   ('posts:index')))
+        self.assertEqual(response_from_cache.content, posts)
         Post.objects.create(
             author=self.user,
-            text='Тестовый пост',
+            text='Свежий пост',
         )
-        response_before_cache_cleaning = (self.auth_client.get(reverse
-                                          ('posts:index')))
-        posts_before_cache_cleaning = response_before_cache_cleaning.content
-        self.assertEqual(posts_before_cache_cleaning, posts)
-        cache.clear()
-        response_after_cache_cleaning = (self.auth_client.get(reverse
-                                         ('posts:index')))
-        posts_after_cache_cleaning = response_after_cache_cleaning.content
-        self.assertNotEqual(posts_before_cache_cleaning,
-                            posts_after_cache_cleaning)
+        response_after_write = (self.auth_client.get(reverse
+                                ('posts:index')))
+        self.assertNotEqual(response_after_write.content, posts)
+        self.assertContains(response_after_write, 'Свежий пост')
+
+    def test_post_card_group_link(self):
+        """Ссылка на группу в карточке есть в ленте, но не в самой группе."""
+        group_url = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        link = f'href="{group_url}"'
+        pages = {
+            reverse('posts:index'): True,
+            group_url: False,
+            reverse('posts:profile', kwargs={'username': 'Katya'}): False,
+        }
+        for url, shown in pages.items():
+            with self.subTest(url=url):
+                response = self.auth_client.get(url)
+                self.assertTemplateUsed(
+                    response, 'posts/includes/post_card.html'
+                )
+                self.assertContains(response, 'Тестовый пост')
+                self.assertIs(link in response.content.decode(), shown)
+
+    def test_card_cache_invalidation(self):
+        """Комментарий обновляет закэшированную карточку поста."""
+        url = reverse('posts:profile', kwargs={'username': 'Katya'})
+        self.assertContains(self.auth_client.get(url), 'Комментариев: 0')
+        self.auth_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Комментарий'},
+        )
+        self.assertContains(self.auth_client.get(url), 'Комментариев: 1')
+
+    @override_settings(FEED_CACHE_TIMEOUT=123)
+    def test_card_fragment_timeout(self):
+        """Фрагмент карточки кешируется на FEED_CACHE_TIMEOUT."""
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.auth_client.get(reverse('posts:index'))
+        timeouts = {
+            args[2] for args, _ in cache_set.call_args_list
+            if args[0].startswith('template.cache.post_card.')
+        }
+        self.assertEqual(timeouts, {123})
+
+    def test_comment_keeps_feed_pages(self):
+        """Комментарий перечитывает одну карточку, а не всю ленту."""
+        url = reverse('posts:index')
+        self.auth_client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.auth_client.get(url)
+        self.assertContains(response, 'Комментариев: 1')
+        self.assertEqual(len(queries), 1, queries.captured_queries)
+
+    def test_comment_delete_updates_card(self):
+        """Удалённый комментарий пропадает из закешированной карточки."""
+        url = reverse('posts:index')
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        self.assertContains(self.auth_client.get(url), 'Комментариев: 1')
+        comment.delete()
+        self.assertContains(self.auth_client.get(url), 'Комментариев: 0')
+
+    def test_post_delete_ignores_its_comments(self):
+        """Удаление поста не тратит запросов на каждый его комментарий."""
+        post = Post.objects.create(author=self.user, text='Обсуждаемый')
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.user, text='Комментарий')
+            for _ in range(50)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            post.delete()
+        self.assertLess(len(queries), 20, queries.captured_queries)
+
+    def test_rename_updates_cards(self):
+        """Новое имя автора и название группы видны в закешированной ленте."""
+        url = reverse('posts:index')
+        self.auth_client.get(url)
+        self.user.first_name = 'Екатерина'
+        self.user.save()
+        self.group.title = 'Новая группа'
+        self.group.save()
+        response = self.auth_client.get(url)
+        self.assertContains(response, 'Автор: Екатерина')
+        self.assertContains(response, 'все записи группы Новая группа')
+
+    def test_invalid_cursor_shares_first_page(self):
+        """Битый или длинный курсор не создаёт своей записи в кеше."""
+        url = reverse('posts:index')
+        first = self.auth_client.get(url)
+        for cursor in ('мусор', 'x' * 5000, 'WzAsIjIwMjAiLDFd'):
+            with self.subTest(cursor=cursor[:10]):
+                with self.assertNumQueries(0):
+                    response = self.auth_client.get(url, {'cursor': cursor})
+                self.assertEqual(response.content, first.content)
 
 
 class PaginatorViewsTest(TestCase):
@@ -199,20 +295,22 @@ class PaginatorViewsTest(TestCase):
 
     def test_paginator(self):
         """Paginator работает корректно."""
-        reverse_posts = {
-            reverse('posts:index'): 10,
-            reverse('posts:index') + '?page=2': 4,
-            reverse('posts:group_list', args={'test-slug'}): 10,
-            reverse('posts:group_list', args={'test-slug'}) + '?page=2': 4,
-            reverse('posts:profile', kwargs={'username': 'Katya'}): 10,
-            reverse('posts:profile',
-                    kwargs={'username': 'Katya'}) + '?page=2': 4,
-        }
-        for key, value in reverse_posts.items():
-            with self.subTest(key=key):
+        reverse_urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args={'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'Katya'}),
+        )
+        for url in reverse_urls:
+            with self.subTest(url=url):
                 cache.clear()
-                response = self.auth_client.get(key)
-                self.assertEqual(len(response.context['page_obj']), value)
+                response = self.auth_client.get(url)
+                page_obj = response.context['page_obj']
+                self.assertEqual(len(page_obj), 10)
+                response = self.auth_client.get(
+                    url, {'cursor': page_obj.next_cursor}
+                )
+                self.assertEqual(len(response.context['page_obj']), 4)
+                self.assertIsNone(response.context['page_obj'].next_cursor)
 
 
 class FollowViewsTest(TestCase):
@@ -265,3 +363,73 @@ class FollowViewsTest(TestCase):
         response = self.follower.get(reverse('posts:follow_index'))
         objects = len(response.context['page_obj'])
         self.assertEqual(objects, 0)
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Katya')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(12)
+        )
+        cls.expected = list(cls.post.comments.values_list('text', flat=True))
+        cls.url = reverse('posts:post_detail', args={cls.post.pk})
+
+    def setUp(self):
+        cache.clear()
+
+    def test_first_batch_on_post_page(self):
+        """На странице поста только первая порция, от старых к новым."""
+        response = self.client.get(self.url)
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments], self.expected[:5]
+        )
+        self.assertContains(
+            response,
+            reverse('posts:comment_list', args={self.post.pk})
+            + f'?cursor={comments.next_cursor}',
+        )
+
+    def test_fragments_cover_all_comments(self):
+        """Порции по кнопке «Показать ещё» выдают каждый комментарий раз."""
+        url = reverse('posts:comment_list', args={self.post.pk})
+        walked = []
+        cursor = ''
+        while True:
+            response = self.client.get(f'{url}?cursor={cursor}')
+            self.assertTemplateNotUsed(response, 'base.html')
+            comments = response.context['comments']
+            walked.extend(comment.text for comment in comments)
+            if not comments.next_cursor:
+                self.assertNotContains(response, 'data-comments-more')
+                break
+            cursor = comments.next_cursor
+        self.assertEqual(walked, self.expected)
+
+    def test_fragment_of_missing_post(self):
+        """Порция комментариев несуществующего поста — 404."""
+        response = self.client.get(
+            reverse('posts:comment_list', args=[self.post.pk + 1000])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_post_page_cost_does_not_grow(self):
+        """Число запросов страницы поста не зависит от числа комментариев."""
+        def queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(self.url)
+            self.assertEqual(len(response.context['comments']), 5)
+            return len(captured)
+
+        before = queries()
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text='Ещё')
+            for _ in range(50)
+        )
+        self.assertEqual(queries(), before)
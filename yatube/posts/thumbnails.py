@@ -0,0 +1,278 @@
+"""Миниатюры картинок постов, готовящиеся заранее.
+
+Шаблоны лент вызывают {% thumbnail %}; стандартный бэкенд sorl при
+отсутствии файла режет картинку Pillow прямо в запросе. Здесь запрос
+только проверяет, готов ли файл: если нет, отдаёт оригинал и ставит
+генерацию в фоновый пул. Все размеры из шаблонов нарезаются сразу после
+сохранения поста с картинкой.
+
+Каждый размер нарезается в нескольких ширинах и, кроме JPEG, в WebP и
+AVIF, если их умеет сохранять установленный Pillow (AVIF — с пакетом
+pillow-avif-plugin). Тег {% post_picture %} собирает из готовых файлов
+<picture> с srcset.
+"""
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import ImageFile
+
+from core import metrics
+
+try:
+    import pillow_avif  # noqa: F401 регистрирует AVIF в Pillow
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+# Размеры и параметры, с которыми шаблоны вызывают {% post_picture %}.
+POST_IMAGE_THUMBNAILS = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+    ('960x339', {'crop': '', 'upscale': True}),
+)
+# Ширины, в которых нарезается каждый размер; последняя — исходная.
+POST_IMAGE_WIDTHS = (320, 640, 960)
+# Современные форматы в порядке предпочтения и качество для них: при
+# равном на глаз качестве они в разы легче JPEG с качеством 95.
+MODERN_FORMATS = {
+    'AVIF': {'quality': 60},
+    'WEBP': {'quality': 80},
+}
+MIME_TYPES = {'AVIF': 'image/avif', 'WEBP': 'image/webp'}
+FORMAT_EXTENSIONS = {**EXTENSIONS, 'AVIF': 'avif'}
+
+
+class EagerThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, который никогда не режет картинки в запросе."""
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        source = ImageFile(file_)
+        thumbnail = self.find(source, geometry_string, options)
+        if thumbnail is not None:
+            return thumbnail
+        schedule(source.name, [(geometry_string, options)])
+        return source
+
+    def find(self, source, geometry_string, options):
+        """Готовая миниатюра или None; сама ничего не нарезает."""
+        options = self.with_defaults(source, options)
+        thumbnail = ImageFile(
+            self._get_thumbnail_filename(source, geometry_string, options),
+            default.storage,
+        )
+        return thumbnail if thumbnail.exists() else None
+
+    def with_defaults(self, source, options):
+        """Параметры в том виде, в каком из них строится имя файла."""
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        # Как в sorl, но со своим словарём расширений: в нём есть AVIF.
+        key = tokey(source.key, geometry_string, serialize(options))
+        return '{}{}/{}/{}.{}'.format(
+            thumbnail_settings.THUMBNAIL_PREFIX, key[:2], key[2:4], key,
+            FORMAT_EXTENSIONS[options['format']],
+        )
+
+    def generate(self, source_name, geometry_string, options):
+        """Нарезает одну миниатюру, если её ещё нет."""
+        source = ImageFile(source_name, default_storage)
+        options = self.with_defaults(source, options)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        if default.storage.exists(name):
+            return name
+        source_image = default.engine.get_image(source)
+        try:
+            options['image_info'] = default.engine.get_image_info(
+                source_image
+            )
+            source.set_size(default.engine.get_image_size(source_image))
+            # Пишем во временный файл и переименовываем: запрос не должен
+            # увидеть недописанную картинку.
+            partial = ImageFile(f'{name}.partial', default.storage)
+            self._create_thumbnail(
+                source_image, geometry_string, options, partial
+            )
+            _publish(partial.name, name)
+        finally:
+            default.engine.cleanup(source_image)
+        return name
+
+
+def _publish(partial_name, name):
+    storage = default.storage
+    try:
+        os.replace(storage.path(partial_name), storage.path(name))
+    except NotImplementedError:
+        with storage.open(partial_name) as partial:
+            storage.save(name, partial)
+        storage.delete(partial_name)
+
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def generate(source_name, geometries, on_done=None):
+    """Синхронно нарезает миниатюры; ошибки только логируются."""
+    backend = EagerThumbnailBackend()
+    for geometry_string, options in geometries:
+        try:
+            with metrics.timer('thumbnail'):
+                backend.generate(source_name, geometry_string, options)
+        except Exception:
+            logger.exception(
+                'Не удалось нарезать %s в %s', source_name, geometry_string
+            )
+    if on_done is not None:
+        on_done()
+
+
+def schedule(source_name, geometries, on_done=None):
+    """Ставит нарезку в фоновый пул; THUMBNAIL_WORKERS=0 — сразу."""
+    if not settings.THUMBNAIL_WORKERS:
+        generate(source_name, geometries, on_done)
+        return
+    task = (source_name, tuple(
+        (geometry, tuple(sorted(options.items())))
+        for geometry, options in geometries
+    ))
+    with _lock:
+        if task in _pending:
+            return
+        _pending.add(task)
+
+    def run():
+        try:
+            generate(source_name, geometries, on_done)
+        finally:
+            with _lock:
+                _pending.discard(task)
+
+    _get_executor().submit(run)
+
+
+@functools.lru_cache(maxsize=None)
+def modern_formats():
+    """Современные форматы, которые умеет сохранять установленный Pillow."""
+    Image.init()
+    return tuple(
+        format_ for format_ in MODERN_FORMATS if format_ in Image.SAVE
+    )
+
+
+def _scaled(geometry_string, width):
+    base_width, base_height = map(int, geometry_string.split('x'))
+    return f'{width}x{round(base_height * width / base_width)}'
+
+
+def variants(geometry_string, options):
+    """Все ширины и форматы одного размера: (формат, ширина, размер, опции).
+
+    Формат None означает формат sorl по умолчанию; его вариант в полной
+    ширине совпадает с миниатюрой, которую дал бы {% thumbnail %}.
+    """
+    for format_ in (*modern_formats(), None):
+        format_options = dict(options)
+        if format_ is not None:
+            format_options.update(MODERN_FORMATS[format_], format=format_)
+        for width in POST_IMAGE_WIDTHS:
+            yield (
+                format_, width, _scaled(geometry_string, width),
+                format_options,
+            )
+
+
+def all_variants():
+    return [
+        (geometry, options)
+        for base_geometry, base_options in POST_IMAGE_THUMBNAILS
+        for _, _, geometry, options in variants(base_geometry, base_options)
+    ]
+
+
+def picture(file_, geometry_string, options):
+    """Данные для <picture>: srcset по форматам из готовых файлов.
+
+    Недостающие варианты ставятся в пул; пока не готов ни один
+    вариант формата по умолчанию, <img> показывает оригинал.
+    """
+    backend = EagerThumbnailBackend()
+    source = ImageFile(file_)
+    srcsets = {}
+    missing = []
+    for format_, width, geometry, format_options in variants(
+        geometry_string, options
+    ):
+        thumbnail = backend.find(source, geometry, format_options)
+        if thumbnail is None:
+            missing.append((geometry, format_options))
+        else:
+            srcsets.setdefault(format_, []).append((width, thumbnail.url))
+    if missing:
+        schedule(source.name, missing)
+    fallback = srcsets.pop(None, [])
+    return {
+        'sources': [
+            {'type': MIME_TYPES[format_], 'srcset': _srcset(srcsets[format_])}
+            for format_ in modern_formats() if format_ in srcsets
+        ],
+        'src': fallback[-1][1] if fallback else source.url,
+        'srcset': _srcset(fallback),
+    }
+
+
+def _srcset(candidates):
+    return ', '.join(f'{url} {width}w' for width, url in candidates)
+
+
+def pregenerate(post):
+    """Нарезает все варианты картинки поста из POST_IMAGE_THUMBNAILS."""
+    # Импорт здесь: feed_cache тянет модели, а этот модуль грузится
+    # sorl при старте как THUMBNAIL_BACKEND.
+    from . import feed_cache
+
+    if not post.image:
+        return
+    scopes = {feed_cache.card_scope(post.pk)}
+    schedule(
+        post.image.name,
+        all_variants(),
+        # Карточка могла закешироваться с оригиналом вместо миниатюры.
+        # Пул работает вне транзакций, поэтому версия меняется сразу.
+        on_done=lambda: feed_cache.bump_now(scopes),
+    )
@@ -0,0 +1,214 @@
+"""Ленты подписок, раскладываемые при записи (fan-out-on-write).
+
+Новый пост сразу записывается в ленты всех подписчиков автора вместе
+с датой публикации, поэтому follow_index листает ленту по индексу
+TimelineEntry (user, -pub_date, -post), не соединяя Follow и Post. Для
+авторов с огромным числом подписчиков раскладка слишком дорога: их
+посты подмешиваются в ленту при чтении (fan-out-on-read).
+
+Подписка раскладывает в ленту только TIMELINE_BACKFILL новейших постов
+автора: запись идёт в транзакции запроса под блокировкой записи.
+Граница остаётся в Follow.timeline_cutoff, и более старые посты автора
+подмешиваются при чтении, как у популярных, когда лента до них дойдёт.
+"""
+import heapq
+import itertools
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .paginator import CursorPaginator
+
+BATCH_SIZE = 500
+
+
+def is_celebrity(author_id):
+    """Автор слишком популярен для раскладки по лентам."""
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+def _bulk_add(entries):
+    batch = []
+    for user_id, post_id, pub_date in entries:
+        batch.append(TimelineEntry(
+            user_id=user_id, post_id=post_id, pub_date=pub_date
+        ))
+        if len(batch) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_add(
+        (user_id, post.pk, post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def _add_author_posts(user_ids, author_id):
+    """Раскладывает новейшие посты автора; возвращает границу или None."""
+    limit = settings.TIMELINE_BACKFILL
+    posts = list(
+        Post.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-pk'
+        ).values_list('pk', 'pub_date')[:limit + 1]
+    )
+    cutoff = None
+    if len(posts) > limit:
+        # Все посты новее границы попали в выборку, даже при равных датах.
+        cutoff = posts[-1][1]
+        posts = [(pk, pub_date) for pk, pub_date in posts if pub_date > cutoff]
+    _bulk_add(
+        (user_id, post_id, pub_date)
+        for user_id in user_ids for post_id, pub_date in posts
+    )
+    return cutoff
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика новейшие посты автора."""
+    if is_celebrity(author_id):
+        return
+    cutoff = _add_author_posts([user_id], author_id)
+    if cutoff is not None:
+        Follow.objects.filter(user_id=user_id, author_id=author_id).update(
+            timeline_cutoff=cutoff
+        )
+
+
+def remove(user_id, author_id):
+    """Убирает посты автора из ленты бывшего подписчика."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def unfollow(user_id, author_id):
+    """Обрабатывает отписку.
+
+    Если автор только что опустился ниже порога, его посты больше не
+    подмешиваются при чтении — раскладываем их по лентам оставшихся
+    подписчиков.
+    """
+    remove(user_id, author_id)
+    crossed = UserStats.objects.filter(
+        user_id=author_id,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT - 1,
+    ).exists()
+    if crossed:
+        followers = Follow.objects.filter(author_id=author_id)
+        cutoff = _add_author_posts(
+            followers.values_list('user_id', flat=True).iterator(),
+            author_id,
+        )
+        followers.update(timeline_cutoff=cutoff)
+
+
+def merged_authors(user):
+    """Авторы, чьи посты user читает из posts, а не из ленты.
+
+    Пары (id автора, граница): у популярного границы нет — из posts
+    берутся все его посты, у остальных — посты не новее границы.
+    """
+    follows = Follow.objects.filter(user=user).filter(
+        Q(timeline_cutoff__isnull=False)
+        | Q(author__stats__followers_count__gte=(
+            settings.TIMELINE_FANOUT_LIMIT
+        ))
+    )
+    return [
+        (author_id, None if followers >= settings.TIMELINE_FANOUT_LIMIT
+         else cutoff)
+        for author_id, cutoff, followers in follows.values_list(
+            'author_id', 'timeline_cutoff', 'author__stats__followers_count'
+        )
+    ]
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорные страницы ленты подписок прямо из TimelineEntry.
+
+    Ключи (pub_date, id поста) страницы берутся из индекса ленты
+    читателя и, для популярных авторов из его подписок и для старых
+    постов за границей раскладки, из индекса постов автора; посты за
+    границей читаются, только если страница до неё доходит. Источники
+    сливаются по ключу, и только посты страницы выбираются по первичному
+    ключу из posts — модели или словари .values(). Ни один запрос не
+    идёт по общему индексу постов, поэтому страница стоит одинаково при
+    любом размере таблицы.
+    """
+
+    ENTRY_ORDERING = ('-pub_date', '-post_id')
+
+    def __init__(self, user, posts, per_page):
+        super().__init__(posts, per_page)
+        self.user = user
+
+    def _fetch(self, values, forward):
+        limit = self.per_page + 1
+        entries = self._window(
+            TimelineEntry.objects.filter(user=self.user), values, forward,
+            ordering=self.ENTRY_ORDERING,
+        )
+        entries = list(entries.values_list('pub_date', 'post_id')[:limit])
+        sources = [entries]
+        for author_id, cutoff in merged_authors(self.user):
+            posts = Post.objects.filter(author_id=author_id)
+            if cutoff is not None:
+                if self._above(cutoff, entries, values, forward):
+                    continue
+                posts = posts.filter(pub_date__lte=cutoff)
+            posts = self._window(posts, values, forward)
+            sources.append(posts.values_list('pub_date', 'pk')[:limit])
+        # Пост автора, ставшего популярным, мог остаться и в ленте:
+        # одинаковые ключи после слияния идут подряд.
+        keys = (
+            key for key, _ in itertools.groupby(
+                heapq.merge(*sources, reverse=forward)
+            )
+        )
+        ids = [post_id for _, post_id in itertools.islice(keys, limit)]
+        if not ids:
+            return []
+        found = {
+            row['id'] if isinstance(row, dict) else row.pk: row
+            for row in self.object_list.filter(pk__in=ids).order_by()
+        }
+        return [found[post_id] for post_id in ids if post_id in found]
+
+    def _above(self, cutoff, entries, values, forward):
+        """Страница целиком новее границы: старые посты автора не нужны."""
+        if not forward:
+            return values is not None and values[0] > cutoff
+        return (
+            len(entries) > self.per_page and entries[-1][0] > cutoff
+        )
+
+
+def get_page(request, posts):
+    """Страница ленты подписок request.user по параметру ?cursor=."""
+    paginator = TimelinePaginator(
+        request.user, posts, settings.POSTS_PER_PAGE
+    )
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def rebuild():
+    """Пересобирает все ленты с нуля по таблице подписок."""
+    TimelineEntry.objects.all().delete()
+    Follow.objects.update(timeline_cutoff=None)
+    follows = Follow.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        backfill(user_id, author_id)
@@ -0,0 +1,207 @@
+"""Выгрузка и загрузка данных в формате JSON Lines.
+
+Каждая строка файла — одна запись в духе dumpdata:
+{"model": "posts.post", "pk": 1, "fields": {...}}. Модели идут в
+порядке зависимостей (пользователи, группы, посты, комментарии,
+подписки), поэтому при загрузке связи уже на месте. Счётчики, ленты
+подписок и поисковый индекс не выгружаются: после загрузки они
+пересчитываются по самим данным.
+
+И выгрузка, и загрузка идут потоком порциями по batch_size строк,
+так что память не растёт с размером файла.
+"""
+import json
+from datetime import date, datetime, time
+
+from django.apps import apps
+from django.core.exceptions import ValidationError
+
+from users.backends import forget_user
+
+from . import counters, feed_cache, follow_graph, search, timeline
+from .models import Comment, Post, explicit_auto_now_add
+
+MODELS = (
+    'auth.user',
+    'posts.group',
+    'posts.post',
+    'posts.comment',
+    'posts.follow',
+)
+# Денормализованные поля: после загрузки их всё равно пересчитывают.
+SKIPPED_FIELDS = {'posts_count', 'comments_count', 'timeline_cutoff'}
+BATCH_SIZE = 1000
+
+
+class TransferError(ValueError):
+    """Строка файла не похожа на запись выгрузки."""
+
+
+def _default(value):
+    # DjangoJSONEncoder обрезает время до миллисекунд, а курсоры лент
+    # сортируют по pub_date — порядок равных до миллисекунды постов
+    # после загрузки поменялся бы.
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не сериализуется в JSON')
+
+
+def _fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in SKIPPED_FIELDS
+    ]
+
+
+def export_lines(batch_size=BATCH_SIZE):
+    """Строки выгрузки всех моделей из MODELS, без переводов строк."""
+    for label in MODELS:
+        model = apps.get_model(label)
+        fields = _fields(model)
+        rows = model._default_manager.order_by('pk').values_list(
+            'pk', *(field.attname for field in fields)
+        )
+        for pk, *values in rows.iterator(chunk_size=batch_size):
+            yield json.dumps(
+                {
+                    'model': label,
+                    'pk': pk,
+                    'fields': {
+                        field.name: value
+                        for field, value in zip(fields, values)
+                    },
+                },
+                default=_default,
+                ensure_ascii=False,
+            )
+
+
+class Loader:
+    """Копит записи по моделям и пишет их bulk_create порциями.
+
+    bulk_create не шлёт сигналов, поэтому счётчики, ленты, поиск и кеш
+    не трогаются на каждой строке — finish() пересобирает их разом.
+    Для кеша запоминаются только id затронутых пользователей и групп.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, ignore_existing=False):
+        self.batch_size = batch_size
+        self.ignore_existing = ignore_existing
+        self.pending = {}
+        self.fields = {}
+        self.loaded = dict.fromkeys(MODELS, 0)
+        self.users = set()
+        self.followers = set()
+        self.authors = set()
+        self.groups = set()
+
+    def add(self, record):
+        try:
+            label = record['model']
+            pk = record['pk']
+            values = record['fields']
+        except (KeyError, TypeError):
+            raise TransferError('Нужны ключи model, pk и fields.')
+        if label not in self.loaded:
+            raise TransferError(f'Неизвестная модель {label!r}.')
+        model = apps.get_model(label)
+        kwargs = {}
+        for field in self._fields(label, model):
+            if field.name in values:
+                kwargs[field.attname] = field.to_python(values[field.name])
+        batch = self.pending.setdefault(label, [])
+        batch.append(model(pk=pk, **kwargs))
+        if len(batch) >= self.batch_size:
+            # Сначала модели, на которые эта может ссылаться.
+            for earlier in MODELS[:MODELS.index(label) + 1]:
+                self._flush(earlier)
+
+    def _fields(self, label, model):
+        if label not in self.fields:
+            self.fields[label] = _fields(model)
+        return self.fields[label]
+
+    def _flush(self, label):
+        batch = self.pending.pop(label, [])
+        if not batch:
+            return
+        batch[0]._meta.model._default_manager.bulk_create(
+            batch, ignore_conflicts=self.ignore_existing
+        )
+        self.loaded[label] += len(batch)
+        self._remember(label, batch)
+
+    def _remember(self, label, batch):
+        """Запоминает, чьи ленты и записи в кеше устарели."""
+        if label == 'auth.user':
+            self.users.update(user.pk for user in batch)
+        elif label == 'posts.post':
+            self.authors.update(post.author_id for post in batch)
+            self.groups.update(post.group_id for post in batch)
+        elif label == 'posts.comment':
+            # Комментарий меняет число комментариев в лентах автора
+            # и группы поста.
+            pairs = Post.objects.filter(
+                pk__in={comment.post_id for comment in batch}
+            ).values_list('author_id', 'group_id').distinct()
+            for author_id, group_id in pairs:
+                self.authors.add(author_id)
+                self.groups.add(group_id)
+        elif label == 'posts.follow':
+            self.followers.update(follow.user_id for follow in batch)
+            self.authors.update(follow.author_id for follow in batch)
+
+    def _stale_scopes(self):
+        scopes = {feed_cache.INDEX, feed_cache.GROUPS, feed_cache.NAMES}
+        scopes.update(
+            feed_cache.profile_scope(author_id) for author_id in self.authors
+        )
+        scopes.update(
+            feed_cache.group_scope(group_id)
+            for group_id in self.groups if group_id is not None
+        )
+        return scopes | {feed_cache.comments_scope(s) for s in scopes}
+
+    def flush(self):
+        # Порядок MODELS: внешние ключи ссылаются на уже записанные строки.
+        for label in MODELS:
+            self._flush(label)
+
+    def finish(self):
+        """Пересобирает всё, что при загрузке не обновлялось."""
+        self.flush()
+        counters.recount()
+        timeline.rebuild()
+        search.rebuild(Post.objects.all())
+        # Остальной кеш (сессии, метрики, чужие ленты) остаётся: версия
+        # NAMES входит в ключ каждой карточки, так что сбрасываются и они.
+        feed_cache.bump(self._stale_scopes())
+        for user_id in self.users:
+            forget_user(user_id)
+        for user_id in self.followers:
+            follow_graph.forget(user_id)
+        return self.loaded
+
+
+def load_lines(lines, batch_size=BATCH_SIZE, ignore_existing=False):
+    """Загружает строки выгрузки; возвращает число записей по моделям.
+
+    Вызывать внутри transaction.atomic(): так ошибка в середине файла
+    не оставит половину данных, а SQLite не фиксирует каждую порцию
+    отдельно.
+    """
+    loader = Loader(batch_size, ignore_existing)
+    with explicit_auto_now_add(
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ):
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                loader.add(json.loads(line))
+            except (ValueError, ValidationError) as error:
+                raise TransferError(f'Строка {number}: {error}') from error
+        # Хвосты порций пишем, пока даты ещё берутся из объектов.
+        loader.flush()
+    return loader.finish()
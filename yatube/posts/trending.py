@@ -0,0 +1,142 @@
+"""Популярные посты и группы: вовлечённость с затуханием по времени.
+
+Каждое событие — новый пост, комментарий, подписка на автора — даёт
+посту и его группе вес, который убывает вдвое за TRENDING_HALF_LIFE
+секунд. Чтобы не пересчитывать старые оценки при каждом событии,
+затухание «вперёд»: событие в момент t весит w · 2^((t − EPOCH) / T),
+и все оценки растут с одной скоростью, поэтому их порядок — тот же,
+что у затухающих. Числа хранятся логарифмами (logaddexp), иначе
+экспонента переполнилась бы за несколько месяцев.
+
+Оценки лежат в кеше словарём не больше TRENDING_CAPACITY записей на
+посты и столько же на группы. Когда место кончается, новичок вытесняет
+запись с наименьшей оценкой и наследует её (алгоритм Space-Saving):
+оценка может оказаться завышенной, но по-настоящему популярный пост
+из словаря не выпадет. Чтение страницы — словарь из кеша и выбор
+лучших из K записей, без ORDER BY по таблице постов.
+
+Сигналы обновляют словарь чтением и записью кеша без блокировки: два
+процесса одновременно могут потерять одно событие, для рейтинга это
+допустимо.
+
+Удаление поста или группы словарь не трогает: при каскаде это было бы
+чтение и запись кеша на каждый пост. Удалённые id отсеивает чтение
+страницы и тогда же убирает их из словаря.
+"""
+import heapq
+import math
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from .models import Group, Post
+
+POSTS = 'trending:posts'
+GROUPS = 'trending:groups'
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+POST_WEIGHT = 1.0
+COMMENT_WEIGHT = 1.0
+FOLLOW_WEIGHT = 2.0
+
+
+def log_weight(weight, when=None):
+    """log(w · 2^((t − EPOCH) / T)) — вес события в логарифмах."""
+    when = when or timezone.now()
+    half_lives = (when - EPOCH).total_seconds() / settings.TRENDING_HALF_LIFE
+    return math.log(weight) + half_lives * math.log(2)
+
+
+def _logaddexp(a, b):
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def add(scores, item_id, value, capacity):
+    """Прибавляет событие к оценке item_id в словаре Space-Saving."""
+    if item_id in scores:
+        scores[item_id] = _logaddexp(scores[item_id], value)
+        return
+    if len(scores) >= capacity:
+        weakest = min(scores, key=scores.get)
+        value = _logaddexp(scores.pop(weakest), value)
+    scores[item_id] = value
+
+
+def _record(events):
+    """events: (ключ, id, вес) — одно чтение и одна запись кеша."""
+    current = cache.get_many({key for key, _, _ in events})
+    now = timezone.now()
+    for key, item_id, weight in events:
+        add(
+            current.setdefault(key, {}), item_id,
+            log_weight(weight, now), settings.TRENDING_CAPACITY,
+        )
+    cache.set_many(current, None)
+
+
+def _events(post_id, group_id, weight):
+    events = [(POSTS, post_id, weight)]
+    if group_id is not None:
+        events.append((GROUPS, group_id, weight))
+    return events
+
+
+def record_post(post):
+    _record(_events(post.pk, post.group_id, POST_WEIGHT))
+
+
+def record_comment(comment):
+    _record(_events(
+        comment.post_id, comment.post.group_id, COMMENT_WEIGHT
+    ))
+
+
+def record_follow(author_id):
+    """Подписка на автора засчитывается его последнему посту."""
+    post = Post.objects.filter(author_id=author_id).values(
+        'pk', 'group_id'
+    ).first()
+    if post is not None:
+        _record(_events(post['pk'], post['group_id'], FOLLOW_WEIGHT))
+
+
+def forget(key, item_ids):
+    """Убирает id из словаря одним чтением и одной записью кеша."""
+    scores = cache.get(key)
+    if scores is None:
+        return
+    removed = [scores.pop(item_id, None) for item_id in item_ids]
+    if any(score is not None for score in removed):
+        cache.set(key, scores, None)
+
+
+def top(key, limit):
+    """id с лучшими оценками по убыванию: O(K log limit)."""
+    scores = cache.get(key) or {}
+    return heapq.nlargest(limit, scores, key=scores.get)
+
+
+def _in_order(key, queryset, ids):
+    found = queryset.in_bulk(ids)
+    missing = [item_id for item_id in ids if item_id not in found]
+    if missing:
+        # Реплика могла ещё не получить новый пост: удалённым считается
+        # только то, чего нет и в основной базе.
+        kept = queryset.using(DEFAULT_DB_ALIAS).filter(
+            pk__in=missing
+        ).values_list('pk', flat=True)
+        forget(key, set(missing) - set(kept))
+    return [found[item_id] for item_id in ids if item_id in found]
+
+
+def top_posts(limit=None):
+    ids = top(POSTS, limit or settings.POSTS_PER_PAGE)
+    return _in_order(POSTS, Post.objects.for_feed(), ids)
+
+
+def top_groups(limit=None):
+    ids = top(GROUPS, limit or settings.TRENDING_GROUPS_SHOWN)
+    return _in_order(GROUPS, Group.objects.all(), ids)
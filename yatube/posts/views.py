@@ -1,31 +1,41 @@
+from django.conf import settings
 from django.contrib.auth import get_user
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.utils.http import urlencode
 
+from core.routers import read_only_view, replica_reads
+
+from . import (
+    counters, feed_cache, follow_graph, recommendations, search, timeline,
+    trending,
+)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Comment, Follow, Group, Post, User
+from .paginator import CursorPaginator
 
 
-@cache_page(20)
+@read_only_view
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page_obj = feed_cache.get_cached_page(
+        request, feed_cache.INDEX, post_list
+    )
+    follow_graph.attach_follow_state(request.user, page_obj.object_list)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@read_only_view
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.posts.for_feed()
+    page_obj = feed_cache.get_cached_page(
+        request, feed_cache.group_scope(group.pk), post_list
+    )
+    follow_graph.attach_follow_state(request.user, page_obj.object_list)
     context = {
         'page_obj': page_obj,
         'group': group,
@@ -33,30 +43,78 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@read_only_view
+def trending_index(request):
+    posts = trending.top_posts()
+    feed_cache.attach_card_versions(posts)
+    follow_graph.attach_follow_state(request.user, posts)
+    context = {
+        'posts': posts,
+        'groups': trending.top_groups(),
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+@read_only_view
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    following = False
-    if request.user.is_authenticated:
-        following = author.following.exists()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    posts = author.posts.for_feed()
+    stats = counters.get_user_stats(author)
+    following = follow_graph.is_following(request.user, author)
+    page_obj = feed_cache.get_cached_page(
+        request, feed_cache.profile_scope(author.pk), posts
+    )
     context = {
         'author': author,
+        'stats': stats,
         'page_obj': page_obj,
-        'following': following
+        'following': following,
+        # Кого почитать — только в своём профиле.
+        'recommendations': (
+            recommendations.for_user(request.user)
+            if request.user == author else []
+        ),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@read_only_view
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = search.SearchPaginator(
+        query, Post.objects.for_feed(), settings.POSTS_PER_PAGE
+    )
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    feed_cache.attach_card_versions(page_obj.object_list)
+    follow_graph.attach_follow_state(request.user, page_obj.object_list)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def _comment_page(post_id, cursor):
+    """Порция комментариев к посту от старых к новым по курсору."""
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        ordering=('created', 'pk'),
+    )
+    return paginator.get_page(cursor)
+
+
+@replica_reads
 def post_detail(request, post_id):
     user = request.user
     post = get_object_or_404(
-        Post.objects.select_related('group', 'author'),
+        Post.objects.select_related('group', 'author', 'author__stats'),
         pk=post_id
     )
-    comments = post.comments.all()
+    comments = _comment_page(post.pk, request.GET.get('cursor'))
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -65,7 +123,7 @@ def post_detail(request, post_id):
         comment.save()
     context = {
         'post': post,
-        'total_posts': post.author.posts.count(),
+        'total_posts': counters.get_user_stats(post.author).posts_count,
         'title': post.text[:30],
         'user': user,
         'form': form,
@@ -74,6 +132,17 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+@read_only_view
+def comment_list(request, post_id):
+    """Следующая порция комментариев для кнопки «Показать ещё»."""
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post_id': post_id,
+        'comments': _comment_page(post_id, request.GET.get('cursor')),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     user = get_user(request)
@@ -122,13 +191,13 @@ def add_comment(request, post_id):
 
 
 @login_required
+@read_only_view
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = timeline.get_page(request, Post.objects.for_feed())
+    feed_cache.attach_card_versions(page_obj.object_list)
     context = {
         'page_obj': page_obj,
+        'recommendations': recommendations.for_user(request.user),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -144,7 +213,5 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    is_follower = author.following.exists()
-    if author != request.user and is_follower:
-        Follow.objects.filter(user=request.user, author=author).delete()
+    Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:follow_index')
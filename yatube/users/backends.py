@@ -0,0 +1,52 @@
+"""Пользователь сессии из общего кеша.
+
+AuthenticationMiddleware на каждом запросе достаёт пользователя по id из
+сессии — это запрос к auth_user. CachedModelBackend держит объект
+пользователя в кеше USER_CACHE_TIMEOUT секунд. Любое сохранение или
+удаление пользователя сбрасывает запись после коммита (users.signals),
+смена пароля — ещё и явно в представлении PasswordChange.
+
+Пароль в кеше важен: сессия хранит хеш от него и сверяет его с
+пользователем на каждом запросе. Устаревший объект оставил бы живыми
+сессии, которые смена пароля должна завершить.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+User = get_user_model()
+
+
+def user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def forget_user(user_id):
+    """Сбрасывает кеш пользователя.
+
+    Запись удаляется сразу и ещё раз после фиксации транзакции:
+    параллельный запрос мог до фиксации прочитать старую строку и снова
+    положить её в кеш.
+    """
+    key = user_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = user_key(user_id)
+        user = cache.get(key)
+        if user is not None:
+            return user if self.user_can_authenticate(user) else None
+        try:
+            # Только из default: с реплики пришёл бы пароль до смены.
+            user = User._default_manager.db_manager(DEFAULT_DB_ALIAS).get(
+                pk=user_id
+            )
+        except User.DoesNotExist:
+            return None
+        cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
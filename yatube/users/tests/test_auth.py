@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..backends import CachedModelBackend
+
+User = get_user_model()
+
+
+class CachedModelBackendTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='Katya', password='old-password-1'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.backend = CachedModelBackend()
+
+    def test_user_from_cache(self):
+        """Второе чтение пользователя не обращается к базе."""
+        self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+
+    def test_save_invalidates(self):
+        """Сохранение пользователя сбрасывает кеш."""
+        self.backend.get_user(self.user.pk)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNotNone(self.backend.get_user(self.user.pk))
+        user = User.objects.get(pk=self.user.pk)
+        user.save()
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    def test_password_change_ends_other_sessions(self):
+        """После смены пароля другой сеанс того же пользователя выходит."""
+        other = Client()
+        other.login(username='Katya', password='old-password-1')
+        url = reverse('posts:post_create')
+        self.assertEqual(other.get(url).status_code, 200)
+        client = Client()
+        client.login(username='Katya', password='old-password-1')
+        response = client.post(reverse('users:password_change'), {
+            'old_password': 'old-password-1',
+            'new_password1': 'new-password-2',
+            'new_password2': 'new-password-2',
+        })
+        self.assertRedirects(response, reverse('password_change_done'))
+        # Сменивший пароль сеанс продолжается, другой — нет.
+        self.assertEqual(client.get(url).status_code, 200)
+        self.assertRedirects(
+            other.get(url), f'{reverse("users:login")}?next={url}'
+        )
@@ -1,6 +1,5 @@
 from django.contrib.auth.views import (LoginView, LogoutView,
                                        PasswordChangeDoneView,
-                                       PasswordChangeView,
                                        PasswordResetCompleteView,
                                        PasswordResetConfirmView,
                                        PasswordResetDoneView,
@@ -31,8 +30,7 @@ urlpatterns = [
     ),
     path(
         'password_change/',
-        PasswordChangeView.as_view
-        (template_name='users/password_change_form.html'),
+        views.PasswordChange.as_view(),
         name='password_change'
     ),
     path(
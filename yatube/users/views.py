@@ -1,6 +1,8 @@
+from django.contrib.auth.views import PasswordChangeView
 from django.urls import reverse_lazy
 from django.views.generic import CreateView
 
+from .backends import forget_user
 from .forms import CreationForm
 
 
@@ -8,3 +10,19 @@ class SignUp(CreateView):
     form_class = CreationForm
     success_url = reverse_lazy('posts:index')
     template_name = 'users/signup.html'
+
+
+class PasswordChange(PasswordChangeView):
+    """Смена пароля завершает остальные сессии пользователя.
+
+    Они сверяют хеш пароля с пользователем из кеша (users.backends).
+    Сохранение пользователя и так сбрасывает кеш сигналом, но здесь это
+    обязательно, поэтому сброс явный и не зависит от того, как форма
+    сохраняет пароль.
+    """
+    template_name = 'users/password_change_form.html'
+
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        forget_user(form.user.pk)
+        return response
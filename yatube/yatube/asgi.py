@@ -0,0 +1,21 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named
+``application``. Django 2.2 has no ASGI handler of its own, so the WSGI
+application is wrapped in core.asgi.WsgiToAsgi. Run it with gunicorn's
+uvicorn worker class (gunicorn sets TCP_NODELAY on the listening socket,
+``uvicorn --workers`` does not):
+
+    gunicorn yatube.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+from core.asgi import WsgiToAsgi
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+application = WsgiToAsgi(get_wsgi_application())
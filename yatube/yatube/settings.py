@@ -1,4 +1,9 @@
+import atexit
 import os
+import shutil
+import sys
+import tempfile
+from urllib.request import pathname2url
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -13,6 +18,9 @@ SECRET_KEY = 'vz)n!(qr1gv%-%%v*s^)soaw(-aqsi(31s(er4(k$o=h8ugx)2'
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+# Запущены тесты: manage.py test или pytest
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -28,6 +36,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
     'django.contrib.admin',
     'django.contrib.auth',
@@ -39,6 +48,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.staticfiles.StaticFilesMiddleware',
+    'core.metrics.MetricsMiddleware',
+    'core.db.ImmediateWriteMiddleware',
+    'core.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,16 +66,24 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Кеширующий загрузчик и при DEBUG: правки шаблонов сбрасывают
+            # его через autoreload, см. core/template_loaders.py
+            'loaders': [
+                ('core.template_loaders.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.feed_cache.feed_cache_timeout',
             ],
         },
     },
@@ -70,17 +91,53 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# Потоков для синхронных представлений в каждом процессе ASGI-сервера,
+# см. core/asgi.py. У каждого потока своё соединение с базой.
+ASGI_THREADS = 16
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Файл реплики. По умолчанию это сам основной файл, открытый только для
+# чтения; отдельную копию, например db_replica.sqlite3, обновляет
+# команда replicate.
+REPLICA_PATH = os.path.join(BASE_DIR, 'db.sqlite3')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # SQLite с WAL, mmap и ожиданием блокировок, см. core/db
+        'ENGINE': 'core.db',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        # Запись и обновление счётчиков сигналами — одна транзакция
+        'ATOMIC_REQUESTS': True,
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            # Секунды ожидания чужой блокировки записи
+            'timeout': 20,
+        },
+    },
+    # Реплика только для чтения: с неё читают ленты, см. core.routers
+    'replica': {
+        'ENGINE': 'core.db',
+        'NAME': 'file:{}?mode=ro'.format(pathname2url(REPLICA_PATH)),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'read_only': True,
+            'timeout': 20,
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Сколько секунд после записи клиент читает с основной базы. Должно
+# быть больше отставания реплики (интервала команды replicate).
+REPLICA_STICKY_SECONDS = 15
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -122,6 +179,11 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
+# collectstatic складывает сюда файлы с хешем в имени и их копии .gz и
+# .br, StaticFilesMiddleware отдаёт их с кешированием на год
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStorage'
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
@@ -140,12 +202,90 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кто отправляет тело медиафайлов: None — само приложение,
+# 'X-Accel-Redirect' — nginx (location с internal по префиксу ниже),
+# 'X-Sendfile' — Apache mod_xsendfile или lighttpd
+MEDIA_OFFLOAD = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Общий для всех воркеров кеш в файле SQLite, см. core/cache.py
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
+if TESTING:
+    # Тесты вызывают cache.clear(): у каждого прогона свой файл кеша,
+    # живой кеш с сессиями и метриками они не трогают
+    TEST_CACHE_DIR = tempfile.mkdtemp(prefix='yatube-cache-')
+    atexit.register(shutil.rmtree, TEST_CACHE_DIR, ignore_errors=True)
+    CACHES['default']['LOCATION'] = os.path.join(
+        TEST_CACHE_DIR, 'cache.sqlite3'
+    )
+
+# Сессии и пользователь сессии читаются из кеша, без запросов к базе;
+# строки сессий пишутся в базу фоновым потоком, см. core/sessions.py
+SESSION_ENGINE = 'core.sessions'
+AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+USER_CACHE_TIMEOUT = 60 * 60
 
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+# debug_toolbar ищет APP_DIRS, а шаблоны приложений у нас грузит
+# app_directories.Loader внутри кеширующего загрузчика
+SILENCED_SYSTEM_CHECKS = ['debug_toolbar.W006']
+
+# Количество постов на одной странице ленты
+POSTS_PER_PAGE = 10
+
+# Комментарии под постом выводятся порциями: первая — вместе со
+# страницей поста, следующие подгружаются по кнопке «Показать ещё»
+COMMENTS_PER_PAGE = 20
+
+# Авторы, у которых подписчиков не меньше этого числа, не раскладываются
+# по лентам при публикации: их посты подмешиваются в ленту при чтении
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Сколько новейших постов автора подписка кладёт в ленту подписчика;
+# более старые подмешиваются при чтении, когда до них долистают
+TIMELINE_BACKFILL = POSTS_PER_PAGE * 5
+
+# Страницы лент и карточки постов кешируются под версионными ключами,
+# запись поста или комментария сразу делает их устаревшими; с тем же
+# сроком кешируются фрагменты карточек в шаблонах
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Подписки пользователя (отсортированные id авторов) в кеше, см.
+# posts/follow_graph.py; сигналы Follow сбрасывают их сразу
+FOLLOW_GRAPH_TIMEOUT = 60 * 60 * 6
+
+# Рекомендации «кого почитать»: сколько хранить на читателя после
+# пакетного расчёта (rebuild_recommendations) и сколько показывать
+RECOMMENDATIONS_PER_USER = 20
+RECOMMENDATIONS_SHOWN = 5
+
+# Популярное: вес поста и группы за комментарии, подписки и публикацию
+# убывает вдвое за TRENDING_HALF_LIFE секунд; в кеше хранится не больше
+# TRENDING_CAPACITY лучших постов и групп, см. posts/trending.py
+TRENDING_HALF_LIFE = 60 * 60 * 6
+TRENDING_CAPACITY = 200
+TRENDING_GROUPS_SHOWN = 5
+
+# Миниатюры режутся в фоновом пуле сразу после сохранения поста,
+# запрос отдаёт только готовые файлы. 0 — резать синхронно: так в
+# тестах, иначе пул дописывал бы файлы в уже удалённый MEDIA_ROOT
+THUMBNAIL_BACKEND = 'posts.thumbnails.EagerThumbnailBackend'
+THUMBNAIL_WORKERS = 0 if TESTING else 2
+
+# Метрики запросов: агрегат каждого процесса сбрасывается в общий кеш
+# не чаще раза в интервал (в секундах). /metrics/ видят сотрудники
+# (is_staff) и запросы с заголовком Authorization: Bearer <токен>;
+# None — токена нет. Адрес клиента не проверяется: за nginx все
+# запросы приходят с 127.0.0.1
+METRICS_FLUSH_INTERVAL = 10
+METRICS_TOKEN = None
@@ -1,14 +1,25 @@
+import re
+
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from core.views import media, metrics
 
 urlpatterns = [
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('api.urls', namespace='api')),
     path('', include('posts.urls', namespace='posts')),
     path('admin/', admin.site.urls),
+    path('metrics/', metrics, name='metrics'),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
+    re_path(
+        r'^{}(?P<path>.+)$'.format(
+            re.escape(settings.MEDIA_URL.lstrip('/'))
+        ),
+        media, name='media',
+    ),
 ]
 
 handler404 = 'core.views.page_not_found'
@@ -19,6 +30,3 @@ if settings.DEBUG:
     import debug_toolbar
 
     urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )